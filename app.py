@@ -8,15 +8,23 @@ from housing.logger import logging
 from housing.exception import HousingException
 import os, sys
 import json
+import threading
 from housing.config.configuration import configuration
-from housing.constants import CONFIG_DIR, get_current_time_stamp
+from housing.constants import CONFIG_DIR
 from housing.pipeline.pipeline import Pipeline
+from housing.pipeline.job_queue import JobQueue, TRAIN_JOB, RESUME_JOB
 from housing.entity.housing_predictor import HousingPredictor, HousingData
-from flask import send_file, abort, render_template
+from flask import abort, render_template, jsonify
+from housing.util.drift_monitor import DriftMonitor
+from housing.util.drift import get_drift_report_page
+from housing.util.sketch import DatasetSketch
+from housing.util.file_server import FileServer
+from housing.util.model_registry import ModelRegistry
 
 
 ROOT_DIR = os.getcwd()
-LOG_FOLDER_NAME = "logs"
+#folder housing.logger writes to
+LOG_FOLDER_NAME = "log"
 PIPELINE_FOLDER_NAME = "housing"
 SAVED_MODELS_DIR_NAME = "saved_models"
 MODEL_CONFIG_FILE_PATH = os.path.join(ROOT_DIR, CONFIG_DIR, "model.yaml")
@@ -24,13 +32,47 @@ LOG_DIR = os.path.join(ROOT_DIR, LOG_FOLDER_NAME)
 PIPELINE_DIR = os.path.join(ROOT_DIR, PIPELINE_FOLDER_NAME)
 MODEL_DIR = os.path.join(ROOT_DIR, SAVED_MODELS_DIR_NAME)
 
-from housing.logger import get_log_dataframe
+from housing.logger.log_reader import LogReader, LOG_VIEW_COLUMNS, get_records_dataframe, is_log_file, search_logs
 HOUSING_DATA_KEY = "housing_data"
 MEDIAN_HOUSING_VALUE_KEY = "median_house_value"
 
 
 app = Flask(__name__)
 
+#one drift monitor per worker process, created on first request
+drift_monitor = None
+drift_monitor_config = None
+drift_monitor_lock = threading.Lock()
+training_sketches = dict()
+#training runs in the job runner process, web workers only enqueue
+job_queue = JobQueue(db_file_path=configuration().get_job_runner_config().job_db_file_path)
+#streams files and caches directory listings and compressed copies for every browser
+file_server = FileServer(file_server_config=configuration().get_file_server_config())
+#champion version exported by the last accepted run is served
+model_registry = ModelRegistry(db_file_path=configuration().get_model_registry_file_path())
+
+
+def get_drift_monitor() -> DriftMonitor:
+    global drift_monitor, drift_monitor_config
+    if drift_monitor is None:
+        #threaded workers must not create two monitors and lose the requests recorded in one of them
+        with drift_monitor_lock:
+            if drift_monitor is None:
+                drift_monitor_config = configuration().get_drift_monitor_config()
+                schema = read_yaml_file(file_path=drift_monitor_config.schema_file_path)
+                drift_monitor = DriftMonitor(numerical_columns=schema["numerical_columns"],
+                                             categorical_columns=schema["categorical_columns"],
+                                             window_size=drift_monitor_config.window_size)
+    return drift_monitor
+
+
+def get_training_sketch(sketch_file_path: str) -> DatasetSketch:
+    """training sketches are immutable once exported, each one is loaded once per worker"""
+    if sketch_file_path not in training_sketches:
+        training_sketches[sketch_file_path] = DatasetSketch.load(sketch_file_path)
+    return training_sketches[sketch_file_path]
+
+
 @app.route('/artifact', defaults = {'req_path': 'housing'})
 @app.route('/artifact/<path:req_path>')
 def render_artifact_dir(req_path):
@@ -40,23 +82,27 @@ def render_artifact_dir(req_path):
     abs_path = os.path.join (req_path)
     print(abs_path)
 
+    # drift report pages are rendered from report json on first request
+    report_page = get_report_page_file_path(abs_path)
+    if report_page is not None:
+        return file_server.send(report_page, mimetype="text/html")
+
     # return 404 if path doesnt exist
     if not os.path.exists(abs_path):
         return abort(404)
     
     #check if path is a file and serve 
     if os.path.isfile(abs_path):
-        if ".html" in abs_path:
-            with open(abs_path, "r", encoding="utf-8") as file:
-                content = ''
-                for line in file.readlines():
-                    content = f"{content}{line}"
-                return content
-        return send_file(abs_path)
+        return file_server.send(abs_path)
     
     # show directory contents 
-    files = {os.path.join(abs_path, file_name): file_name for file_name in os.listdir(abs_path) if
+    files = {os.path.join(abs_path, file_name): file_name for file_name in file_server.list_dir(abs_path) if
              "artifact" in os.path.join(abs_path, file_name)}
+    data_validation_config = configuration().get_data_validation_config()
+    report_file_name = os.path.basename(data_validation_config.report_file_path)
+    report_page_file_name = os.path.basename(data_validation_config.report_page_file_path)
+    if report_file_name in files.values():
+        files[os.path.join(abs_path, report_page_file_name)] = report_page_file_name
 
     result = {
         "files": files,
@@ -65,6 +111,17 @@ def render_artifact_dir(req_path):
     }
     return render_template('files.html', result=result)
 
+def get_report_page_file_path(abs_path: str):
+    """returns cached drift report page for a request of report page next to a drift report json, else None"""
+    data_validation_config = configuration().get_data_validation_config()
+    if os.path.basename(abs_path) != os.path.basename(data_validation_config.report_page_file_path):
+        return None
+    report_file_path = os.path.join(os.path.dirname(abs_path), os.path.basename(data_validation_config.report_file_path))
+    if not os.path.isfile(report_file_path):
+        return None
+    return get_drift_report_page(report_file_path=report_file_path, page_cache_dir=data_validation_config.report_page_cache_dir)
+
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     try:
@@ -84,15 +141,37 @@ def view_experiment_history():
 
 @app.route('/train', methods=['GET', 'POST'])
 def train():
+    #the job runner builds the pipeline of the run, the page only reads the experiment store
+    job_id = job_queue.enqueue(kind=TRAIN_JOB)
+    message = f"Training job [{job_id}] queued."
+    context = {
+        "experiment": Pipeline.get_experiments_status().to_html(classes='table table-striped col-12'),
+        "jobs": job_queue.get_jobs().to_html(classes='table table-striped col-12'),
+        "message": message
+    }
+    return render_template('train.html', context=context)
+
+
+@app.route('/resume', methods=['GET', 'POST'])
+def resume():
+    """continues an incomplete run, time_stamp defaults to the latest one"""
     message = ""
-    pipeline = Pipeline(config=configuration(current_time_stamp=get_current_time_stamp()))
-    if not Pipeline.experiment.running_status:
-        message = "Training started."
-        pipeline.start()
+    time_stamp = request.values.get("time_stamp")
+    #checkpoints are listed without building a pipeline, it would create stores and artifact dirs for a new run
+    #a run with a queued or running job is not resumed again, two processes would write the same run
+    active_time_stamps = job_queue.get_active_time_stamps()
+    resumable_time_stamps = [resumable_time_stamp for resumable_time_stamp in Pipeline.get_resumable_time_stamps(config=configuration())
+                             if resumable_time_stamp not in active_time_stamps]
+    if time_stamp is None and len(resumable_time_stamps) > 0:
+        time_stamp = resumable_time_stamps[-1]
+    if time_stamp not in resumable_time_stamps:
+        message = f"No incomplete training run [{time_stamp}] to resume."
     else:
-        message = "Training is already in progress."
+        job_id = job_queue.enqueue(kind=RESUME_JOB, time_stamp=time_stamp)
+        message = f"Resume job [{job_id}] of training run [{time_stamp}] queued."
     context = {
-        "experiment": pipeline.get_experiments_status().to_html(classes='table table-striped col-12'),
+        "experiment": Pipeline.get_experiments_status().to_html(classes='table table-striped col-12'),
+        "jobs": job_queue.get_jobs().to_html(classes='table table-striped col-12'),
         "message": message
     }
     return render_template('train.html', context=context)
@@ -125,8 +204,10 @@ def predict():
                                    median_income=median_income,
                                    ocean_proximity=ocean_proximity,
                                    )
+        housing_input = housing_data.get_housing_data_as_dict()
+        get_drift_monitor().record({column: values[0] for column, values in housing_input.items()})
         housing_df = housing_data.get_housing_input_data_frame()
-        housing_predictor = HousingPredictor(model_dir=MODEL_DIR)
+        housing_predictor = HousingPredictor(model_dir=MODEL_DIR, model_registry=model_registry)
         median_housing_value = housing_predictor.predict(X=housing_df)
         context = {
             HOUSING_DATA_KEY: housing_data.get_housing_data_as_dict(),
@@ -136,6 +217,22 @@ def predict():
     return render_template("predict.html", context=context)
 
 
+@app.route('/drift', methods=['GET'])
+def drift():
+    try:
+        monitor = get_drift_monitor()
+        sketch_file_path = HousingPredictor(model_dir=MODEL_DIR, model_registry=model_registry).get_training_sketch_path()
+        if sketch_file_path is None:
+            return jsonify({"error": "No exported model with a training sketch"}), 404
+        report = monitor.get_drift_report(training_sketch=get_training_sketch(sketch_file_path),
+                                          drift_config=drift_monitor_config.drift_config)
+        report["training_sketch_file_path"] = sketch_file_path
+        return jsonify(report)
+    except Exception as e:
+        logging.exception(e)
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/saved_models', defaults={'req_path': 'saved_models'})
 @app.route('/saved_models/<path:req_path>')
 def saved_models_dir(req_path):
@@ -150,10 +247,10 @@ def saved_models_dir(req_path):
 
     # Check if path is a file and serve
     if os.path.isfile(abs_path):
-        return send_file(abs_path)
+        return file_server.send(abs_path)
 
     # Show directory contents
-    files = {os.path.join(abs_path, file): file for file in os.listdir(abs_path)}
+    files = {os.path.join(abs_path, file): file for file in file_server.list_dir(abs_path)}
 
     result = {
         "files": files,
@@ -182,6 +279,20 @@ def update_model_config():
         return str(e)
 
 
+def get_non_negative_arg(name: str, default: int = None) -> int:
+    """integer query argument, a value that is not a non negative integer aborts the request with 400"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        abort(400, description=f"{name} must be a non negative integer, got: {value}")
+    return number
+
+
 @app.route(f'/logs', defaults={'req_path': f'{LOG_FOLDER_NAME}'})
 @app.route(f'/{LOG_FOLDER_NAME}/<path:req_path>')
 def render_log_dir(req_path):
@@ -194,14 +305,28 @@ def render_log_dir(req_path):
     if not os.path.exists(abs_path):
         return abort(404)
 
-    # Check if path is a file and serve
+    # Check if path is a file and serve it with ?raw, one page of it, or records matching level and text from a byte offset
     if os.path.isfile(abs_path):
-        log_df = get_log_dataframe(abs_path)
-        context = {"log": log_df.to_html(classes="table-striped", index=False)}
+        if "raw" in request.args:
+            return file_server.send(abs_path)
+        log_reader = LogReader(abs_path)
+        min_level, text = request.args.get("level"), request.args.get("text")
+        context = {"level": min_level, "text": text}
+        if min_level or text:
+            search_result = log_reader.search(min_level=min_level, text=text, offset=get_non_negative_arg("offset", 0))
+            records = search_result.records
+            context.update(next_offset=search_result.next_offset, scanned_bytes=search_result.scanned_bytes)
+        elif "tail" in request.args:
+            records = log_reader.tail(line_count=get_non_negative_arg("tail"))
+        else:
+            log_page = log_reader.get_page(page=get_non_negative_arg("page", -1))
+            records = log_page.records
+            context.update(page=log_page.page, page_count=log_page.page_count, line_count=log_page.line_count)
+        context["log"] = get_records_dataframe(records).to_html(classes="table-striped", index=False)
         return render_template('log.html', context=context)
 
-    # Show directory contents
-    files = {os.path.join(abs_path, file): file for file in os.listdir(abs_path)}
+    # Show log files and compressed segments, not their indexes
+    files = {os.path.join(abs_path, file): file for file in file_server.list_dir(abs_path) if is_log_file(file)}
 
     result = {
         "files": files,
@@ -211,6 +336,18 @@ def render_log_dir(req_path):
     return render_template('log_files.html', result=result)
 
 
+@app.route('/logs/search')
+def search_log_files():
+    """records of every log file by level, text and time window, e.g. ?level=error&start=2022-06-01 10:00&end=2022-06-01 11"""
+    search_args = {"min_level": request.args.get("level"), "text": request.args.get("text"),
+                   "start_time": request.args.get("start"), "end_time": request.args.get("end")}
+    search_result = search_logs(LOG_FOLDER_NAME, cursor=request.args.get("cursor"), **search_args)
+    context = dict(search_args, next_cursor=search_result.next_offset, scanned_bytes=search_result.scanned_bytes,
+                   log=get_records_dataframe(search_result.records, columns=["file", *LOG_VIEW_COLUMNS])
+                   .to_html(classes="table-striped", index=False))
+    return render_template('log.html', context=context)
+
+
 if __name__ == "__main__":
     app.run()
 
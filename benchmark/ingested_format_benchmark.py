@@ -0,0 +1,68 @@
+"""
+Benchmarks parse time and memory of ingested train file stored as csv, parquet and feather
+for the reads done by each pipeline stage.
+
+usage: python benchmark/ingested_format_benchmark.py <housing.csv> [scale_factor]
+"""
+import os
+import sys
+import time
+import resource
+import tempfile
+import multiprocessing
+import pandas as pd
+from housing.constants import *
+from housing.util.util import read_yaml_file, read_dataset, apply_schema_dtypes, DatasetWriter
+
+SCHEMA_FILE_PATH = os.path.join(ROOT_DIR, CONFIG_DIR, "schema.yaml")
+
+
+def get_stage_columns(schema: dict) -> dict:
+    model_columns = schema[NUMERICAL_COLUMN_KEY] + schema[CATEGORICAL_COLUMN_KEY] + [schema[TARGET_COLUMN_KEY]]
+    return {
+        "data_validation": None,
+        "data_transformation": model_columns,
+        "model_evaluation": model_columns,
+    }
+
+
+def measure_read(file_path: str, columns: list, result_queue):
+    start_max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start_time = time.perf_counter()
+    dataframe = read_dataset(file_path=file_path, columns=columns)
+    if file_path.endswith(".csv"):
+        #csv loses dtypes hence stages have to cast it after parsing
+        dataframe = apply_schema_dtypes(dataframe, read_yaml_file(SCHEMA_FILE_PATH)[DATASET_SCHEMA_COLUMNS_KEY])
+    parse_time = time.perf_counter() - start_time
+    peak_rss_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_max_rss) / 1024
+    result_queue.put((parse_time, peak_rss_mb, dataframe.memory_usage(deep=True).sum() / 2 ** 20))
+
+
+def main(source_file_path: str, scale_factor: int):
+    schema = read_yaml_file(SCHEMA_FILE_PATH)
+    source_df = apply_schema_dtypes(pd.read_csv(source_file_path), schema[DATASET_SCHEMA_COLUMNS_KEY])
+
+    with tempfile.TemporaryDirectory() as benchmark_dir:
+        file_paths = {}
+        for file_format, extension in DATASET_FILE_FORMAT_EXTENSIONS.items():
+            file_paths[file_format] = os.path.join(benchmark_dir, f"housing{extension}")
+            with DatasetWriter(file_path=file_paths[file_format]) as writer:
+                for _ in range(scale_factor):
+                    writer.write(source_df)
+
+        print(f"rows: {len(source_df) * scale_factor}")
+        print(f"{'stage':<22}{'format':<10}{'file MB':>10}{'parse s':>10}{'peak rss MB':>14}{'frame MB':>11}")
+        context = multiprocessing.get_context("spawn")
+        for stage, columns in get_stage_columns(schema).items():
+            for file_format, file_path in file_paths.items():
+                result_queue = context.Queue()
+                process = context.Process(target=measure_read, args=(file_path, columns, result_queue))
+                process.start()
+                parse_time, peak_rss_mb, frame_mb = result_queue.get()
+                process.join()
+                file_mb = os.path.getsize(file_path) / 2 ** 20
+                print(f"{stage:<22}{file_format:<10}{file_mb:>10.1f}{parse_time:>10.3f}{peak_rss_mb:>14.1f}{frame_mb:>11.1f}")
+
+
+if __name__ == "__main__":
+    main(source_file_path=sys.argv[1], scale_factor=int(sys.argv[2]) if len(sys.argv) > 2 else 50)
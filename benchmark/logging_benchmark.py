@@ -0,0 +1,103 @@
+"""
+Benchmarks logging throughput of the synchronous file handler used before and of the queue
+handler with its background json lines writer, as seen by the logging threads and until
+every record is on disk.
+
+usage: python benchmark/logging_benchmark.py [records_per_thread] [thread_count] [fsync]
+
+fsync syncs every record to disk, as a stand in for slow or network storage
+"""
+import os
+import sys
+import time
+import queue
+import logging
+import tempfile
+import threading
+import multiprocessing
+from logging.handlers import QueueListener
+from housing.logger import JsonFormatter, RenderingQueueHandler, ModuleLevelFilter, DebugSamplingFilter
+
+LEGACY_FORMAT = '[%(asctime)s]^;%(levelname)s^;%(lineno)s^;%(filename)s^;%(funcName)s^;%(message)s'
+
+
+class FsyncFileHandler(logging.FileHandler):
+
+    def emit(self, record: logging.LogRecord):
+        super().emit(record)
+        os.fsync(self.stream.fileno())
+
+
+def get_file_handler(log_file_path: str, fsync: bool) -> logging.FileHandler:
+    return (FsyncFileHandler if fsync else logging.FileHandler)(log_file_path, mode="w")
+
+
+def get_sync_logger(log_file_path: str, fsync: bool):
+    file_handler = get_file_handler(log_file_path, fsync)
+    file_handler.setFormatter(logging.Formatter(LEGACY_FORMAT))
+    return file_handler, None
+
+
+def get_queue_logger(log_file_path: str, fsync: bool):
+    file_handler = get_file_handler(log_file_path, fsync)
+    file_handler.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    queue_handler = RenderingQueueHandler(log_queue)
+    queue_handler.addFilter(ModuleLevelFilter(default_level=logging.INFO, module_levels={}))
+    queue_handler.addFilter(DebugSamplingFilter(sample_rate=1))
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+    return queue_handler, listener
+
+
+HANDLERS = {
+    "sync file handler (before)": get_sync_logger,
+    "queue + json lines": get_queue_logger,
+}
+
+
+def log_records(logger: logging.Logger, record_count: int):
+    for index in range(record_count):
+        logger.info(f"{'>>' * 30} Started evaluating model :[{index}] {'<<' * 30}")
+
+
+def measure_logging(handler_name: str, record_count: int, thread_count: int, fsync: bool, result_queue):
+    with tempfile.TemporaryDirectory() as benchmark_dir:
+        log_file_path = os.path.join(benchmark_dir, "benchmark.log")
+        handler, listener = HANDLERS[handler_name](log_file_path, fsync)
+        logger = logging.getLogger("benchmark")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        threads = [threading.Thread(target=log_records, args=(logger, record_count)) for _ in range(thread_count)]
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        caller_time = time.perf_counter() - start_time
+        if listener is not None:
+            listener.stop()
+        handler.close()
+        flushed_time = time.perf_counter() - start_time
+        result_queue.put((caller_time, flushed_time, os.path.getsize(log_file_path) / 2 ** 20))
+
+
+def main(record_count: int, thread_count: int, fsync: bool):
+    total_count = record_count * thread_count
+    print(f"records: {total_count} from {thread_count} threads, fsync: {fsync}")
+    print(f"{'handler':<30}{'caller s':>10}{'records/s':>12}{'flushed s':>11}{'file MB':>9}")
+    context = multiprocessing.get_context("spawn")
+    for handler_name in HANDLERS:
+        result_queue = context.Queue()
+        process = context.Process(target=measure_logging, args=(handler_name, record_count, thread_count, fsync, result_queue))
+        process.start()
+        caller_time, flushed_time, file_mb = result_queue.get()
+        process.join()
+        print(f"{handler_name:<30}{caller_time:>10.3f}{total_count / caller_time:>12.0f}{flushed_time:>11.3f}{file_mb:>9.1f}")
+
+
+if __name__ == "__main__":
+    main(record_count=int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+         thread_count=int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+         fsync=len(sys.argv) > 3 and sys.argv[3] == "fsync")
@@ -0,0 +1,65 @@
+"""
+Benchmarks load_data on a scaled up housing csv: default inferred parsing against
+schema typed parsing with the c and pyarrow engines.
+
+usage: python benchmark/typed_csv_load_benchmark.py <housing.csv> [scale_factor]
+"""
+import os
+import sys
+import time
+import resource
+import tempfile
+import multiprocessing
+import pandas as pd
+from housing.constants import *
+from housing.util.util import load_data
+
+SCHEMA_FILE_PATH = os.path.join(ROOT_DIR, CONFIG_DIR, "schema.yaml")
+
+
+def load_inferred(file_path: str) -> pd.DataFrame:
+    return pd.read_csv(file_path)
+
+
+def load_typed(file_path: str, engine: str = None) -> pd.DataFrame:
+    return load_data(file_path=file_path, schema_file_path=SCHEMA_FILE_PATH, engine=engine)
+
+
+LOADERS = {
+    "inferred (before)": (load_inferred, {}),
+    "typed c engine": (load_typed, {"engine": "c"}),
+    "typed pyarrow engine": (load_typed, {"engine": "pyarrow"}),
+}
+
+
+def measure_load(loader_name: str, file_path: str, result_queue):
+    loader, kwargs = LOADERS[loader_name]
+    start_max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start_time = time.perf_counter()
+    dataframe = loader(file_path, **kwargs)
+    parse_time = time.perf_counter() - start_time
+    peak_rss_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_max_rss) / 1024
+    result_queue.put((parse_time, peak_rss_mb, dataframe.memory_usage(deep=True).sum() / 2 ** 20))
+
+
+def main(source_file_path: str, scale_factor: int):
+    source_df = pd.read_csv(source_file_path)
+    with tempfile.TemporaryDirectory() as benchmark_dir:
+        file_path = os.path.join(benchmark_dir, "housing.csv")
+        for index in range(scale_factor):
+            source_df.to_csv(file_path, index=False, mode="a", header=index == 0)
+
+        print(f"rows: {len(source_df) * scale_factor}, file MB: {os.path.getsize(file_path) / 2 ** 20:.1f}")
+        print(f"{'loader':<24}{'parse s':>10}{'peak rss MB':>14}{'frame MB':>11}")
+        context = multiprocessing.get_context("spawn")
+        for loader_name in LOADERS:
+            result_queue = context.Queue()
+            process = context.Process(target=measure_load, args=(loader_name, file_path, result_queue))
+            process.start()
+            parse_time, peak_rss_mb, frame_mb = result_queue.get()
+            process.join()
+            print(f"{loader_name:<24}{parse_time:>10.3f}{peak_rss_mb:>14.1f}{frame_mb:>11.1f}")
+
+
+if __name__ == "__main__":
+    main(source_file_path=sys.argv[1], scale_factor=int(sys.argv[2]) if len(sys.argv) > 2 else 50)
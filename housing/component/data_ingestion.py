@@ -1,13 +1,96 @@
 from housing.entity.config_entity import DataIngetionConfig
 import sys,os
 from housing.exception import HousingException
-from housing.logger import logging
+from housing.logger import logging, start_worker_log_listener, forward_worker_logging
 from housing.entity.artifact_entity import DataIngestionArtifact
+from housing.constants import *
+from housing.util.util import read_yaml_file, write_yaml_file, DatasetWriter, get_dataset_column_names, iter_dataset_chunks, apply_schema_dtypes
 import tarfile
+import glob
+import shutil
+import hashlib
+import importlib
 import numpy as np
 import pandas as pd
-from six.moves import urllib
-from sklearn.model_selection import StratifiedShuffleSplit
+import urllib.request
+import urllib.error
+from urllib.parse import urlparse
+from housing.util.stratified_split import get_row_keys, get_empty_histogram, update_strata_histogram, get_split_plan, \
+    get_split_assignment, get_boundary_test_mask, get_test_mask, SPLIT_TRAIN, SPLIT_TEST, SPLIT_BOUNDARY
+from housing.util.sketch import DatasetSketch, get_sketch_file_path
+from housing.util.dataset_handle import DatasetHandle
+from concurrent.futures import ProcessPoolExecutor
+
+
+class HashingReader:
+    """file like wrapper which computes sha256 of every byte read through it"""
+
+    def __init__(self, file_obj):
+        self.file_obj = file_obj
+        self.sha256 = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.file_obj.read(size)
+        self.sha256.update(chunk)
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def drain(self):
+        """reads the remaining bytes so that hexdigest covers whole source"""
+        while self.read(DOWNLOAD_CHUNK_SIZE):
+            pass
+
+    def hexdigest(self) -> str:
+        return self.sha256.hexdigest()
+
+
+def iter_shard_chunks(shard_path: str, source_id: int, chunk_size: int, schema_columns: dict):
+    """yields (row_keys, chunk) of one raw data shard after checking its header against schema"""
+    shard_columns = get_dataset_column_names(shard_path)
+    if sorted(shard_columns) != sorted(schema_columns.keys()):
+        raise Exception(f"Columns of shard [{shard_path}]: {shard_columns} do not match schema columns: {list(schema_columns.keys())}")
+    start_row = 0
+    for chunk in iter_dataset_chunks(file_path=shard_path, chunk_size=chunk_size, dtype=schema_columns):
+        yield get_row_keys(start_row=start_row, row_count=len(chunk), source_id=source_id), chunk
+        start_row += len(chunk)
+
+
+def count_shard_strata(task: tuple):
+    """process pool task of pass 1, returns (histogram, row count) of one shard"""
+    shard_path, source_id, chunk_size, random_state, schema_columns = task
+    try:
+        histogram = get_empty_histogram()
+        row_count = 0
+        for row_keys, chunk in iter_shard_chunks(shard_path, source_id, chunk_size, schema_columns):
+            update_strata_histogram(histogram=histogram, median_income=chunk["median_income"],
+                                    row_keys=row_keys, random_state=random_state)
+            row_count += len(chunk)
+        return histogram, row_count
+    except Exception as e:
+        #plain exception as HousingException can not be pickled back to parent process
+        raise Exception(f"Counting strata of shard [{shard_path}] failed: {e}") from None
+
+
+def split_shard(task: tuple):
+    """process pool task of pass 2, writes train, test and boundary part files of one shard and returns their paths"""
+    shard_path, source_id, chunk_size, random_state, schema_columns, domain_values, split_plan, part_dir, file_extension = task
+    try:
+        part_paths = [os.path.join(part_dir, f"{part_name}-{source_id:06d}{file_extension}")
+                      for part_name in ["train", "test", "boundary"]]
+        with DatasetWriter(part_paths[0], categories=domain_values) as train_writer, \
+                DatasetWriter(part_paths[1], categories=domain_values) as test_writer, \
+                DatasetWriter(part_paths[2], categories=domain_values) as boundary_writer:
+            for row_keys, chunk in iter_shard_chunks(shard_path, source_id, chunk_size, schema_columns):
+                split_assignment = get_split_assignment(split_plan=split_plan, median_income=chunk["median_income"],
+                                                        row_keys=row_keys, random_state=random_state)
+                train_writer.write(chunk[split_assignment == SPLIT_TRAIN])
+                test_writer.write(chunk[split_assignment == SPLIT_TEST])
+                boundary_writer.write(chunk[split_assignment == SPLIT_BOUNDARY])
+        return tuple(part_paths)
+    except Exception as e:
+        raise Exception(f"Splitting shard [{shard_path}] failed: {e}") from None
+
 
 class DataIngestion:
 
@@ -15,90 +98,246 @@ class DataIngestion:
         try:
             logging.info(f"{'>>'*20}Data Ingestion log Started.{'<<'*20}")
             self.data_ingestion_config = data_ingestion_config
+            self.dataset_sha256 = None
+            self.source_validators = dict()
         except Exception as e :
             raise HousingException(sys,e) from e 
-        
-    def download_housing_data(self,)->str:
-        try:
-            #extracting remote url to download dataset
-            download_url= self.data_ingestion_config.dataset_download_url
-
-            #folder to keep downloaded file
-            tgz_download_dir = self.data_ingestion_config.tgz_download_dir
-
-            os.makedirs(tgz_download_dir,exist_ok=True)
 
-            housing_file_name= os.path.basename(download_url)
-
-            tgz_file_path= os.path.join(tgz_download_dir,housing_file_name)
+    def get_source_id(self)->str:
+        """identifies dataset source in ingestion state"""
+        if self.data_ingestion_config.source_type == SQL_SOURCE_TYPE:
+            sql_source = self.data_ingestion_config.sql_source
+            return f"{sql_source.driver}:{sql_source.connect_args}:{sql_source.table}"
+        return self.data_ingestion_config.dataset_download_url
+
+    def get_local_source_path(self):
+        """returns file system path of dataset_download_url if it is a local path or file:// url else None"""
+        download_url= self.data_ingestion_config.dataset_download_url
+        parsed_url = urlparse(download_url)
+        if parsed_url.scheme == "file":
+            return urllib.request.url2pathname(parsed_url.path)
+        if parsed_url.scheme == "" or os.path.exists(download_url):
+            return download_url
+        return None
+
+    def get_last_ingestion_state(self)->dict:
+        try:
+            ingestion_state_file_path = self.data_ingestion_config.ingestion_state_file_path
+            if not os.path.exists(ingestion_state_file_path):
+                return dict()
+            ingestion_state = read_yaml_file(file_path=ingestion_state_file_path)
+            ingestion_state = dict() if ingestion_state is None else ingestion_state
+
+            #state is only usable if it was produced from same source and its split files still exist
+            if ingestion_state.get(INGESTION_STATE_URL_KEY) != self.get_source_id():
+                return dict()
+            for key in [INGESTION_STATE_TRAIN_FILE_PATH_KEY, INGESTION_STATE_TEST_FILE_PATH_KEY,
+                        INGESTION_STATE_TRAIN_SKETCH_FILE_PATH_KEY, INGESTION_STATE_TEST_SKETCH_FILE_PATH_KEY]:
+                if not os.path.exists(str(ingestion_state.get(key))):
+                    return dict()
+            return ingestion_state
+        except Exception as e:
+            raise HousingException(e,sys) from e
 
-            logging.info(f"Downloading file from :[{download_url}] into :[{tgz_file_path}]")
-            urllib.request.urlretrieve(download_url,tgz_file_path)
-            logging.info(f"file :[{tgz_file_path}] has been downloaded successfully")
-            return tgz_file_path
-        
-        except Exception as e :
-            raise HousingException(sys,e) from e
-        
+    def save_ingestion_state(self, data_ingestion_artifact: DataIngestionArtifact):
+        try:
+            ingestion_state = {
+                INGESTION_STATE_URL_KEY: self.get_source_id(),
+                INGESTION_STATE_SHA256_KEY: data_ingestion_artifact.dataset_sha256,
+                INGESTION_STATE_TRAIN_FILE_PATH_KEY: data_ingestion_artifact.train_file_path,
+                INGESTION_STATE_TEST_FILE_PATH_KEY: data_ingestion_artifact.test_file_path,
+                INGESTION_STATE_TRAIN_SKETCH_FILE_PATH_KEY: data_ingestion_artifact.train_sketch_file_path,
+                INGESTION_STATE_TEST_SKETCH_FILE_PATH_KEY: data_ingestion_artifact.test_sketch_file_path,
+            }
+            ingestion_state.update(self.source_validators)
+            write_yaml_file(file_path=self.data_ingestion_config.ingestion_state_file_path, data=ingestion_state)
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def get_reused_ingestion_artifact(self, ingestion_state: dict)->DataIngestionArtifact:
+        data_ingestion_artifact = DataIngestionArtifact(train_file_path=ingestion_state[INGESTION_STATE_TRAIN_FILE_PATH_KEY],
+                                                        test_file_path=ingestion_state[INGESTION_STATE_TEST_FILE_PATH_KEY],
+                                                        is_ingested=True,
+                                                        message=f"dataset unchanged since last ingestion, reusing ingested data",
+                                                        dataset_sha256=ingestion_state[INGESTION_STATE_SHA256_KEY],
+                                                        train_sketch_file_path=ingestion_state[INGESTION_STATE_TRAIN_SKETCH_FILE_PATH_KEY],
+                                                        test_sketch_file_path=ingestion_state[INGESTION_STATE_TEST_SKETCH_FILE_PATH_KEY],
+                                                        dataset=self.get_dataset_handle(train_file_path=ingestion_state[INGESTION_STATE_TRAIN_FILE_PATH_KEY],
+                                                                                        test_file_path=ingestion_state[INGESTION_STATE_TEST_FILE_PATH_KEY]))
+        logging.info(f"Data Ingestion artifact:[{data_ingestion_artifact}]")
+        return data_ingestion_artifact
+
+    def get_dataset_handle(self, train_file_path: str, test_file_path: str)->DatasetHandle:
+        """lazily loaded dataset shared by all later stages of the run"""
+        return DatasetHandle(train_file_path=train_file_path, test_file_path=test_file_path,
+                             schema_file_path=self.data_ingestion_config.schema_file_path,
+                             cache_size_bytes=self.data_ingestion_config.dataset_cache_size_bytes)
+
+    @staticmethod
+    def get_file_sha256(file_path: str)->str:
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as file_obj:
+            for chunk in iter(lambda: file_obj.read(DOWNLOAD_CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def open_dataset_source(self, ingestion_state: dict):
+        """
+        opens dataset_download_url for streaming
+        return: readable file object or None if source is unchanged since last ingestion
+        """
+        try:
+            download_url= self.data_ingestion_config.dataset_download_url
+            local_source_path = self.get_local_source_path()
+
+            if local_source_path is not None:
+                #hashing local file is far cheaper than extracting and splitting it again
+                if len(ingestion_state) > 0 and \
+                        DataIngestion.get_file_sha256(local_source_path) == ingestion_state[INGESTION_STATE_SHA256_KEY]:
+                    return None
+                logging.info(f"Reading dataset from local file :[{local_source_path}]")
+                return open(local_source_path, "rb")
+
+            request = urllib.request.Request(download_url)
+            if ingestion_state.get(INGESTION_STATE_ETAG_KEY):
+                request.add_header("If-None-Match", ingestion_state[INGESTION_STATE_ETAG_KEY])
+            if ingestion_state.get(INGESTION_STATE_LAST_MODIFIED_KEY):
+                request.add_header("If-Modified-Since", ingestion_state[INGESTION_STATE_LAST_MODIFIED_KEY])
+
+            try:
+                response = urllib.request.urlopen(request)
+            except urllib.error.HTTPError as e:
+                if e.code == 304:
+                    return None
+                raise e
+
+            self.source_validators = {
+                INGESTION_STATE_ETAG_KEY: response.headers.get("ETag"),
+                INGESTION_STATE_LAST_MODIFIED_KEY: response.headers.get("Last-Modified"),
+            }
+            logging.info(f"Streaming dataset from :[{download_url}]")
+            return response
+        except Exception as e:
+            raise HousingException(e,sys) from e
 
-    def extract_tgz_file(self,tgz_file_path:str):
+    def download_and_extract_housing_data(self, source_file_obj)->str:
+        """
+        streams source archive straight into tar extractor without keeping a copy of archive on disk
+        return: sha256 of streamed archive
+        """
         try:
             raw_data_dir = self.data_ingestion_config.raw_data_dir
 
             if os.path.exists(raw_data_dir):
-                os.remove(raw_data_dir)
+                shutil.rmtree(raw_data_dir)
 
             os.makedirs(raw_data_dir,exist_ok=True)
 
-            logging.info(f"Extracting tgz file :[{tgz_file_path}] into dir:[{raw_data_dir}]")
-            with tarfile.open(tgz_file_path) as housing_tgz_file_obj:
-                housing_tgz_file_obj.extractall(path=raw_data_dir)
+            logging.info(f"Extracting streamed archive into dir:[{raw_data_dir}]")
+            hashing_reader = HashingReader(source_file_obj)
+            with tarfile.open(fileobj=hashing_reader, mode="r|*") as housing_tgz_file_obj:
+                if hasattr(tarfile, "data_filter"):
+                    housing_tgz_file_obj.extractall(path=raw_data_dir, filter="data")
+                else:
+                    housing_tgz_file_obj.extractall(path=raw_data_dir)
+            hashing_reader.drain()
 
-            logging.info(f"Extracted completely")
+            logging.info(f"Extracted completely, read [{hashing_reader.bytes_read}] bytes with sha256 [{hashing_reader.hexdigest()}]")
+            return hashing_reader.hexdigest()
 
         except Exception as e :
             raise HousingException(e,sys) from e 
+        finally:
+            source_file_obj.close()
         
-    def split_data_as_train_test(self)-> DataIngestionArtifact:
-        try: 
+    def get_raw_data_shards(self)->list:
+        """returns every raw data file matching raw_file_pattern, in a stable order"""
+        try:
             raw_data_dir= self.data_ingestion_config.raw_data_dir
+            shard_paths = sorted(glob.glob(os.path.join(raw_data_dir, "**", self.data_ingestion_config.raw_file_pattern), recursive=True))
+            if len(shard_paths) == 0:
+                raise Exception(f"No raw data file matching [{self.data_ingestion_config.raw_file_pattern}] found in [{raw_data_dir}]")
+            return shard_paths
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def map_shards(self, function, task_list: list):
+        """runs function over shard tasks in a process pool, results are yielded in task order"""
+        max_workers = min(self.data_ingestion_config.max_workers or os.cpu_count() or 1, len(task_list))
+        if max_workers <= 1:
+            yield from map(function, task_list)
+            return
+        log_listener = start_worker_log_listener()
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=forward_worker_logging,
+                                     initargs=(log_listener.queue,)) as executor:
+                yield from executor.map(function, task_list)
+        finally:
+            log_listener.stop()
 
-            file_name= os.listdir(raw_data_dir)[0]
-
-            housing_file_path= os.path.join(raw_data_dir,file_name)
-
-            logging.info(f"Reading csv file:[{housing_file_path}]")
-            housing_data_frame= pd.read_csv(housing_file_path)
-
-            housing_data_frame["income_cat"]= pd.cut(housing_data_frame["median_income"],bins=[0.0,1.5,3.0,4.5,6.0, np.inf],labels=[1,2,3,4,5])
-
-
-            logging.info(f"splitting data into train and test")
-
-            strat_train_set = None
-            strat_test_set = None 
-
-            split =  StratifiedShuffleSplit(n_split= 1, test_size=0.2, random_state= 42)
-
-            for train_index,test_index in split.split(housing_data_frame,housing_data_frame["income_cat"]):
-                strat_train_set= housing_data_frame.loc[train_index].drop(["income_cat"],axis=1)
-                strat_test_set=housing_data_frame.loc[test_index].drop(["income_cat"],axis=1)
-
-            train_file_path= os.path.join(self.data_ingestion_config.ingested_train_dir,file_name)
-            test_file_path = os.path.join(self.data_ingestion_config.ingested_test_dir,file_name)
-
-            if strat_train_set is not None:
-                os.makedirs(self.data_ingestion_config.ingested_train_dir,exist_ok=True)
-                logging.info(f"Exporting training dataset to file:[{train_file_path}]")
-                strat_train_set.to_csv(train_file_path,index = False)
-
-            if strat_test_set is not None:
-                os.makedirs(self.data_ingestion_config.ingested_test_dir, exist_ok=True)
-                logging.info(f"Exporting test dataset to file :[{test_file_path}]")
-                strat_test_set.to_csv(test_file_path,index=True)
-            
-
-            data_ingestion_artifact = DataIngestionArtifact(train_file_path=train_file_path,test_file_path=test_file_path, is_ingested=True,message=f"data ingested successfully")
+    def split_data_as_train_test(self)-> DataIngestionArtifact:
+        try: 
+            random_state = self.data_ingestion_config.random_state
+            chunk_size = self.data_ingestion_config.chunk_size
+            dataset_schema = read_yaml_file(file_path=self.data_ingestion_config.schema_file_path)
+            schema_columns = dataset_schema[DATASET_SCHEMA_COLUMNS_KEY]
+            #every chunk of a category column is written with the categories of its schema domain
+            domain_values = dataset_schema.get(DATASET_SCHEMA_DOMAIN_VALUE_KEY) or dict()
+            file_extension = DATASET_FILE_FORMAT_EXTENSIONS[self.data_ingestion_config.ingested_file_format]
+
+            shard_paths = self.get_raw_data_shards()
+            logging.info(f"Found [{len(shard_paths)}] raw data shards, counting median_income strata")
+
+            histogram = get_empty_histogram()
+            row_count = 0
+            count_tasks = [(shard_path, source_id, chunk_size, random_state, schema_columns)
+                           for source_id, shard_path in enumerate(shard_paths)]
+            for shard_histogram, shard_row_count in self.map_shards(count_shard_strata, count_tasks):
+                histogram += shard_histogram
+                row_count += shard_row_count
+
+            split_plan = get_split_plan(histogram=histogram, test_size=self.data_ingestion_config.test_size)
+            logging.info(f"splitting [{row_count}] rows into [{split_plan.train_row_count}] train and [{split_plan.test_row_count}] test rows")
+
+            ingested_file_name = f"{os.path.splitext(os.path.basename(shard_paths[0]))[0]}{file_extension}"
+            train_file_path= os.path.join(self.data_ingestion_config.ingested_train_dir,ingested_file_name)
+            test_file_path = os.path.join(self.data_ingestion_config.ingested_test_dir,ingested_file_name)
+
+            part_dir = os.path.join(os.path.dirname(self.data_ingestion_config.ingested_train_dir), INGESTION_PART_DIR_NAME)
+            split_tasks = [(shard_path, source_id, chunk_size, random_state, schema_columns, domain_values, split_plan, part_dir, file_extension)
+                           for source_id, shard_path in enumerate(shard_paths)]
+
+            logging.info(f"Exporting training dataset to file:[{train_file_path}] and test dataset to file :[{test_file_path}]")
+            boundary_taken = np.zeros_like(split_plan.boundary_quota)
+            train_sketch, test_sketch = self.get_dataset_sketch(), self.get_dataset_sketch()
+            with DatasetWriter(file_path=train_file_path, categories=domain_values) as train_writer, \
+                    DatasetWriter(file_path=test_file_path, categories=domain_values) as test_writer:
+                #shards are split in parallel, their parts are appended in shard order so output is deterministic
+                for train_part_path, test_part_path, boundary_part_path in self.map_shards(split_shard, split_tasks):
+                    for chunk in iter_dataset_chunks(file_path=train_part_path, chunk_size=chunk_size):
+                        train_writer.write(chunk)
+                        train_sketch.update(chunk)
+                    for chunk in iter_dataset_chunks(file_path=test_part_path, chunk_size=chunk_size):
+                        test_writer.write(chunk)
+                        test_sketch.update(chunk)
+                    for chunk in iter_dataset_chunks(file_path=boundary_part_path, chunk_size=chunk_size):
+                        test_mask = get_boundary_test_mask(split_plan=split_plan, median_income=chunk["median_income"],
+                                                           boundary_taken=boundary_taken)
+                        train_writer.write(chunk[~test_mask])
+                        test_writer.write(chunk[test_mask])
+                        train_sketch.update(chunk[~test_mask])
+                        test_sketch.update(chunk[test_mask])
+                    for part_path in [train_part_path, test_part_path, boundary_part_path]:
+                        os.remove(part_path)
+            shutil.rmtree(part_dir, ignore_errors=True)
+            train_sketch_file_path, test_sketch_file_path = self.save_dataset_sketches(train_file_path=train_file_path, test_file_path=test_file_path,
+                                                                                       train_sketch=train_sketch, test_sketch=test_sketch)
+
+            data_ingestion_artifact = DataIngestionArtifact(train_file_path=train_file_path,test_file_path=test_file_path, is_ingested=True,message=f"data ingested successfully",
+                                                            dataset_sha256=self.dataset_sha256,
+                                                            train_sketch_file_path=train_sketch_file_path,
+                                                            test_sketch_file_path=test_sketch_file_path,
+                                                            dataset=self.get_dataset_handle(train_file_path=train_file_path, test_file_path=test_file_path))
 
             logging.info(f"Data Ingestion artifact:[{data_ingestion_artifact}]")
 
@@ -107,11 +346,137 @@ class DataIngestion:
         except Exception as e:
             raise HousingException(e,sys) from e 
         
+    def get_dataset_sketch(self)->DatasetSketch:
+        """empty sketch of schema columns, filled chunk by chunk while a split file is written"""
+        try:
+            schema = read_yaml_file(file_path=self.data_ingestion_config.schema_file_path)
+            return DatasetSketch(numerical_columns=schema[NUMERICAL_COLUMN_KEY] + [schema[TARGET_COLUMN_KEY]],
+                                 categorical_columns=schema[CATEGORICAL_COLUMN_KEY],
+                                 relative_accuracy=self.data_ingestion_config.sketch_relative_accuracy)
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def save_dataset_sketches(self, train_file_path: str, test_file_path: str, train_sketch: DatasetSketch, test_sketch: DatasetSketch):
+        train_sketch_file_path = get_sketch_file_path(train_file_path)
+        test_sketch_file_path = get_sketch_file_path(test_file_path)
+        train_sketch.save(train_sketch_file_path)
+        test_sketch.save(test_sketch_file_path)
+        logging.info(f"Saved dataset sketches to [{train_sketch_file_path}] and [{test_sketch_file_path}]")
+        return train_sketch_file_path, test_sketch_file_path
+
+    def get_sql_connection(self):
+        """opens DB-API connection using driver module and connect_args of sql_source config"""
+        try:
+            sql_source = self.data_ingestion_config.sql_source
+            driver = importlib.import_module(sql_source.driver)
+            return driver.connect(**sql_source.connect_args)
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def iter_sql_batches(self, schema_columns: dict):
+        """
+        yields (row_keys, chunk) of sql_source table in batches of batch_size rows, one batch in memory at a time
+        rows are ordered by order_by so that row keys are stable across both passes
+        """
+        sql_source = self.data_ingestion_config.sql_source
+        column_names = list(schema_columns.keys())
+        query = f"SELECT {', '.join(column_names)} FROM {sql_source.table} ORDER BY {sql_source.order_by}"
+
+        connection = self.get_sql_connection()
+        try:
+            #named cursors are server side cursors for drivers supporting them e.g. psycopg2
+            cursor = connection.cursor(sql_source.cursor_name) if sql_source.cursor_name else connection.cursor()
+            cursor.arraysize = sql_source.batch_size
+            cursor.execute(query)
+            start_row = 0
+            while True:
+                rows = cursor.fetchmany(sql_source.batch_size)
+                if len(rows) == 0:
+                    break
+                chunk = apply_schema_dtypes(dataframe=pd.DataFrame.from_records(rows, columns=column_names), schema_columns=schema_columns)
+                yield get_row_keys(start_row=start_row, row_count=len(chunk)), chunk
+                start_row += len(chunk)
+            cursor.close()
+        finally:
+            connection.close()
+
+    def split_sql_data_as_train_test(self, ingestion_state: dict)-> DataIngestionArtifact:
+        """two pass split streamed straight from sql_source table into ingested train and test files"""
+        try:
+            random_state = self.data_ingestion_config.random_state
+            dataset_schema = read_yaml_file(file_path=self.data_ingestion_config.schema_file_path)
+            schema_columns = dataset_schema[DATASET_SCHEMA_COLUMNS_KEY]
+            #every chunk of a category column is written with the categories of its schema domain
+            domain_values = dataset_schema.get(DATASET_SCHEMA_DOMAIN_VALUE_KEY) or dict()
+            sql_source = self.data_ingestion_config.sql_source
+
+            logging.info(f"Counting median_income strata of table:[{sql_source.table}]")
+            histogram = get_empty_histogram()
+            sha256 = hashlib.sha256()
+            for row_keys, chunk in self.iter_sql_batches(schema_columns=schema_columns):
+                update_strata_histogram(histogram=histogram, median_income=chunk["median_income"],
+                                        row_keys=row_keys, random_state=random_state)
+                sha256.update(pd.util.hash_pandas_object(chunk, index=False).values.tobytes())
+            self.dataset_sha256 = sha256.hexdigest()
+
+            if len(ingestion_state) > 0 and self.dataset_sha256 == ingestion_state[INGESTION_STATE_SHA256_KEY]:
+                logging.info(f"Table content is identical to last ingestion, skipping split")
+                return self.get_reused_ingestion_artifact(ingestion_state=ingestion_state)
+
+            split_plan = get_split_plan(histogram=histogram, test_size=self.data_ingestion_config.test_size)
+            logging.info(f"splitting data into [{split_plan.train_row_count}] train and [{split_plan.test_row_count}] test rows")
+
+            ingested_file_name = f"{sql_source.table}{DATASET_FILE_FORMAT_EXTENSIONS[self.data_ingestion_config.ingested_file_format]}"
+            train_file_path= os.path.join(self.data_ingestion_config.ingested_train_dir,ingested_file_name)
+            test_file_path = os.path.join(self.data_ingestion_config.ingested_test_dir,ingested_file_name)
+
+            logging.info(f"Exporting training dataset to file:[{train_file_path}] and test dataset to file :[{test_file_path}]")
+            boundary_taken = np.zeros_like(split_plan.boundary_quota)
+            train_sketch, test_sketch = self.get_dataset_sketch(), self.get_dataset_sketch()
+            with DatasetWriter(file_path=train_file_path, categories=domain_values) as train_writer, \
+                    DatasetWriter(file_path=test_file_path, categories=domain_values) as test_writer:
+                for row_keys, chunk in self.iter_sql_batches(schema_columns=schema_columns):
+                    test_mask = get_test_mask(split_plan=split_plan, median_income=chunk["median_income"],
+                                              row_keys=row_keys, random_state=random_state, boundary_taken=boundary_taken)
+                    train_writer.write(chunk[~test_mask])
+                    test_writer.write(chunk[test_mask])
+                    train_sketch.update(chunk[~test_mask])
+                    test_sketch.update(chunk[test_mask])
+            train_sketch_file_path, test_sketch_file_path = self.save_dataset_sketches(train_file_path=train_file_path, test_file_path=test_file_path,
+                                                                                       train_sketch=train_sketch, test_sketch=test_sketch)
+
+            data_ingestion_artifact = DataIngestionArtifact(train_file_path=train_file_path,test_file_path=test_file_path, is_ingested=True,message=f"data ingested successfully",
+                                                            dataset_sha256=self.dataset_sha256,
+                                                            train_sketch_file_path=train_sketch_file_path,
+                                                            test_sketch_file_path=test_sketch_file_path,
+                                                            dataset=self.get_dataset_handle(train_file_path=train_file_path, test_file_path=test_file_path))
+
+            logging.info(f"Data Ingestion artifact:[{data_ingestion_artifact}]")
+            self.save_ingestion_state(data_ingestion_artifact=data_ingestion_artifact)
+            return data_ingestion_artifact
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
     def initiate_data_ingestion(self) -> DataIngestionArtifact:
         try:
-            tgz_file_path = self.download_housing_data()
-            self.extract_tgz_file(tgz_file_path=tgz_file_path)
-            return self.split_data_as_train_test()
+            ingestion_state = self.get_last_ingestion_state()
+            if self.data_ingestion_config.source_type == SQL_SOURCE_TYPE:
+                return self.split_sql_data_as_train_test(ingestion_state=ingestion_state)
+
+            source_file_obj = self.open_dataset_source(ingestion_state=ingestion_state)
+            if source_file_obj is None:
+                logging.info(f"Dataset source has not changed since last ingestion, skipping download, extraction and split")
+                return self.get_reused_ingestion_artifact(ingestion_state=ingestion_state)
+
+            self.dataset_sha256 = self.download_and_extract_housing_data(source_file_obj=source_file_obj)
+            if len(ingestion_state) > 0 and self.dataset_sha256 == ingestion_state[INGESTION_STATE_SHA256_KEY]:
+                logging.info(f"Downloaded dataset is identical to last ingestion, skipping split")
+                shutil.rmtree(self.data_ingestion_config.raw_data_dir, ignore_errors=True)
+                return self.get_reused_ingestion_artifact(ingestion_state=ingestion_state)
+
+            data_ingestion_artifact = self.split_data_as_train_test()
+            self.save_ingestion_state(data_ingestion_artifact=data_ingestion_artifact)
+            return data_ingestion_artifact
         except Exception as e :
             raise HousingException(e,sys) from e 
         
@@ -6,8 +6,10 @@ from sklearn import preprocessing
 from sklearn.base import BaseEstimator,TransformerMixin
 from housing.constants import *
 import numpy as np
+from scipy import sparse as sp
 from sklearn.compose import ColumnTransformer
-from housing.util.util import read_yaml_file, load_data,load_numpy_array_data,load_object,save_numpy_array_data, save_object
+from housing.util.dataset_handle import TRAIN_SPLIT, TEST_SPLIT
+from housing.util.util import read_yaml_file, load_data,load_numpy_array_data,load_object,save_numpy_array_data, save_object, save_feature_matrix, get_feature_matrix_file_extension
 from sklearn.preprocessing import StandardScaler,OneHotEncoder
 from sklearn.pipeline import Pipeline
 from sklearn.impute import SimpleImputer
@@ -28,12 +30,12 @@ class FeatureGenerator(BaseEstimator, TransformerMixin):
             self.columns = columns
             if self.columns is not None:
                 total_rooms_ix= self.columns.index(COLUMN_TOTAL_ROOMS)
-                population_ix= self.columns(COLUMN_POPULATION)
-                households_ix= self.columns(COLUMN_HOUSEHOLDS)
-                total_bedrooms_ix= self.columns(COLUMN_TOTAL_BEDROOM)
+                population_ix= self.columns.index(COLUMN_POPULATION)
+                households_ix= self.columns.index(COLUMN_HOUSEHOLDS)
+                total_bedrooms_ix= self.columns.index(COLUMN_TOTAL_BEDROOM)
                 
                 
-            self.add_bedroom_per_room = add_bedrooms_per_room
+            self.add_bedrooms_per_room = add_bedrooms_per_room
             self.total_rooms_ix = total_rooms_ix
             self.population_ix = population_ix
             self.households_ix= households_ix
@@ -52,7 +54,7 @@ class FeatureGenerator(BaseEstimator, TransformerMixin):
 
             population_per_household = X[:, self.population_ix] /X[:, self.households_ix]
 
-            if self.add_bedroom_per_room:
+            if self.add_bedrooms_per_room:
                 bedrooms_per_room = X[:, self.total_bedrooms_ix] / X[:, self.total_rooms_ix]
 
                 generated_feature = np.c_[X, room_per_household,population_per_household,bedrooms_per_room]
@@ -80,8 +82,7 @@ class DataTransformation:
         
     def get_data_transformer_object(self) -> ColumnTransformer:
         try:
-            schema_file_path = self.data_validation_artifact.shema_file_path
-            dataset_schema = read_yaml_file (file_path= schema_file_path)
+            dataset_schema = self.data_ingestion_artifact.dataset.get_schema()
 
             numerical_columns = dataset_schema[NUMERICAL_COLUMN_KEY]
             categorical_columns = dataset_schema[CATEGORICAL_COLUMN_KEY]
@@ -93,7 +94,9 @@ class DataTransformation:
             logging.info(f"Categorical columns :{categorical_columns}")
             logging.info(f"Numerical columns:{numerical_columns} ")
 
-            preprocessing= ColumnTransformer([('num_pipeline', num_pipeline,numerical_columns),('cat_pipeline',cat_pipeline, categorical_columns)])
+            #ColumnTransformer returns CSR output whenever overall density falls below sparse_threshold
+            preprocessing= ColumnTransformer([('num_pipeline', num_pipeline,numerical_columns),('cat_pipeline',cat_pipeline, categorical_columns)],
+                                             sparse_threshold=self.data_transformation_config.sparse_threshold)
 
             return preprocessing
         except Exception as e:
@@ -109,42 +112,47 @@ class DataTransformation:
             train_file_path = self.data_ingestion_artifact.train_file_path
             test_file_path=  self.data_ingestion_artifact.test_file_path
 
-            schema_file_path= self.data_validation_artifact.shema_file_path
+            dataset = self.data_ingestion_artifact.dataset
+            schema = dataset.get_schema()
+            target_column_name =  schema[TARGET_COLUMN_KEY]
+            required_columns = schema[NUMERICAL_COLUMN_KEY] + schema[CATEGORICAL_COLUMN_KEY] + [target_column_name]
 
             logging.info(f"loading training and test data as pandas dataframe")
-            train_df = load_data(file_path= train_file_path, schema_file_path=schema_file_path)
-            test_df = load_data(file_path=test_file_path , schema_file_path=schema_file_path)
-
-            schema = read_yaml_file(file_path=schema_file_path)
-            target_column_name =  schema(TARGET_COLUMN_KEY)
+            train_df = dataset.get_dataframe(split=TRAIN_SPLIT, columns=required_columns)
+            test_df = dataset.get_dataframe(split=TEST_SPLIT, columns=required_columns)
 
             logging.info(f"Splitting input and target feature from training and testing dataframe ")
-            input_feature_train_df =  train_df.drop(columns=[target_column_name], axis = 1)
+            input_feature_train_df =  train_df.drop(columns=[target_column_name])
             target_feature_train_df =  train_df[target_column_name]
 
-            input_feature_test_df= test_df.drop(columns= [target_column_name],axis=1)
+            input_feature_test_df= test_df.drop(columns= [target_column_name])
             target_feature_test_df = test_df[target_column_name]
 
             logging.info(f"applying preprocessing object on training and testing dataframe")
             input_feature_train_arr=preprocessing_obj.fit_transform(input_feature_train_df)
             input_feature_test_arr= preprocessing_obj.transform(input_feature_test_df)
 
-            train_arr= np.c_[input_feature_train_arr, np.array(target_feature_train_df)]
-            test_arr= np.c_[input_feature_test_arr, np.array(target_feature_test_df)]
-
             transformed_train_dir= self.data_transformation_config.transformed_train_dir
             transformed_test_dir= self.data_transformation_config.transformed_test_dir
 
-            train_file_name= os.path.basename(train_file_path).replace(".csv", ".npz")
-            test_file_name= os.path.basename(test_file_path).replace(".csv", ".npz")
+            train_file_name= os.path.splitext(os.path.basename(train_file_path))[0]
+            test_file_name= os.path.splitext(os.path.basename(test_file_path))[0]
+
+            #.npz for sparse CSR features, .npy for dense ones
+            transformed_train_file_path = os.path.join(transformed_train_dir,f"{train_file_name}{get_feature_matrix_file_extension(input_feature_train_arr)}")
+            transformed_test_file_path = os.path.join(transformed_test_dir,f"{test_file_name}{get_feature_matrix_file_extension(input_feature_test_arr)}")
+
+            transformed_train_target_file_path = os.path.join(transformed_train_dir,f"{train_file_name}{TRANSFORMED_TARGET_FILE_SUFFIX}")
+            transformed_test_target_file_path = os.path.join(transformed_test_dir,f"{test_file_name}{TRANSFORMED_TARGET_FILE_SUFFIX}")
 
-            transformed_train_file_path = os.path.join(transformed_train_dir,train_file_name)
-            transformed_test_file_path = os.path.join(transformed_test_dir,test_file_name)
+            logging.info(f"saving transformed training and testing features (sparse: {sp.issparse(input_feature_train_arr)}) and target arrays.")
 
-            logging.info(f"saving transformed training and testing array.")
+            #features and target are stored separately so sparse features never get densified by concatenation
+            save_feature_matrix(file_path=transformed_train_file_path, matrix=input_feature_train_arr)
+            save_feature_matrix(file_path=transformed_test_file_path, matrix=input_feature_test_arr)
 
-            save_numpy_array_data(file_path=transformed_train_file_path, array=train_arr)
-            save_numpy_array_data(file_path=transformed_test_file_path, array=test_arr)
+            save_numpy_array_data(file_path=transformed_train_target_file_path, array=np.array(target_feature_train_df))
+            save_numpy_array_data(file_path=transformed_test_target_file_path, array=np.array(target_feature_test_df))
 
             preprocessing_object_file_path = self.data_transformation_config.preprocessed_object_file_path
 
@@ -154,6 +162,8 @@ class DataTransformation:
             data_transformation_artifact= DataTransformationArtifact(is_transformed=True,message="Data transformed succesfully",
                                                                      transformed_train_file_path=transformed_train_file_path,
                                                                      transformed_test_file_path=transformed_test_file_path,
+                                                                     transformed_train_target_file_path=transformed_train_target_file_path,
+                                                                     transformed_test_target_file_path=transformed_test_target_file_path,
                                                                      preprocessed_object_file_path=preprocessing_object_file_path)
             
             logging.info( f"Data transformation artifact : {data_transformation_artifact}")
@@ -1,14 +1,32 @@
 from housing.exception import HousingException
 from housing.logger import logging
 from housing.entity.config_entity import DataValidationConfig
-from housing.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact
+from housing.entity.artifact_entity import DataIngestionArtifact,DataValidationArtifact,DataDriftArtifact
+from housing.util.dataset_handle import TRAIN_SPLIT, TEST_SPLIT
+from housing.util.drift import get_data_drift_report, get_sketch_drift_report
+from housing.util.sketch import DatasetSketch, merge_dataset_sketches
+from housing.util.schema_validator import SchemaValidator
+from housing.constants import *
 import os,sys
 import pandas as pd
 import json
-from evidently.model_profile import Profile
-from evidently.model_profile.sections import DataDriftProfileSection
-from evidently.dashboard import Dashboard
-from evidently.dashboard.tabs import DataDriftTab
+import glob
+
+
+def get_baseline_sketch_file_paths(data_validation_config: DataValidationConfig, train_sketch_file_path: str) -> list:
+    """train sketches of the latest baseline_runs ingestions before the one of train_sketch_file_path, oldest first"""
+    try:
+        current_sketch_file_path = os.path.abspath(train_sketch_file_path)
+        sketch_file_paths = sorted(glob.glob(os.path.join(data_validation_config.ingestion_history_dir, "*", "*", "*",
+                                                          f"*{DATASET_SKETCH_FILE_SUFFIX}")))
+        train_dir_name = os.path.basename(os.path.dirname(current_sketch_file_path))
+        sketch_file_paths = [sketch_file_path for sketch_file_path in sketch_file_paths
+                             if os.path.basename(os.path.dirname(sketch_file_path)) == train_dir_name
+                             and os.path.abspath(sketch_file_path) != current_sketch_file_path]
+        baseline_runs = data_validation_config.baseline_runs
+        return sketch_file_paths[-baseline_runs:] if baseline_runs > 0 else []
+    except Exception as e:
+        raise HousingException(e,sys) from e
 
 
 class DataValidation:
@@ -24,8 +42,9 @@ class DataValidation:
         
     def get_train_and_test_df(self):
         try:
-            train_df= pd.read_csv(self.data_ingestion_artifact.train_file_path)
-            test_df= pd.read_csv(self.data_ingestion_artifact.test_file_path)
+            dataset = self.data_ingestion_artifact.dataset
+            train_df= dataset.get_dataframe(split=TRAIN_SPLIT)
+            test_df= dataset.get_dataframe(split=TEST_SPLIT)
             return train_df,test_df
         except Exception as e:
             raise HousingException(sys,e) from e 
@@ -62,13 +81,16 @@ class DataValidation:
         
     def get_and_save_data_drift_report(self):
         try:
-            profile= profile(sections = [DataDriftProfileSection()])
+            schema = self.data_ingestion_artifact.dataset.get_schema()
+            numerical_columns = schema[NUMERICAL_COLUMN_KEY] + [schema[TARGET_COLUMN_KEY]]
+            categorical_columns = schema[CATEGORICAL_COLUMN_KEY]
 
             train_df, test_df =self.get_train_and_test_df()
 
-            profile.calculate(train_df,test_df)
-
-            report= json.loads(profile.json())
+            report= get_data_drift_report(reference_df=train_df, current_df=test_df,
+                                          numerical_columns=numerical_columns,
+                                          categorical_columns=categorical_columns,
+                                          drift_config=self.data_validation_config.drift_config)
 
             report_file_path = self.data_validation_config.report_file_path
             report_dir =os.path.dirname(report_file_path)
@@ -80,103 +102,114 @@ class DataValidation:
 
             return report
         except Exception as e :
-            raise HousingException(sys,e ) from e 
+            raise HousingException(e,sys ) from e 
     
-    def save_data_drift_report_page(self):
-        try:
-            dashboard = Dashboard(tabs=[DataDriftTab()])
-            train_df,test_df= self.get_train_and_test_df()
-            dashboard.calculate(train_df,test_df)
-
-            report_page_file_path= self.data_validation_config.report_page_file_path
-            report_page_dir= os.path.dirname(report_page_file_path)
-
-            os.makedirs(report_page_dir,exist_ok=True)
-            dashboard.save(report_page_file_path)
-
-        except Exception as e:
-            raise HousingException(sys,e) from e 
-        
     def is_data_drift_found (self)->bool:
         try:
+            #html page is rendered on demand when it is first requested, see get_drift_report_page
             report= self.get_and_save_data_drift_report()
-            self.save_data_drift_report_page()
-            return True
+            data_drift = report["data_drift"]
+            logging.info(f"Data drift found: [{data_drift['dataset_drift']}], drifted columns: {data_drift['drifted_columns']}")
+            return data_drift["dataset_drift"]
         except Exception as e:
-            raise HousingException(sys,e) from e 
+            raise HousingException(e,sys) from e 
         
-    def validate_dataset_schema(self)->bool:
+    def get_baseline_sketch_file_paths(self)->list:
+        """train sketches of the latest baseline_runs earlier ingestions, oldest first"""
+        return get_baseline_sketch_file_paths(data_validation_config=self.data_validation_config,
+                                              train_sketch_file_path=self.data_ingestion_artifact.train_sketch_file_path)
+
+    def get_and_save_baseline_drift_report(self):
+        """
+        compares current training data with a rolling baseline merged from sketches of earlier ingestions,
+        no earlier dataset is read
+        return: report or None if there is no earlier ingestion
+        """
         try:
-            validation_status = False
-            
-             #1. Number of Column
-            expected_numerical_columns = self.data_validation_config.schema_file_path.numerical_columns
-            expected_categorical_columns = self.data_validation_config.schema_file_path.categorical_columns
-            expected_target_column = self.data_validation_config.schema_file_path.target_column
-
-            train_df, test_df = self.get_train_and_test_df()
-            # Check if the number of columns in train_df matches the expected columns
-            if len(train_df.columns) != len(expected_numerical_columns) + len(expected_categorical_columns) + 1:
-                print("Error: Number of columns in the training dataset does not match the expected schema.")
-                return False
-            
-             # Check if the number of columns in test_df matches the expected columns
-            if len(test_df.columns) != len(expected_numerical_columns) + len(expected_categorical_columns) + 1:
-                print("Error: Number of columns in the testing dataset does not match the expected schema.")
-                return False 
-
-            # 2. Check the value of ocean proximity
-            expected_ocean_proximity_values = self.data_validation_config.schema_file_path.domain_value.get('ocean_proximity', [])
-            ocean_proximity_values_train = train_df['ocean_proximity'].unique()
-            ocean_proximity_values_test = test_df['ocean_proximity'].unique()
-
-            if not all(val in expected_ocean_proximity_values for val in ocean_proximity_values_train):
-                print("Error: Invalid ocean proximity values in the training dataset.")
-                return False
-            
-            if not all(val in expected_ocean_proximity_values for val in ocean_proximity_values_test):
-                print("Error: Invalid ocean proximity values in the testing dataset.")
-                return False
-            
-            # 3. Check column names
-            expected_columns = expected_numerical_columns + expected_categorical_columns + [expected_target_column]
-            expected_columns.sort()
-
-            train_columns = list(train_df.columns)
-            train_columns.sort()
-
-            test_columns = list(test_df.columns)
-            test_columns.sort()
-
-            if train_columns != expected_columns or test_columns != expected_columns:
-                print("Error: Column names do not match the expected schema.")
-                return False
-            
-             # If all validation checks pass, set validation_status to True
-
-
+            baseline_sketch_file_paths = self.get_baseline_sketch_file_paths()
+            if len(baseline_sketch_file_paths) == 0:
+                logging.info(f"No earlier ingestion sketches found, skipping baseline drift check")
+                return None
+
+            baseline_sketch = merge_dataset_sketches(baseline_sketch_file_paths)
+            current_sketch = DatasetSketch.load(self.data_ingestion_artifact.train_sketch_file_path)
+            report = get_sketch_drift_report(reference_sketch=baseline_sketch, current_sketch=current_sketch,
+                                             drift_config=self.data_validation_config.drift_config)
+            report["baseline_sketch_file_paths"] = baseline_sketch_file_paths
+
+            baseline_report_file_path = self.data_validation_config.baseline_report_file_path
+            os.makedirs(os.path.dirname(baseline_report_file_path),exist_ok=True)
+            with open(baseline_report_file_path,"w") as report_file:
+                json.dump(report,report_file, indent =6)
 
+            data_drift = report["data_drift"]
+            logging.info(f"Drift against baseline of [{len(baseline_sketch_file_paths)}] earlier ingestions: [{data_drift['dataset_drift']}], "
+                         f"drifted columns: {data_drift['drifted_columns']}")
+            return report
+        except Exception as e:
+            raise HousingException(e,sys) from e
 
-            validation_status = True
-            return validation_status 
+    def validate_dataset_schema(self)->bool:
+        """
+        streams train and test files through SchemaValidator and saves a json report with
+        violation counts and sample rows per column and check
+        """
+        try:
+            schema_validator = SchemaValidator(schema=self.data_ingestion_artifact.dataset.get_schema(),
+                                               chunk_size=self.data_validation_config.chunk_size,
+                                               max_samples=self.data_validation_config.max_violation_samples)
+
+            file_reports = [schema_validator.validate_file(file_path=file_path)
+                            for file_path in [self.data_ingestion_artifact.train_file_path, self.data_ingestion_artifact.test_file_path]]
+            validation_status = all(file_report["is_valid"] for file_report in file_reports)
+
+            schema_report_file_path = self.data_validation_config.schema_report_file_path
+            os.makedirs(os.path.dirname(schema_report_file_path),exist_ok=True)
+            with open(schema_report_file_path,"w") as report_file:
+                json.dump({"is_valid": validation_status, "files": file_reports}, report_file, indent=6)
+
+            for file_report in file_reports:
+                if not file_report["is_valid"]:
+                    logging.info(f"Schema validation failed for [{file_report['file_path']}], missing columns: {file_report['missing_columns']}, "
+                                 f"unknown columns: {file_report['unknown_columns']}, "
+                                 f"violations: { {column: {check: check_report['count'] for check, check_report in checks.items()} for column, checks in file_report['violations'].items()} }")
+            return validation_status
         except Exception as e:
             raise HousingException(e,sys) from e
         
     def initiate_data_validation(self)-> DataValidationArtifact:
         try:
             self.is_train_test_file_exists()
-            self.validate_dataset_schema()
-            self.is_data_drift_found()
+            if not self.validate_dataset_schema():
+                raise Exception(f"Dataset does not match schema, see report: [{self.data_validation_config.schema_report_file_path}]")
 
-            data_validation_artifact = DataValidationArtifact(schema_file_path= self.data_validation_config.schema_file_path,report_file_path=self.data_validation_config.report_file_path,
-                                                          report_page_file_path=self.data_validation_config.report_page_file_path,
-                                                          is_validated=True,message="Data validation performed successfully")
+            #drift report and its page belong to the data drift stage
+            data_validation_artifact = DataValidationArtifact(shema_file_path= self.data_validation_config.schema_file_path,report_file_path=self.data_validation_config.schema_report_file_path,
+                                                          report_page_file_path=None,
+                                                          is_validated=True,message=f"Data validation performed successfully")
         
             logging.info(f"Data Validation Artifact :{data_validation_artifact}")
             return data_validation_artifact
         
         except Exception as e :
             raise HousingException(e,sys) from e
+
+    def initiate_data_drift_report(self)-> DataDriftArtifact:
+        """drift of test against train data and of train data against earlier ingestions, does not block training"""
+        try:
+            is_drift_found = self.is_data_drift_found()
+            baseline_report = self.get_and_save_baseline_drift_report()
+            is_baseline_drift_found = None if baseline_report is None else baseline_report["data_drift"]["dataset_drift"]
+
+            data_drift_artifact = DataDriftArtifact(report_file_path=self.data_validation_config.report_file_path,
+                                                    baseline_report_file_path=None if baseline_report is None else self.data_validation_config.baseline_report_file_path,
+                                                    is_drift_found=is_drift_found,
+                                                    is_baseline_drift_found=is_baseline_drift_found,
+                                                    message=f"Data drift found: [{is_drift_found}], drift against baseline found: [{is_baseline_drift_found}]")
+            logging.info(f"Data Drift Artifact :{data_drift_artifact}")
+            return data_drift_artifact
+        except Exception as e :
+            raise HousingException(e,sys) from e
         
     def   __del__(self):
         logging.info(f"{'>>'*30}Data Validation log Completed.{'<<'*30} \n\n")
@@ -3,7 +3,9 @@ from housing.logger import logging
 from housing.entity.artifact_entity import ModelEvaluationArtifact, ModelTrainerArtifact, DataIngestionArtifact,DataValidationArtifact
 from housing.entity.config_entity import ModelEvaluationConfig
 import sys, os
-from housing.util.util import load_object, write_yaml_file, read_yaml_file, load_data
+from housing.util.util import load_object, load_data
+from housing.util.model_registry import ModelRegistry, METRIC_COLUMNS
+from housing.util.dataset_handle import TRAIN_SPLIT, TEST_SPLIT
 from housing.constants import *
 import numpy as np
 
@@ -23,63 +25,51 @@ class ModelEvaluation:
             self.model_trainer_artifact = model_trainer_artifact
             self.data_validation_artifact = data_validation_artifact
             self.data_ingstion_artifact =data_ingestion_artifact
+            #model_evluation.yaml of earlier versions is imported on first use
+            self.model_registry = ModelRegistry(db_file_path=model_evaluation_config.model_registry_file_path,
+                                                yaml_file_path=model_evaluation_config.model_evaluation_file_path)
 
         except Exception as e :
             raise HousingException(sys,e) from e
         
 
-    def get_best_model(self):
+    def get_champion(self) -> dict:
+        """
+        champion version of the registry, None while no model was accepted.
+        A champion whose model file is gone is demoted and the trained model is compared against nothing
+        """
         try:
-            model = None 
-            model_evaluation_file_path= self.model_evaluation_config.model_evaluation_file_path
-
-            if not os.path.exists(model_evaluation_file_path):
-                write_yaml_file(file_path=model_evaluation_file_path)
-                return model
-            model_eval_file_content= read_yaml_file(file_path= model_evaluation_file_path)
-
-            model_eval_file_content = dict() if model_eval_file_content is None else model_eval_file_content
-            if BEST_MODEL_KEY not in model_eval_file_content:
-                return model
-            
-            model= load_object(file_path= model_eval_file_content[BEST_MODEL_KEY][MODEL_PATH_KEY])
+            champion = self.model_registry.get_champion()
+            if champion is None or os.path.isfile(champion[MODEL_PATH_KEY]):
+                return champion
+            logging.info(f"Model file [{champion[MODEL_PATH_KEY]}] of champion version [{champion['version']}] not found, "
+                         f"demoting it")
+            self.model_registry.demote(version=champion["version"])
+            return None
+        except Exception as e:
+            raise HousingException(e,sys) from e
 
-            return model
+    def get_best_model(self, champion: dict):
+        """model of the champion version, None while no model was accepted"""
+        try:
+            if champion is None:
+                return None
+            return load_object(file_path=champion[MODEL_PATH_KEY])
         except Exception as e:
-            raise HousingException(sys,e) from e
+            raise HousingException(e,sys) from e
         
-    def update_evaluation_report(self,model_evaluation_artifact: ModelEvaluationArtifact):
+    def update_evaluation_report(self, model_evaluation_artifact: ModelEvaluationArtifact, champion: dict) -> ModelEvaluationArtifact:
+        """
+        promotes the accepted version if champion, the version it was compared against, is still the champion.
+        A concurrent run promoting its model first makes this one rejected instead of overwriting it
+        """
         try:
-            eval_file_path= self.model_evaluation_config.model_evaluation_file_path
-            model_eval_content = read_yaml_file(file_path= eval_file_path)
-            model_eval_content = dict() if model_eval_content is None else model_eval_content
-
-            previous_best_model = None 
-            if BEST_MODEL_KEY in model_eval_content:
-                previous_best_model = model_eval_content[BEST_MODEL_KEY]
-
-            logging.info(f"Previous eval result : {model_eval_content}")
-            eval_result = {
-                BEST_MODEL_KEY : {
-                    MODEL_PATH_KEY : model_evaluation_artifact.evaluated_model_path,
-                }
-            }
-
-            if previous_best_model is not None:
-                model_history = {self.model_evaluation_config.time_stamp: previous_best_model}
-                if HISTORY_KEY not in model_eval_content:
-                    history = {HISTORY_KEY: model_history}
-                    eval_result.update(history)
-
-                else:
-                    model_eval_content[HISTORY_KEY].update(model_history)
-
-
-            model_eval_content.update(eval_result)
-            logging.info(f"Updated eval result : {model_eval_content}")
-            write_yaml_file(file_path=eval_file_path, data=model_eval_content)
-
-
+            expected_champion_version = None if champion is None else champion["version"]
+            if self.model_registry.promote(version=model_evaluation_artifact.model_version,
+                                           expected_champion_version=expected_champion_version):
+                return model_evaluation_artifact
+            self.model_registry.reject(version=model_evaluation_artifact.model_version)
+            return model_evaluation_artifact._replace(is_model_accepted=False)
         except Exception as e:
             raise HousingException(sys,e) from e
         
@@ -88,21 +78,20 @@ class ModelEvaluation:
             trained_model_file_path= self.model_trainer_artifact.trained_model_file_path
             trained_model_object= load_object(file_path= trained_model_file_path)
 
-            train_file_path = self.data_ingstion_artifact.train_file_path
-            test_file_path = self.data_ingstion_artifact.test_file_path
-
-            schema_file_path= self.data_validation_artifact.shema_file_path
-            train_dataframe = load_data(file_path=train_file_path, schema_file_path=schema_file_path)
+            dataset = self.data_ingstion_artifact.dataset
+            schema_content = dataset.get_schema()
+            target_column_name = schema_content[TARGET_COLUMN_KEY]
+            required_columns = schema_content[NUMERICAL_COLUMN_KEY] + schema_content[CATEGORICAL_COLUMN_KEY] + [target_column_name]
 
-            test_dataframe=  load_data(file_path= test_file_path,schema_file_path=schema_file_path)
+            #frames are served from the dataset cache filled by earlier stages
+            train_dataframe = dataset.get_dataframe(split=TRAIN_SPLIT, columns=required_columns)
 
-            schema_content = read_yaml_file(file_path=schema_file_path)
-            target_column_name = schema_content[TARGET_COLUMN_KEY]
+            test_dataframe=  dataset.get_dataframe(split=TEST_SPLIT, columns=required_columns)
 
             #target_column 
             logging.info(f" Converting target column into numpy array.")
-            train_target_arr = np.array(train_dataframe[target_column_name])
-            test_target_arr = np.array(test_dataframe[target_column_name])
+            train_target_arr = dataset.get_column_array(split=TRAIN_SPLIT, column=target_column_name)
+            test_target_arr = dataset.get_column_array(split=TEST_SPLIT, column=target_column_name)
             logging.info(f" Conversion completed target column into numpy array.")
 
 
@@ -112,12 +101,18 @@ class ModelEvaluation:
             test_dataframe.drop(target_column_name, axis=1, inplace = True)
             logging.info(f" dropping target column from the dataframe completed ")
 
-            model= self.get_best_model()
+            champion = self.get_champion()
+            model= self.get_best_model(champion)
+            model_version = self.model_registry.register(model_path=trained_model_file_path,
+                                                         time_stamp=self.model_evaluation_config.time_stamp,
+                                                         metrics={column: getattr(self.model_trainer_artifact, column)
+                                                                  for column in METRIC_COLUMNS})
 
             if model is None:
                 logging.info(" Not found any existing model hence accepting trained model")
-                model_evaluation_artifact = ModelEvaluationArtifact(evaluated_model_path=trained_model_file_path, is_model_accepted=True)
-                self.update_evaluation_report(model_evaluation_artifact)
+                model_evaluation_artifact = ModelEvaluationArtifact(evaluated_model_path=trained_model_file_path, is_model_accepted=True,
+                                                                    model_version=model_version)
+                model_evaluation_artifact = self.update_evaluation_report(model_evaluation_artifact, champion)
                 logging.info(f"Model accepted. Model eval artifact {model_evaluation_artifact} created ")
                 return model_evaluation_artifact
             
@@ -134,21 +129,26 @@ class ModelEvaluation:
 
             if metric_info_artifact is None :
                 response = ModelEvaluationArtifact (is_model_accepted=False,
-                                                    evaluated_model_path= trained_model_file_path)
+                                                    evaluated_model_path= trained_model_file_path,
+                                                    model_version=model_version)
+                self.model_registry.reject(version=model_version)
                 
                 logging.info(response)
                 return response
             
             if metric_info_artifact.index_number ==1:
-                model_evaluation_artifact= ModelEvaluationArtifact(evaluated_model_path=trained_model_file_path,is_model_accepted= True)
+                model_evaluation_artifact= ModelEvaluationArtifact(evaluated_model_path=trained_model_file_path,is_model_accepted= True,
+                                                                   model_version=model_version)
 
-                self.update_evaluation_report(model_evaluation_artifact)
+                model_evaluation_artifact = self.update_evaluation_report(model_evaluation_artifact, champion)
                 logging.info(f"Model accepted. Model eval artifact {model_evaluation_artifact} created")
 
             else :
                 logging.info("Trained model is no better than existing model hence not accepting trained model")
                 model_evaluation_artifact = ModelEvaluationArtifact (evaluated_model_path=trained_model_file_path,
-                                                                     is_model_accepted=False)
+                                                                     is_model_accepted=False,
+                                                                     model_version=model_version)
+                self.model_registry.reject(version=model_version)
                 
 
             return model_evaluation_artifact
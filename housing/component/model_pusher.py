@@ -1,7 +1,9 @@
 from housing.exception import HousingException
 from housing.logger import logging
 from housing.entity.config_entity import ModelPusherConfig
-from housing.entity.artifact_entity import ModelPusherArtifact,ModelEvaluationArtifact
+from housing.entity.artifact_entity import ModelPusherArtifact,ModelEvaluationArtifact,DataIngestionArtifact
+from housing.constants import *
+from housing.util.model_registry import ModelRegistry
 
 import shutil
 
@@ -11,13 +13,15 @@ import sys, os
 class ModelPusher:
 
     def __init__ (self, model_pusher_config: ModelPusherConfig,
-                  model_evaluation_artifact : ModelEvaluationArtifact):
+                  model_evaluation_artifact : ModelEvaluationArtifact,
+                  data_ingestion_artifact: DataIngestionArtifact):
         
         try:
             logging.info(f"{'>>' *30}  model pusher log started {'<<' *30}")
             self.model_pusher_config = model_pusher_config
             self.model_evaluation_artifact = model_evaluation_artifact
-
+            self.data_ingestion_artifact = data_ingestion_artifact
+            self.model_registry = ModelRegistry(db_file_path=model_pusher_config.model_registry_file_path)
 
         except Exception as e:
             raise HousingException(sys,e ) from e
@@ -34,8 +38,21 @@ class ModelPusher:
 
             shutil.copy(src=evaluated_model_file_path, dst=export_model_file_path)
             logging.info(f"Trained Model:{evaluated_model_file_path} is copied in export dir: [{export_model_file_path}] ")
+
+            #training data sketch is the reference of serving time drift monitoring
+            export_sketch_file_path = os.path.join(export_dir, MODEL_TRAINING_SKETCH_FILE_NAME)
+            shutil.copy(src=self.data_ingestion_artifact.train_sketch_file_path, dst=export_sketch_file_path)
+            logging.info(f"Training data sketch is copied in export dir: [{export_sketch_file_path}]")
+
+            #served by HousingPredictor once recorded
+            self.model_registry.set_export(version=self.model_evaluation_artifact.model_version,
+                                           export_model_file_path=export_model_file_path,
+                                           export_sketch_file_path=export_sketch_file_path)
+            logging.info(f"Model version [{self.model_evaluation_artifact.model_version}] export recorded in model registry")
+
             model_pusher_artifact = ModelPusherArtifact(is_model_pusher= True,
-                                                        export_model_file_path=export_model_file_path)
+                                                        export_model_file_path=export_model_file_path,
+                                                        export_sketch_file_path=export_sketch_file_path)
             
             logging.info(f" Model pusher artifact :[{model_pusher_artifact}]")
             return model_pusher_artifact
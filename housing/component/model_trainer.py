@@ -2,9 +2,10 @@ from housing.exception import HousingException
 from housing.logger import logging
 from housing.entity.config_entity import ModelTrainerConfig
 from housing.entity.artifact_entity import ModelTrainerArtifact,DataIngestionArtifact,DataTransformationArtifact
-from housing.util.util import load_numpy_array_data,load_object, save_object
+from housing.util.util import load_numpy_array_data,load_feature_matrix,load_object, save_object
 from housing.entity.model_factory import MetricInfoArtifact,ModelFactory, GridSearchBestModel, evaluate_regression_model
 import sys,os
+from scipy.sparse import issparse
 
 from typing import List
 
@@ -46,14 +47,15 @@ class ModelTrainer:
         try:
             logging.info(f"loading tansformed training dataset")
             tranformed_train_file_path = self.data_transformation_artifact.transformed_train_file_path
-            train_array = load_numpy_array_data(file_path=tranformed_train_file_path)
+            x_train = load_feature_matrix(file_path=tranformed_train_file_path)
+            y_train = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_target_file_path)
 
             logging.info(f" loading tranformed testing data set.")
             transformed_test_file_path = self.data_transformation_artifact.transformed_test_file_path
-            test_array =load_numpy_array_data(file_path=transformed_test_file_path)
+            x_test = load_feature_matrix(file_path=transformed_test_file_path)
+            y_test = load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_test_target_file_path)
 
-            logging.info(f" splitting training and testing input and target feature")
-            x_train,y_train,x_test,y_test = train_array[:,:-1],train_array[:,-1],test_array[:,:-1],test_array[:,-1]
+            logging.info(f" training input shape: {x_train.shape}, sparse input: {issparse(x_train)}")
 
             logging.info(f" Extracting model config file path")
 
@@ -1,4 +1,4 @@
-from housing.entity.config_entity import DataIngetionConfig, TrainingPipelineConfig, DataValidationConfig, DataTransformationConfig, ModelTrainerConfig, ModelEvaluationConfig, ModelPusherConfig
+from housing.entity.config_entity import DataIngetionConfig, SqlSourceConfig, DriftConfig, TrainingPipelineConfig, DataValidationConfig, DataTransformationConfig, ModelTrainerConfig, ModelEvaluationConfig, ModelPusherConfig, ArtifactStoreConfig, DriftMonitorConfig, PipelineExecutorConfig, JobRunnerConfig, SweepConfig, FileServerConfig
 from housing.logger import logging
 from housing.exception import HousingException
 from housing.constants import *
@@ -27,7 +27,8 @@ class configuration:
             data_ingestion_artifact_dir = os.path.join(artifact_dir,DATA_INGESTION_ARTIFACT_DIR,self.time_stamp)
             data_ingestion_info= self.config_info[DATA_INGESTION_CONFIG_KEY]
             dataset_download_url= data_ingestion_info[DATA_INGESTION_DOWNLOAD_URL_KEY]
-            tgz_download_dir= os.path.join(data_ingestion_artifact_dir,data_ingestion_info[DATA_INGESTION_TGZ_DOWNLOAD_DIR_KEY])
+            #state of the last successful ingestion is shared by all runs hence kept outside timestamp dir
+            ingestion_state_file_path= os.path.join(artifact_dir,DATA_INGESTION_ARTIFACT_DIR,data_ingestion_info[DATA_INGESTION_STATE_FILE_NAME_KEY])
 
             raw_data_dir = os.path.join(data_ingestion_artifact_dir,data_ingestion_info[DATA_INGESTION_RAW_DATA_DIR_KEY])
             ingested_data_dir = os.path.join(data_ingestion_artifact_dir,data_ingestion_info[DATA_INGESTION_INGESTED_DIR_NAME_KEY])
@@ -37,10 +38,21 @@ class configuration:
 
             data_ingestion_config= DataIngetionConfig(
                 dataset_download_url=dataset_download_url,
-                tgz_download_dir= tgz_download_dir,
                 raw_data_dir=raw_data_dir,
                 ingested_train_dir=ingested_train_dir,
-                ingested_test_dir=  ingested_test_dir
+                ingested_test_dir=  ingested_test_dir,
+                ingestion_state_file_path=ingestion_state_file_path,
+                test_size=float(data_ingestion_info[DATA_INGESTION_TEST_SIZE_KEY]),
+                random_state=int(data_ingestion_info[DATA_INGESTION_RANDOM_STATE_KEY]),
+                chunk_size=int(data_ingestion_info[DATA_INGESTION_CHUNK_SIZE_KEY]),
+                ingested_file_format=data_ingestion_info[DATA_INGESTION_FILE_FORMAT_KEY],
+                schema_file_path=self.get_schema_file_path(),
+                raw_file_pattern=data_ingestion_info[DATA_INGESTION_RAW_FILE_PATTERN_KEY],
+                max_workers=data_ingestion_info.get(DATA_INGESTION_MAX_WORKERS_KEY),
+                source_type=data_ingestion_info.get(DATA_INGESTION_SOURCE_TYPE_KEY, TGZ_SOURCE_TYPE),
+                sql_source=self.get_sql_source_config(data_ingestion_info.get(DATA_INGESTION_SQL_SOURCE_KEY)),
+                sketch_relative_accuracy=float(data_ingestion_info[DATA_INGESTION_SKETCH_RELATIVE_ACCURACY_KEY]),
+                dataset_cache_size_bytes=int(float(data_ingestion_info[DATA_INGESTION_DATASET_CACHE_SIZE_MB_KEY]) * 1024 * 1024)
             )
 
             logging.info(f"DAta Ingestion Config: {data_ingestion_config}")
@@ -53,6 +65,66 @@ class configuration:
             raise HousingException(e,sys) from e 
         
 
+    def get_sql_source_config(self, sql_source_info: dict)->SqlSourceConfig:
+        try:
+            if sql_source_info is None:
+                return None
+            connect_args = dict(sql_source_info[SQL_SOURCE_CONNECT_ARGS_KEY] or {})
+            #relative sqlite database is resolved from project root like other config paths
+            if sql_source_info[SQL_SOURCE_DRIVER_KEY] == "sqlite3" and "database" in connect_args:
+                connect_args["database"] = os.path.join(ROOT_DIR, connect_args["database"])
+            return SqlSourceConfig(driver=sql_source_info[SQL_SOURCE_DRIVER_KEY],
+                                   connect_args=connect_args,
+                                   table=sql_source_info[SQL_SOURCE_TABLE_KEY],
+                                   order_by=sql_source_info[SQL_SOURCE_ORDER_BY_KEY],
+                                   batch_size=int(sql_source_info[SQL_SOURCE_BATCH_SIZE_KEY]),
+                                   cursor_name=sql_source_info.get(SQL_SOURCE_CURSOR_NAME_KEY))
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def get_schema_file_path(self)->str:
+        try:
+            data_validation_config = self.config_info[DATA_VALIDATION_CONFIG_KEY]
+            return os.path.join(ROOT_DIR,data_validation_config[DATA_VALIDATION_SCHEMA_DIR_KEY],data_validation_config[DATA_VALIDATION_SCHEMA_FILE_NAME_KEY])
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def get_drift_config(self)->DriftConfig:
+        try:
+            drift_config_info = self.config_info[DATA_VALIDATION_CONFIG_KEY][DATA_VALIDATION_DRIFT_CONFIG_KEY]
+            return DriftConfig(bins=int(drift_config_info["bins"]),
+                               ks_p_value=float(drift_config_info["ks_p_value"]),
+                               chi2_p_value=float(drift_config_info["chi2_p_value"]),
+                               psi=float(drift_config_info["psi"]),
+                               drift_share=float(drift_config_info["drift_share"]),
+                               categorical_stat_test=drift_config_info["categorical_stat_test"])
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def get_drift_monitor_config(self)->DriftMonitorConfig:
+        try:
+            drift_monitor_config_info = self.config_info[DRIFT_MONITOR_CONFIG_KEY]
+            drift_monitor_config = DriftMonitorConfig(window_size=int(drift_monitor_config_info[DRIFT_MONITOR_WINDOW_SIZE_KEY]),
+                                                      drift_config=self.get_drift_config(),
+                                                      schema_file_path=self.get_schema_file_path())
+            logging.info(f"Drift monitor config: {drift_monitor_config}")
+            return drift_monitor_config
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def get_file_server_config(self)->FileServerConfig:
+        try:
+            file_server_config_info = self.config_info[FILE_SERVER_CONFIG_KEY]
+            #compressed copies are shared by every web worker
+            file_server_config = FileServerConfig(
+                gzip_cache_dir=os.path.join(self.training_pipeline_config.artifact_dir,file_server_config_info[FILE_SERVER_GZIP_CACHE_DIR_KEY]),
+                gzip_min_size=int(file_server_config_info[FILE_SERVER_GZIP_MIN_SIZE_KEY]),
+                listing_cache_size=int(file_server_config_info[FILE_SERVER_LISTING_CACHE_SIZE_KEY]))
+            logging.info(f"File server config: {file_server_config}")
+            return file_server_config
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
     def get_data_validation_config(self)->DataValidationConfig:
         try:
 
@@ -62,13 +134,28 @@ class configuration:
 
             data_validation_config = self.config_info[DATA_VALIDATION_CONFIG_KEY]
 
-            schema_file_path = os.path.join(ROOT_DIR,data_validation_config[DATA_VALIDATION_SCHEMA_DIR_KEY],data_validation_config[DATA_VALIDATION_SCHEMA_FILE_NAME_KEY])
+            schema_file_path = self.get_schema_file_path()
 
             report_file_path= os.path.join(data_validation_artifact_dir,data_validation_config[DATA_VALIDATION_REPORT_FILE_NAME_KEY])
 
             report_page_file_path = os.path.join(data_validation_artifact_dir,data_validation_config[DATA_VALIDATION_REPORT_PAGE_FILE_NAME_KEY])
 
-            data_validation_config= DataValidationConfig(schema_file_path=schema_file_path,report_file_path=report_file_path,report_page_file_path=report_page_file_path)
+            baseline_report_file_path = os.path.join(data_validation_artifact_dir,data_validation_config[DATA_VALIDATION_BASELINE_REPORT_FILE_NAME_KEY])
+
+            #sketches of earlier ingestions are found under their timestamp dirs
+            ingestion_history_dir = os.path.join(artifact_dir,DATA_INGESTION_ARTIFACT_DIR)
+
+            drift_config = self.get_drift_config()
+
+            data_validation_config= DataValidationConfig(schema_file_path=schema_file_path,report_file_path=report_file_path,report_page_file_path=report_page_file_path,
+                                                         drift_config=drift_config,
+                                                         baseline_report_file_path=baseline_report_file_path,
+                                                         baseline_runs=int(data_validation_config[DATA_VALIDATION_BASELINE_RUNS_KEY]),
+                                                         ingestion_history_dir=ingestion_history_dir,
+                                                         schema_report_file_path=os.path.join(data_validation_artifact_dir,data_validation_config[DATA_VALIDATION_SCHEMA_REPORT_FILE_NAME_KEY]),
+                                                         chunk_size=int(data_validation_config[DATA_VALIDATION_CHUNK_SIZE_KEY]),
+                                                         max_violation_samples=int(data_validation_config[DATA_VALIDATION_MAX_VIOLATION_SAMPLES_KEY]),
+                                                         report_page_cache_dir=os.path.join(artifact_dir,DATA_VALIDATION_ARTIFACT_DIR_NAME,data_validation_config[DATA_VALIDATION_REPORT_PAGE_CACHE_DIR_KEY]))
 
             return data_validation_config
         
@@ -89,7 +176,10 @@ class configuration:
 
             transformed_test_dir = os.path.join(data_transformation_artifact_dir,data_transformation_config_info[DATA_TRANSFORMATION_DIR_NAME_KEY],data_transformation_config_info[DATA_TRANSFORMATION_TEST_DIR_NAME_KEY])
 
-            data_transformation_config= DataTransformationConfig(add_bedroom_per_room=add_bedroom_per_room,transformed_train_dir=transformed_train_dir,transformed_test_dir=transformed_test_dir,preprocessed_object_file_path=preprocessed_object_file_path)
+            sparse_threshold = data_transformation_config_info.get(DATA_TRANSFORMATION_SPARSE_THRESHOLD_KEY, 0.3)
+
+            data_transformation_config= DataTransformationConfig(add_bedroom_per_room=add_bedroom_per_room,transformed_train_dir=transformed_train_dir,transformed_test_dir=transformed_test_dir,preprocessed_object_file_path=preprocessed_object_file_path,
+                                                                 sparse_threshold=sparse_threshold)
 
             logging.info(f"Data transformation config :{data_transformation_config}")
 
@@ -130,7 +220,9 @@ class configuration:
 
             model_evaluation_file_path= os.path.join(artifact_dir,model_evaluation_config_info[MODEL_EVALUATION_FILE_NAME_KEY])
 
-            response = ModelEvaluationConfig(model_evaluation_file_path=model_evaluation_file_path, time_stamp=self.time_stamp)
+            response = ModelEvaluationConfig(model_evaluation_file_path=model_evaluation_file_path,
+                                             model_registry_file_path=self.get_model_registry_file_path(),
+                                             time_stamp=self.time_stamp)
 
             logging.info(f" model Evaluation Config :{response}")
             return response
@@ -138,13 +230,23 @@ class configuration:
         except Exception as e:
             raise HousingException(e,sys) from e 
         
+    def get_model_registry_file_path(self) -> str:
+        """model registry is shared by every run, evaluation promotes, pusher records exports, app serves"""
+        try:
+            artifact_dir = os.path.join(self.training_pipeline_config.artifact_dir,MODEL_EVALUATION_ARTIFACT_DIR)
+            model_evaluation_config_info = self.config_info[MODEL_EVALUATION_CONFIG_KEY]
+            return os.path.join(artifact_dir,model_evaluation_config_info[MODEL_EVALUATION_MODEL_REGISTRY_FILE_NAME_KEY])
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
     def get_model_pusher_config(self)-> ModelPusherConfig:
         try:
             time_stamp = f"{datetime.now().strftime('%Y%m%d%H%M%S')}"
             model_pusher_config_info= self.config_info[MODEL_PUSHER_CONFIG_KEY]
             export_dir_path= os.path.join(ROOT_DIR,model_pusher_config_info[MODEL_PUSHER_MODEL_EXPORT_DIR_KEY], time_stamp)
             
-            model_pusher_config= ModelPusherConfig(export_dir_path=export_dir_path)
+            model_pusher_config= ModelPusherConfig(export_dir_path=export_dir_path,
+                                                   model_registry_file_path=self.get_model_registry_file_path())
 
             logging.info(f" Model Pusher config {model_pusher_config}")
             return model_pusher_config
@@ -153,6 +255,62 @@ class configuration:
             raise HousingException(sys,e ) from e
         
 
+    def get_artifact_store_config(self)-> ArtifactStoreConfig:
+        try:
+            artifact_store_config_info = self.config_info[ARTIFACT_STORE_CONFIG_KEY]
+            store_dir = os.path.join(self.training_pipeline_config.artifact_dir, artifact_store_config_info[ARTIFACT_STORE_DIR_KEY])
+            retained_experiments = int(artifact_store_config_info[ARTIFACT_STORE_RETAINED_EXPERIMENTS_KEY])
+
+            artifact_store_config = ArtifactStoreConfig(store_dir=store_dir, retained_experiments=retained_experiments)
+
+            logging.info(f"Artifact store config: {artifact_store_config}")
+            return artifact_store_config
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def get_pipeline_executor_config(self)->PipelineExecutorConfig:
+        try:
+            artifact_dir = self.training_pipeline_config.artifact_dir
+            pipeline_executor_config_info = self.config_info[PIPELINE_EXECUTOR_CONFIG_KEY]
+            #stage cache is shared by all runs, run record, checkpoint and trace are kept per run
+            pipeline_executor_config = PipelineExecutorConfig(
+                stage_cache_dir=os.path.join(artifact_dir,pipeline_executor_config_info[PIPELINE_EXECUTOR_STAGE_CACHE_DIR_KEY]),
+                run_record_file_path=os.path.join(artifact_dir,pipeline_executor_config_info[PIPELINE_EXECUTOR_RUN_RECORD_DIR_KEY],f"{self.time_stamp}.json"),
+                max_workers=int(pipeline_executor_config_info[PIPELINE_EXECUTOR_MAX_WORKERS_KEY]),
+                checkpoint_dir=os.path.join(artifact_dir,pipeline_executor_config_info[PIPELINE_EXECUTOR_CHECKPOINT_DIR_KEY],self.time_stamp),
+                trace_file_path=os.path.join(artifact_dir,pipeline_executor_config_info[PIPELINE_EXECUTOR_TRACE_DIR_KEY],f"{self.time_stamp}.json"))
+            logging.info(f"Pipeline executor config: {pipeline_executor_config}")
+            return pipeline_executor_config
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def get_job_runner_config(self)->JobRunnerConfig:
+        try:
+            artifact_dir = self.training_pipeline_config.artifact_dir
+            job_runner_config_info = self.config_info[JOB_RUNNER_CONFIG_KEY]
+            #job queue is shared by every web worker and the job runner process
+            job_runner_config = JobRunnerConfig(
+                job_db_file_path=os.path.join(artifact_dir,job_runner_config_info[JOB_RUNNER_JOB_DB_FILE_NAME_KEY]),
+                max_concurrent_jobs=int(job_runner_config_info[JOB_RUNNER_MAX_CONCURRENT_JOBS_KEY]),
+                cpus_per_job=int(job_runner_config_info[JOB_RUNNER_CPUS_PER_JOB_KEY]),
+                poll_interval=float(job_runner_config_info[JOB_RUNNER_POLL_INTERVAL_KEY]))
+            logging.info(f"Job runner config: {job_runner_config}")
+            return job_runner_config
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def get_sweep_config(self)->SweepConfig:
+        try:
+            artifact_dir = self.training_pipeline_config.artifact_dir
+            sweep_config_info = self.config_info[SWEEP_CONFIG_KEY]
+            sweep_config = SweepConfig(sweep_dir=os.path.join(artifact_dir,sweep_config_info[SWEEP_DIR_KEY],self.time_stamp),
+                                       cpu_budget=int(sweep_config_info[SWEEP_CPU_BUDGET_KEY]),
+                                       cpus_per_run=int(sweep_config_info[SWEEP_CPUS_PER_RUN_KEY]))
+            logging.info(f"Sweep config: {sweep_config}")
+            return sweep_config
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
     def get_training_pipeline_config(self)->TrainingPipelineConfig:
         try:
             training_pipeline_config = self.config_info[TRAINING_PIPELINE_CONFIG_KEY]
@@ -17,33 +17,120 @@ TRAINING_PIPELINE_CONFIG_KEY = "training_pipeline_config"
 TRAINING_PIPELINE_ARTIFACT_DIR_KEY= "artifact_dir"
 TRAINING_PIPELINE_NAME_KEY= "pipeline_name"
 
+#Artifact store related variable
+PIPELINE_EXECUTOR_CONFIG_KEY = "pipeline_executor_config"
+PIPELINE_EXECUTOR_STAGE_CACHE_DIR_KEY = "stage_cache_dir"
+PIPELINE_EXECUTOR_RUN_RECORD_DIR_KEY = "run_record_dir"
+PIPELINE_EXECUTOR_MAX_WORKERS_KEY = "max_workers"
+PIPELINE_EXECUTOR_CHECKPOINT_DIR_KEY = "checkpoint_dir"
+PIPELINE_EXECUTOR_TRACE_DIR_KEY = "trace_dir"
+
+#job runner related variables
+JOB_RUNNER_CONFIG_KEY = "job_runner_config"
+JOB_RUNNER_JOB_DB_FILE_NAME_KEY = "job_db_file_name"
+JOB_RUNNER_MAX_CONCURRENT_JOBS_KEY = "max_concurrent_jobs"
+JOB_RUNNER_CPUS_PER_JOB_KEY = "cpus_per_job"
+JOB_RUNNER_POLL_INTERVAL_KEY = "poll_interval"
+
+#sweep related variables
+SWEEP_CONFIG_KEY = "sweep_config"
+SWEEP_DIR_KEY = "sweep_dir"
+SWEEP_CPU_BUDGET_KEY = "cpu_budget"
+SWEEP_CPUS_PER_RUN_KEY = "cpus_per_run"
+SWEEP_MATRIX_KEY = "matrix"
+SWEEP_FILE_PATH = os.path.join(ROOT_DIR,CONFIG_DIR,"sweep.yaml")
+
+DATA_INGESTION_STAGE = "data_ingestion"
+DATA_VALIDATION_STAGE = "data_validation"
+DATA_DRIFT_STAGE = "data_drift"
+DATA_TRANSFORMATION_STAGE = "data_transformation"
+MODEL_TRAINER_STAGE = "model_trainer"
+MODEL_EVALUATION_STAGE = "model_evaluation"
+MODEL_PUSHER_STAGE = "model_pusher"
+#names of the stages of Pipeline.get_stages, lets callers check checkpoints without building a pipeline
+PIPELINE_STAGE_NAMES = [DATA_INGESTION_STAGE, DATA_VALIDATION_STAGE, DATA_DRIFT_STAGE, DATA_TRANSFORMATION_STAGE,
+                        MODEL_TRAINER_STAGE, MODEL_EVALUATION_STAGE, MODEL_PUSHER_STAGE]
+
+ARTIFACT_STORE_CONFIG_KEY = "artifact_store_config"
+ARTIFACT_STORE_DIR_KEY = "store_dir"
+ARTIFACT_STORE_RETAINED_EXPERIMENTS_KEY = "retained_experiments"
+ARTIFACT_STORE_OBJECTS_DIR_NAME = "objects"
+ARTIFACT_STORE_REFS_DIR_NAME = "refs"
+ARTIFACT_STORE_LOCK_FILE_NAME = "store.lock"
+
 #Data ingestion related variable 
 DATA_INGESTION_CONFIG_KEY = "data_ingestion_config"
 DATA_INGESTION_ARTIFACT_DIR= "data_ingestion"
 DATA_INGESTION_DOWNLOAD_URL_KEY= "dataset_download_url"
 DATA_INGESTION_RAW_DATA_DIR_KEY= "raw_data_dir"
-DATA_INGESTION_TGZ_DOWNLOAD_DIR_KEY = "tgz_download_dir"
+DATA_INGESTION_STATE_FILE_NAME_KEY = "ingestion_state_file_name"
 DATA_INGESTION_INGESTED_DIR_NAME_KEY= "ingested_dir"
 DATA_INGESTION_TRAIN_DIR_KEY= "ingested_train_dir"
 DATA_INGESTION_TEST_DIR_KEY= "ingested_test_dir"
+DATA_INGESTION_TEST_SIZE_KEY= "test_size"
+DATA_INGESTION_RANDOM_STATE_KEY= "random_state"
+DATA_INGESTION_CHUNK_SIZE_KEY= "chunk_size"
+DATA_INGESTION_FILE_FORMAT_KEY= "ingested_file_format"
+DATA_INGESTION_RAW_FILE_PATTERN_KEY= "raw_file_pattern"
+DATA_INGESTION_MAX_WORKERS_KEY= "max_workers"
+DATA_INGESTION_SKETCH_RELATIVE_ACCURACY_KEY= "sketch_relative_accuracy"
+DATA_INGESTION_DATASET_CACHE_SIZE_MB_KEY= "dataset_cache_size_mb"
+DATASET_SKETCH_FILE_SUFFIX = "_sketch.json"
+INGESTION_PART_DIR_NAME = "parts"
+DATA_INGESTION_SOURCE_TYPE_KEY= "source_type"
+DATA_INGESTION_SQL_SOURCE_KEY= "sql_source"
+SQL_SOURCE_DRIVER_KEY = "driver"
+SQL_SOURCE_CONNECT_ARGS_KEY = "connect_args"
+SQL_SOURCE_TABLE_KEY = "table"
+SQL_SOURCE_ORDER_BY_KEY = "order_by"
+SQL_SOURCE_BATCH_SIZE_KEY = "batch_size"
+SQL_SOURCE_CURSOR_NAME_KEY = "cursor_name"
+TGZ_SOURCE_TYPE = "tgz"
+SQL_SOURCE_TYPE = "sql"
+
+CSV_FILE_FORMAT = "csv"
+PARQUET_FILE_FORMAT = "parquet"
+FEATHER_FILE_FORMAT = "feather"
+DATASET_FILE_FORMAT_EXTENSIONS = {CSV_FILE_FORMAT: ".csv", PARQUET_FILE_FORMAT: ".parquet", FEATHER_FILE_FORMAT: ".feather"}
+
+INGESTION_STATE_SHA256_KEY = "sha256"
+INGESTION_STATE_ETAG_KEY = "etag"
+INGESTION_STATE_LAST_MODIFIED_KEY = "last_modified"
+INGESTION_STATE_URL_KEY = "dataset_download_url"
+INGESTION_STATE_TRAIN_FILE_PATH_KEY = "train_file_path"
+INGESTION_STATE_TEST_FILE_PATH_KEY = "test_file_path"
+INGESTION_STATE_TRAIN_SKETCH_FILE_PATH_KEY = "train_sketch_file_path"
+INGESTION_STATE_TEST_SKETCH_FILE_PATH_KEY = "test_sketch_file_path"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
 #Data validation related variable 
 DATA_VALIDATION_CONFIG_KEY= "data_validation_config"
 DATA_VALIDATION_ARTIFACT_DIR_NAME="data_validation"
-DATA_VALIDATION_SCHEMA_DIR_KEY= "schema_dir "
-DATA_VALIDATION_SCHEMA_FILE_NAME_KEY = "schema_file_NAME"
+DATA_VALIDATION_SCHEMA_DIR_KEY= "schema_dir"
+DATA_VALIDATION_SCHEMA_FILE_NAME_KEY = "schema_file_name"
 DATA_VALIDATION_REPORT_FILE_NAME_KEY= "report_file_name"
 DATA_VALIDATION_REPORT_PAGE_FILE_NAME_KEY= "report_page_file_name"
+DATA_VALIDATION_REPORT_PAGE_CACHE_DIR_KEY= "report_page_cache_dir"
+DATA_VALIDATION_DRIFT_CONFIG_KEY= "drift_config"
+DATA_VALIDATION_BASELINE_REPORT_FILE_NAME_KEY= "baseline_report_file_name"
+DATA_VALIDATION_BASELINE_RUNS_KEY= "baseline_runs"
+DATA_VALIDATION_SCHEMA_REPORT_FILE_NAME_KEY= "schema_report_file_name"
+DATA_VALIDATION_CHUNK_SIZE_KEY= "chunk_size"
+DATA_VALIDATION_MAX_VIOLATION_SAMPLES_KEY= "max_violation_samples"
 
 #Data transformation variable 
 DATA_TRANSFORMATION_CONFIG_KEY = "data_transformation_config"
-DATA_TRANSFORMATION_ADD_BEDROOM_PER_ROOM_KEY = "add_bed_per_room"
+DATA_TRANSFORMATION_ADD_BEDROOM_PER_ROOM_KEY = "add_bedroom_per_room"
 DATA_TRANSFORMATION_ARTIFACT_DIR = "data_transformation"
 DATA_TRANSFORMATION_DIR_NAME_KEY = "transformed_dir"
 DATA_TRANSFORMATION_TRAIN_DIR_NAME_KEY = "transformed_train_dir"
 DATA_TRANSFORMATION_TEST_DIR_NAME_KEY= "transformed_test_dir"
 DATA_TRANSFORMATION_PREPROCESSING_DIR_KEY= "preprocessing_dir"
 DATA_TRANSFORMATION_PREPROCESSED_FILE_NAME_KEY= "preprocessed_object_file_name"
+DATA_TRANSFORMATION_SPARSE_THRESHOLD_KEY= "sparse_threshold"
+TRANSFORMED_TARGET_FILE_SUFFIX= "_target.npy"
+DENSE_FEATURE_MATRIX_FILE_EXTENSION= ".npy"
+SPARSE_FEATURE_MATRIX_FILE_EXTENSION= ".npz"
 
 
 COLUMN_TOTAL_ROOMS = "total_rooms"
@@ -51,6 +138,9 @@ COLUMN_POPULATION = "population"
 COLUMN_HOUSEHOLDS = "households"
 COLUMN_TOTAL_BEDROOM = "total_bedrooms"
 DATASET_SCHEMA_COLUMNS_KEY=  "columns"
+DATASET_SCHEMA_DOMAIN_VALUE_KEY= "domain_value"
+DATASET_SCHEMA_VALUE_RANGE_KEY= "value_range"
+DATASET_SCHEMA_NULLABLE_COLUMNS_KEY= "nullable_columns"
 
 NUMERICAL_COLUMN_KEY="numerical_columns"
 CATEGORICAL_COLUMN_KEY = "categorical_columns"
@@ -64,13 +154,14 @@ MODEL_TRAINER_ARTIFACT_DIR= "model_trainer"
 MODEL_TRAINER_TRAINED_MODEL_FILE_NAME_KEY= "model_file_name"
 MODEL_TRAINER_BASE_ACCURACY_KEY = "base_accuracy"
 MODEL_TRAINER_TRAINED_MODEL_DIR_KEY= "trained_model_dir"
-MODEL_TRAINER_MODEL_CONFIG_DIR_KEY= " model_config_dir"
+MODEL_TRAINER_MODEL_CONFIG_DIR_KEY= "model_config_dir"
 MODEL_TRAINER_MODEL_CONFIG_FILE_NAME_KEY="model_config_file_name"
 
 #model evaluation variable
 MODEL_EVALUATION_CONFIG_KEY = "model_evaluation_config"
 MODEL_EVALUATION_ARTIFACT_DIR= "model_evaluation"
 MODEL_EVALUATION_FILE_NAME_KEY= "model_evaluation_file_name"
+MODEL_EVALUATION_MODEL_REGISTRY_FILE_NAME_KEY= "model_registry_file_name"
 
 BEST_MODEL_KEY = "best_model"
 HISTORY_KEY = "history"
@@ -79,11 +170,22 @@ MODEL_PATH_KEY = "model_path"
 
 EXPERIMENT_DIR_NAME="experiment"
 EXPERIMENT_FILE_NAME="experiment.csv"
+EXPERIMENT_DB_FILE_NAME="experiment.db"
 
 #model Pusher variable
 
 MODEL_PUSHER_CONFIG_KEY = "model_pusher_config"
 MODEL_PUSHER_MODEL_EXPORT_DIR_KEY ="model_export_dir"
+MODEL_TRAINING_SKETCH_FILE_NAME = "training_sketch.json"
+MODEL_FILE_EXTENSION = ".pkl"
+
+DRIFT_MONITOR_CONFIG_KEY = "drift_monitor_config"
+DRIFT_MONITOR_WINDOW_SIZE_KEY = "window_size"
+
+FILE_SERVER_CONFIG_KEY = "file_server_config"
+FILE_SERVER_GZIP_CACHE_DIR_KEY = "gzip_cache_dir"
+FILE_SERVER_GZIP_MIN_SIZE_KEY = "gzip_min_size"
+FILE_SERVER_LISTING_CACHE_SIZE_KEY = "listing_cache_size"
 
 
 
@@ -1,18 +1,23 @@
 from collections import namedtuple
 
 
-DataIngestionArtifact = namedtuple("DataIngestionArtifact",["train_file_path","test_file_path","is_ingested","message"])
+DataIngestionArtifact = namedtuple("DataIngestionArtifact",["train_file_path","test_file_path","is_ingested","message","dataset_sha256",
+                                                                     "train_sketch_file_path","test_sketch_file_path","dataset"])
 
 DataValidationArtifact = namedtuple("DataValidationArtifact",
                                     ["shema_file_path","report_file_path","report_page_file_path","is_validated","message"])
 
+DataDriftArtifact = namedtuple("DataDriftArtifact",
+                               ["report_file_path","baseline_report_file_path","is_drift_found","is_baseline_drift_found","message"])
+
 
 DataTransformationArtifact= namedtuple("DataTransformationArtifact",
-                                       ["is_transformed","message","transformed_train_file_path","transformed_test_file_path","preprocessed_object_file_path"])
+                                       ["is_transformed","message","transformed_train_file_path","transformed_test_file_path",
+                                        "transformed_train_target_file_path","transformed_test_target_file_path","preprocessed_object_file_path"])
 
 ModelTrainerArtifact = namedtuple("ModelTrainerArtifact",
                                   ["is_trained","message","trained_model_file_path", "train_rmse","test_rmse", "train_accuracy","test_accuracy","model_accuracy"])
 
-ModelEvaluationArtifact = namedtuple("odelEvaluationArtifact",["is_model_accepted", "evaluated_model_path"])
+ModelEvaluationArtifact = namedtuple("odelEvaluationArtifact",["is_model_accepted", "evaluated_model_path", "model_version"])
 
-ModelPusherArtifact = namedtuple("ModelPusherArtifact", ["is_model_pusher", "export_model_file_path"])
\ No newline at end of file
+ModelPusherArtifact = namedtuple("ModelPusherArtifact", ["is_model_pusher", "export_model_file_path", "export_sketch_file_path"])
\ No newline at end of file
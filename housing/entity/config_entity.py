@@ -3,23 +3,44 @@ from collections import namedtuple
 
 
 DataIngetionConfig= namedtuple("DataIngestionConfig",
-                               ["dataset_download_url","tgz_download_dir","raw_data_dir","ingested_train_dir","ingested_test_dir"])
+                               ["dataset_download_url","raw_data_dir","ingested_train_dir","ingested_test_dir","ingestion_state_file_path",
+                                "test_size","random_state","chunk_size","ingested_file_format","schema_file_path",
+                                "raw_file_pattern","max_workers","source_type","sql_source","sketch_relative_accuracy",
+                                "dataset_cache_size_bytes"])
+
+SqlSourceConfig = namedtuple("SqlSourceConfig", ["driver","connect_args","table","order_by","batch_size","cursor_name"])
 
 DataValidationConfig= namedtuple("DataValidationConfig",
-                                 ["schema_file_path","report_file_path","report_page_file_path"])
+                                 ["schema_file_path","report_file_path","report_page_file_path","drift_config",
+                                  "baseline_report_file_path","baseline_runs","ingestion_history_dir",
+                                  "schema_report_file_path","chunk_size","max_violation_samples","report_page_cache_dir"])
+
+DriftConfig = namedtuple("DriftConfig", ["bins","ks_p_value","chi2_p_value","psi","drift_share","categorical_stat_test"])
 
 DataTransformationConfig =namedtuple("DataTransformationConfig",
-                                     ["add_bedroom_per_room","transformed_train_dir","transformed_test_dir","preprocessed_object_file_path"])
+                                     ["add_bedroom_per_room","transformed_train_dir","transformed_test_dir","preprocessed_object_file_path","sparse_threshold"])
 
 
 ModelTrainerConfig= namedtuple("ModelTrainerConfig",
                                ["model_config_file_path","base_accuracy","trained_model_file_path"])
 
-ModelEvaluationConfig = namedtuple("ModelEvaluationConfig",["model_evaluation_file_path","time_stamp"])
+ModelEvaluationConfig = namedtuple("ModelEvaluationConfig",["model_evaluation_file_path","model_registry_file_path","time_stamp"])
+
+ModelPusherConfig = namedtuple("ModelPusherConfig",["export_dir_path","model_registry_file_path"])
+
+PipelineExecutorConfig = namedtuple("PipelineExecutorConfig", ["stage_cache_dir","run_record_file_path","max_workers","checkpoint_dir","trace_file_path"])
+
+JobRunnerConfig = namedtuple("JobRunnerConfig", ["job_db_file_path","max_concurrent_jobs","cpus_per_job","poll_interval"])
+
+SweepConfig = namedtuple("SweepConfig", ["sweep_dir","cpu_budget","cpus_per_run"])
+
+DriftMonitorConfig = namedtuple("DriftMonitorConfig", ["window_size","drift_config","schema_file_path"])
+
+FileServerConfig = namedtuple("FileServerConfig", ["gzip_cache_dir","gzip_min_size","listing_cache_size"])
 
-ModelPusherConfig = namedtuple("ModelPusherConfig",["export_dir_path"])
 
 
 
+TrainingPipelineConfig = namedtuple("TrainingPipelineConfig", ["artifact_dir"])
 
-TrainingPipelineConfig = namedtuple("TrainingPipelineConfig", ["artifact_dir"])
\ No newline at end of file
+ArtifactStoreConfig = namedtuple("ArtifactStoreConfig", ["store_dir","retained_experiments"])
\ No newline at end of file
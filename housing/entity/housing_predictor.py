@@ -3,6 +3,8 @@ import sys
 
 from housing.exception import HousingException
 from housing.util.util import load_object
+from housing.util.model_registry import ModelRegistry
+from housing.constants import MODEL_FILE_EXTENSION, MODEL_TRAINING_SKETCH_FILE_NAME
 
 import pandas as pd
 
@@ -61,27 +63,73 @@ class HousingData:
 
 
 class HousingPredictor:
+    """
+    serves the champion version exported by the pusher, read from the model registry in one indexed lookup.
+    Without a registry or an exported version the latest export dir of model_dir is served, as before
+    """
+    #(model path, mtime) -> model of the last prediction, shared by the predictors of a worker
+    loaded_model = (None, None)
 
-    def __init__(self, model_dir: str):
+    def __init__(self, model_dir: str, model_registry: ModelRegistry = None):
         try:
             self.model_dir = model_dir
+            self.model_registry = model_registry
         except Exception as e:
             raise HousingException(e, sys) from e
 
-    def get_latest_model_path(self):
+    def get_served_version(self):
+        """exported version of the registry whose model file still exists, else None"""
+        try:
+            if self.model_registry is None:
+                return None
+            served_version = self.model_registry.get_served_version()
+            if served_version is None or not os.path.exists(served_version["export_model_file_path"]):
+                return None
+            return served_version
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_latest_model_dir(self):
         try:
             folder_name = list(map(int, os.listdir(self.model_dir)))
-            latest_model_dir = os.path.join(self.model_dir, f"{max(folder_name)}")
-            file_name = os.listdir(latest_model_dir)[0]
+            return os.path.join(self.model_dir, f"{max(folder_name)}")
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_latest_model_path(self):
+        try:
+            served_version = self.get_served_version()
+            if served_version is not None:
+                return served_version["export_model_file_path"]
+            latest_model_dir = self.get_latest_model_dir()
+            #export dir also holds training data sketch, model is the only pickle file
+            file_name = [file_name for file_name in os.listdir(latest_model_dir) if file_name.endswith(MODEL_FILE_EXTENSION)][0]
             latest_model_path = os.path.join(latest_model_dir, file_name)
             return latest_model_path
         except Exception as e:
             raise HousingException(e, sys) from e
 
+    def get_training_sketch_path(self):
+        """training data sketch exported with the latest model, None for models exported without one"""
+        try:
+            served_version = self.get_served_version()
+            if served_version is not None:
+                sketch_file_path = served_version["export_sketch_file_path"]
+                return sketch_file_path if sketch_file_path is not None and os.path.exists(sketch_file_path) else None
+            sketch_file_path = os.path.join(self.get_latest_model_dir(), MODEL_TRAINING_SKETCH_FILE_NAME)
+            return sketch_file_path if os.path.exists(sketch_file_path) else None
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
     def predict(self, X):
         try:
             model_path = self.get_latest_model_path()
-            model = load_object(file_path=model_path)
+            #exported models are never rewritten, a model is loaded once until another one is served
+            model_key = (model_path, os.stat(model_path).st_mtime_ns)
+            loaded_model_key, model = HousingPredictor.loaded_model
+            if loaded_model_key != model_key:
+                model = load_object(file_path=model_path)
+                HousingPredictor.loaded_model = (model_key, model)
             median_house_value = model.predict(X)
             return median_house_value
         except Exception as e:
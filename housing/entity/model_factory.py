@@ -10,7 +10,11 @@ import sys
 from collections import namedtuple
 from typing import List
 from housing.logger import logging
+from housing.util.tracing import span, get_active_tracer, add_grid_search_spans, TRACE_FIT_CATEGORY, TRACE_EVALUATION_CATEGORY
 from sklearn.metrics import r2_score,mean_squared_error
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer
+from scipy.sparse import issparse
 
 GRID_SEARCH_KEY = "grid_search"
 MODULE_KEY = "module"
@@ -18,9 +22,11 @@ CLASS_KEY= "class"
 PARAM_KEY ="params"
 MODEL_SELECTION_KEY = 'model_selection'
 SEARCH_PARAM_GRID_KEY = "search_param_grid"
+ACCEPT_SPARSE_KEY = "accept_sparse"
+DENSE_MODEL_STEP_NAME = "model"
 
 InitializedModelDetail= namedtuple("InitializedModelDeta",
-                                   ["model_seial_number","model","param_grid_search","model_name"])
+                                   ["model_seial_number","model","param_grid_search","model_name","accept_sparse"])
 
 GridSearchBestModel = namedtuple("GridSearchBestMode",
                                  ["model_serial_number","model",
@@ -34,6 +40,23 @@ MetricInfoArtifact = namedtuple("MetricInfoArtifact",["model_name","model_object
                                                       "model_accuracy", "index_number"])
 
 
+def to_dense_array(X):
+    """converts sparse input to a dense array, dense input is returned as it is"""
+    return X.toarray() if issparse(X) else X
+
+
+def get_dense_input_model(model, param_grid_search: dict):
+    """
+    wraps a model which does not accept sparse input in a pipeline that densifies its input
+    so that it can be trained and used for prediction on sparse transformed features
+    return: (wrapped model, param grid prefixed with model step name)
+    """
+    dense_input_model = Pipeline(steps=[("to_dense", FunctionTransformer(to_dense_array, accept_sparse=True)),
+                                        (DENSE_MODEL_STEP_NAME, model)])
+    dense_param_grid = {f"{DENSE_MODEL_STEP_NAME}__{key}": value for key, value in param_grid_search.items()}
+    return dense_input_model, dense_param_grid
+
+
 def evaluate_classification_model(model_list: list,X_train:np.ndarray, y_train:np.ndarray,X_test:np.ndarray, y_test : np.ndarray, base_accuracy: float = 0.6)->MetricInfoArtifact:
     pass
 
@@ -67,8 +90,9 @@ def evaluate_regression_model (model_list: list, X_train: np.ndarray, y_train: n
 
 
             #getting prediction for training and testing dataset 
-            y_train_pred = model.predict(X_train)
-            y_test_pred= model.predict(X_test)
+            with span(f"evaluate {type(model).__name__}", TRACE_EVALUATION_CATEGORY, index_number=index_number):
+                y_train_pred = model.predict(X_train)
+                y_test_pred= model.predict(X_test)
 
             #calculating r squared score on training and testing dataset
             train_acc = r2_score (y_train, y_train_pred)
@@ -85,12 +109,12 @@ def evaluate_regression_model (model_list: list, X_train: np.ndarray, y_train: n
             diff_test_train_acc = abs (test_acc - train_acc)
 
             #logging all important metric 
-            logging.info(f"{'>>' *30} Score {'<<' *30}")
+            logging.debug(f"{'>>' *30} Score {'<<' *30}")
             logging.info(f" Train Score\t\t Test Score\t\t Average Score")
             logging.info(f" {train_acc}\t\t {test_acc}\t\t{model_accuracy}")
 
 
-            logging.info(f"{'>>' *30}  Loss {'<<' *30}")
+            logging.debug(f"{'>>' *30}  Loss {'<<' *30}")
             logging.info( f"Diff test train accuracy : [{diff_test_train_acc}].")
             logging.info( f" Train root mean squared error: [{train_rmse}]. ")
             logging.info( f" Test root mean squared error : [{test_rmse}]")
@@ -139,6 +163,7 @@ def get_sample_model_config_yaml_file( export_dir : str):
                 "module_0": {
                     MODULE_KEY: "module_of_model",
                     CLASS_KEY: "ModelClassName",
+                    ACCEPT_SPARSE_KEY: False,
                     PARAM_KEY: {"param_name1": "value1",
                                "param_name2": "value2"},
                     SEARCH_PARAM_GRID_KEY: {"param_name": ['param_value_1', 'param_value_2']}
@@ -180,7 +205,7 @@ class ModelFactory:
                 raise Exception(" property_data parameter required to dictionary ")
             print(property_data)
             for key, value in property_data.items():
-                logging.info(f" Executing : $ {st(instance_ref)}.{key}={value}")
+                logging.info(f" Executing : $ {str(instance_ref)}.{key}={value}")
                 setattr(instance_ref, key, value)
             return instance_ref
         except Exception as e:
@@ -223,15 +248,28 @@ class ModelFactory:
 
             grid_search_cv_ref = ModelFactory.class_for_name(module_name=self.grid_search_cv_module,
                                                              class_name=self.grid_search_class_name)
-            
-            grid_search_cv= grid_search_cv_ref(estimator= initialized_model.model,
-                                               param_grid= initialized_model.param_grid_search)
+
+            estimator = initialized_model.model
+            param_grid_search = initialized_model.param_grid_search
+            if issparse(input_feature) and not initialized_model.accept_sparse:
+                logging.info(f"{initialized_model.model_name} does not accept sparse input, densifying its input")
+                estimator, param_grid_search = get_dense_input_model(model=estimator, param_grid_search=param_grid_search)
+
+            grid_search_cv= grid_search_cv_ref(estimator= estimator,
+                                               param_grid= param_grid_search)
             
             grid_search_cv= ModelFactory.update_property_of_class(grid_search_cv,self.grid_search_property_data)
 
             message = f'{">>" *30} f"Training {type(initialized_model.model).__name__} started." {"<<" *30} '
             logging.info(message)
-            grid_search_cv.fit(input_feature, output_feature)
+            model_name = type(initialized_model.model).__name__
+            tracer = get_active_tracer()
+            fit_start_us = tracer.now_us() if tracer is not None else 0
+            with span(f"GridSearchCV {model_name}", TRACE_FIT_CATEGORY, model_serial_number=initialized_model.model_seial_number) as span_args:
+                grid_search_cv.fit(input_feature, output_feature)
+                span_args.update(best_score=float(grid_search_cv.best_score_), candidate_count=len(grid_search_cv.cv_results_["params"]))
+            add_grid_search_spans(model_name=model_name, cv_results=grid_search_cv.cv_results_,
+                                  n_splits=grid_search_cv.n_splits_, start_us=fit_start_us)
             message =  f'{">>" *30} f"Training {type(initialized_model.model).__name__} completed. {"<<" *30}'
             grid_searched_best_model= GridSearchBestModel(model_serial_number=initialized_model.model_seial_number,
                                                           model=initialized_model.model,
@@ -265,10 +303,13 @@ class ModelFactory:
                 param_grid_search = model_initialization_config[SEARCH_PARAM_GRID_KEY]
                 model_name= f"{model_initialization_config[MODULE_KEY]}.{model_initialization_config[CLASS_KEY]}"
 
+                accept_sparse = bool(model_initialization_config.get(ACCEPT_SPARSE_KEY, False))
+
                 model_initialization_config = InitializedModelDetail(model_seial_number=model_serial_number,
                                                                      model=model,
                                                                      param_grid_search=param_grid_search,
-                                                                     model_name=model_name)
+                                                                     model_name=model_name,
+                                                                     accept_sparse=accept_sparse)
                 
                 initialized_model_list.append(model_initialization_config)
 
@@ -1,17 +1,46 @@
+"""
+Logging of every process goes through an in-memory queue to a background writer thread,
+a logging call only renders its message and enqueues the record, the file write and
+json encoding happen on the writer thread.
+
+Records are written as json lines with time, level, module, function, line, process, thread,
+message and exception. Levels per module, i.e. file name without .py, and the sample rate of
+debug records are read from the environment:
+
+    HOUSING_LOG_LEVEL=INFO
+    HOUSING_MODULE_LOG_LEVELS=model_factory=DEBUG,util=WARNING
+    HOUSING_DEBUG_SAMPLE_RATE=10    keeps 1 in 10 debug records of every call site
+
+Files are rotated every HOUSING_LOG_MAX_BYTES, 50 MB by default, and compressed, see log_segment.
+
+Worker processes of a process pool have no writer thread, start_worker_log_listener and
+forward_worker_logging send their records to the writer of the parent process.
+"""
 import logging
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 from housing.constants import get_current_time_stamp
-import os 
-import pandas as pd 
+from housing.logger.log_segment import SegmentRotatingFileHandler
+import os
+import json
+import queue
+import atexit
+import multiprocessing
 
 
 LOG_DIR= "log"
+LOG_LEVEL_ENV_VAR = "HOUSING_LOG_LEVEL"
+MODULE_LOG_LEVELS_ENV_VAR = "HOUSING_MODULE_LOG_LEVELS"
+DEBUG_SAMPLE_RATE_ENV_VAR = "HOUSING_DEBUG_SAMPLE_RATE"
+LOG_MAX_BYTES_ENV_VAR = "HOUSING_LOG_MAX_BYTES"
+LOG_MAX_BYTES = 50 * 2 ** 20
 
 
 
 
 def get_log_file_name():
-    return f"log_{get_current_time_stamp()}.log"
+    """one file per process, processes started within the same second must not share it"""
+    return f"log_{get_current_time_stamp()}_{os.getpid()}.log"
 
 LOG_FILE_NAME = get_log_file_name()
 
@@ -20,22 +49,129 @@ os.makedirs(LOG_DIR,exist_ok=True)
 LOG_FILE_PATH= os.path.join(LOG_DIR,LOG_FILE_NAME)
 
 
-logging.basicConfig(filename=LOG_FILE_PATH,filemode ="w",
-                    format='[%(asctime)s]^;%(levelname)s^;%(lineno)s^;%(filename)s^;%(funcName)s^;%(message)s',
-                    level= logging.INFO)
-
-
-def get_log_dataframe(file_path):
-    data=[]
-    with open (file_path) as log_file:
-        for line in log_file.readlines():
-            data.append(line.split("^;"))
-
-    log_df=pd.DataFrame(data)
-    columns = ["Time stamp","Log level","line number","file name","function name","message"]
-    log_df.columns=columns
-
-    log_df["log_message"]= log_df['Time stamp'].astype(str) + ":$" +log_df["message"]
-
-    return log_df[["log_message"]]
-
+class JsonFormatter(logging.Formatter):
+    """one json object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"time": datetime.fromtimestamp(record.created).isoformat(sep=" ", timespec="milliseconds"),
+                 "level": record.levelname,
+                 "module": record.module,
+                 "function": record.funcName,
+                 "line": record.lineno,
+                 "process": record.process,
+                 "thread": record.threadName,
+                 "message": record.getMessage()}
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        #utf-8 text stays searchable as written
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class ModuleLevelFilter(logging.Filter):
+    """drops records below the level of their module, or below default_level for other modules"""
+
+    def __init__(self, default_level: int, module_levels: dict):
+        super().__init__()
+        self.default_level = default_level
+        self.module_levels = module_levels
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= self.module_levels.get(record.module, self.default_level)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """keeps every sample_rate-th debug record of each call site, records above debug always pass"""
+
+    def __init__(self, sample_rate: int):
+        super().__init__()
+        self.sample_rate = sample_rate
+        #(path, line) -> debug records seen, unlocked: a race only shifts which record is sampled
+        self.counts = dict()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.sample_rate <= 1:
+            return True
+        site = (record.pathname, record.lineno)
+        count = self.counts.get(site, 0)
+        self.counts[site] = count + 1
+        return count % self.sample_rate == 0
+
+
+class RenderingQueueHandler(QueueHandler):
+    """
+    renders message and traceback on the calling thread, args and exc_info may refer to objects
+    changed after the call, leaves the rest of the formatting to the writer thread.
+    The record is changed in place instead of copied, this is the only handler of the root logger
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.args, record.exc_info, record.exc_traceback = None, None, None
+        return record
+
+
+def get_level(level_name: str) -> int:
+    level = logging.getLevelName(level_name.strip().upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level [{level_name}]")
+    return level
+
+
+def get_module_log_levels(module_log_levels: str) -> dict:
+    """module_log_levels: "module=LEVEL,module=LEVEL", return: module -> level"""
+    levels = dict()
+    for module_level in filter(None, module_log_levels.split(",")):
+        module, level_name = module_level.split("=")
+        levels[module.strip()] = get_level(level_name)
+    return levels
+
+
+def start_queue_logging(log_file_path: str) -> QueueListener:
+    """routes root logger records through a queue to a json lines file written by a background thread"""
+    default_level = get_level(os.getenv(LOG_LEVEL_ENV_VAR, "INFO"))
+    module_levels = get_module_log_levels(os.getenv(MODULE_LOG_LEVELS_ENV_VAR, ""))
+    file_handler = SegmentRotatingFileHandler(log_file_path, max_bytes=int(os.getenv(LOG_MAX_BYTES_ENV_VAR, LOG_MAX_BYTES)))
+    file_handler.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    queue_handler = RenderingQueueHandler(log_queue)
+    #filters run on the calling thread, dropped records are never enqueued
+    queue_handler.addFilter(ModuleLevelFilter(default_level=default_level, module_levels=module_levels))
+    queue_handler.addFilter(DebugSamplingFilter(sample_rate=int(os.getenv(DEBUG_SAMPLE_RATE_ENV_VAR, "1"))))
+    #records carry process and thread, the multiprocessing process name is not written
+    logging.logMultiprocessing = False
+    root_logger = logging.getLogger()
+    root_logger.handlers = [queue_handler]
+    #root logger lets through what any module may log, the module filter decides the rest
+    root_logger.setLevel(min([default_level, *module_levels.values()]))
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+    #writes the records still queued before the process exits
+    atexit.register(listener.stop)
+    return listener
+
+
+LOG_LISTENER = start_queue_logging(LOG_FILE_PATH)
+
+
+def start_worker_log_listener() -> QueueListener:
+    """
+    passes records of worker processes, put on listener.queue, to the root logger handlers of this process.
+    Stop it after the workers exited, stop writes the records still queued
+    """
+    listener = QueueListener(multiprocessing.Queue(), *logging.getLogger().handlers)
+    listener.start()
+    return listener
+
+
+def forward_worker_logging(log_queue):
+    """process pool initializer, a forked worker inherits the queue handler but not the writer thread draining it"""
+    root_logger = logging.getLogger()
+    queue_handler = RenderingQueueHandler(log_queue)
+    for handler in root_logger.handlers:
+        for log_filter in handler.filters:
+            queue_handler.addFilter(log_filter)
+    root_logger.handlers = [queue_handler]
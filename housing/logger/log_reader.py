@@ -0,0 +1,326 @@
+"""
+Reads pages of a log file without loading it. The byte offset of every LOG_INDEX_STRIDE-th line
+is indexed once per file and extended as the file grows, a page then seeks to the nearest
+indexed line and reads at most LOG_INDEX_STRIDE lines more than it returns, whatever the file size.
+Compressed segments are read through their own index, decompressing only the members a page needs.
+
+Filtered reads scan forward from a byte offset, or a member of a compressed segment, and return
+a cursor to continue from, a request stops after max_scan_bytes so a rare match never stalls a
+worker on a large file. search_logs searches every log file of a folder, segments and members whose
+index rules out the time window or level are not decompressed.
+"""
+import os
+import sys
+import json
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from collections import namedtuple, OrderedDict
+from housing.exception import HousingException
+from housing.logger.log_segment import get_log_record, is_segment, read_segment_index, read_segment_block, \
+    read_segment_lines
+
+LOG_INDEX_STRIDE = 1000
+LOG_READ_CHUNK_SIZE = 4 * 2 ** 20
+LOG_MAX_SCAN_BYTES = 64 * 2 ** 20
+LOG_PAGE_SIZE = 100
+LOG_INDEX_CACHE_SIZE = 256
+LOG_VIEW_COLUMNS = ["time", "level", "module", "function", "message"]
+LOG_LEVEL_NAMES = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+LOG_FILE_EXTENSION = ".log"
+
+LogIndex = namedtuple("LogIndex", ["inode", "indexed_size", "line_count", "offsets"])
+LogPage = namedtuple("LogPage", ["records", "page", "page_count", "line_count"])
+LogSearchResult = namedtuple("LogSearchResult", ["records", "next_offset", "scanned_bytes"])
+
+#file path -> LogIndex, shared by every request of the worker, least recently used first
+log_indexes = OrderedDict()
+log_indexes_lock = threading.Lock()
+
+
+def get_level_number(level_name: str) -> int:
+    level = logging.getLevelName(str(level_name).upper())
+    return level if isinstance(level, int) else logging.NOTSET
+
+
+def get_level_needles(min_level_number: int) -> list:
+    """level of json lines and legacy lines at or above min level"""
+    level_names = [name for name in LOG_LEVEL_NAMES if get_level_number(name) >= min_level_number]
+    return [f'"level": "{name}"'.encode() for name in level_names] + [f"^;{name}^;".encode() for name in level_names]
+
+
+def get_text_needles(text: str) -> list:
+    """text as written in legacy lines and as escaped by json lines"""
+    return [variant.encode("utf-8") for variant in dict.fromkeys([text, json.dumps(text, ensure_ascii=False)[1:-1]])]
+
+
+def get_matching_lines(chunk: bytes, needles: list):
+    """
+    lines of chunk containing any of needles, with the offset their line ends at.
+    Needles are found by bytes.find over the whole chunk, much faster than splitting it in lines
+    """
+    positions = []
+    for needle in needles:
+        position = chunk.find(needle)
+        while position >= 0:
+            positions.append(position)
+            position = chunk.find(needle, position + len(needle))
+    line_end = 0
+    for position in sorted(positions):
+        if position < line_end:
+            continue
+        line_start = chunk.rfind(b"\n", 0, position) + 1
+        line_end = chunk.find(b"\n", position) + 1 or len(chunk)
+        yield chunk[line_start:line_end], line_end
+
+
+def is_in_time_window(time: str, start_time: str = None, end_time: str = None) -> bool:
+    """times are "YYYY-mm-dd HH:MM:SS.fff" strings, any prefix of it works as window bound"""
+    return (start_time is None or time >= start_time) and (end_time is None or time[:len(end_time)] <= end_time)
+
+
+def get_file_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).isoformat(sep=" ", timespec="milliseconds")
+
+
+def get_records_dataframe(records: list, columns: list = LOG_VIEW_COLUMNS) -> pd.DataFrame:
+    return pd.DataFrame(records, columns=columns)
+
+
+class LogLineFilter:
+    """level, text and time window filter of raw log lines"""
+
+    def __init__(self, min_level: str = None, text: str = None, start_time: str = None, end_time: str = None):
+        self.min_level_number = logging.NOTSET if not min_level else get_level_number(min_level)
+        self.start_time = start_time or None
+        self.end_time = end_time or None
+        #only candidate lines found on raw bytes are parsed, the newline needle matches every line
+        if text:
+            self.needles = get_text_needles(text)
+        elif self.min_level_number > logging.NOTSET:
+            self.needles = get_level_needles(self.min_level_number)
+        else:
+            self.needles = [b"\n"]
+
+    def get_records(self, data: bytes):
+        """matching records of complete lines of data, with the offset their line ends at"""
+        for line, line_end in get_matching_lines(data, self.needles):
+            record = get_log_record(line.decode("utf-8", errors="replace"))
+            if get_level_number(record.get("level", "NOTSET")) < self.min_level_number:
+                continue
+            if not is_in_time_window(str(record.get("time", "")), self.start_time, self.end_time):
+                continue
+            yield record, line_end
+
+    def may_match_segment(self, segment_index: dict) -> bool:
+        """False if the index of a segment or member rules out every line of it"""
+        if self.min_level_number > logging.NOTSET and \
+                not any(get_level_number(level) >= self.min_level_number for level in segment_index["level_counts"]):
+            return False
+        if self.start_time is not None and segment_index["last_time"] and segment_index["last_time"] < self.start_time:
+            return False
+        if self.end_time is not None and segment_index["first_time"][:len(self.end_time)] > self.end_time:
+            return False
+        return True
+
+
+class LogReader:
+
+    def __init__(self, file_path: str, index_stride: int = LOG_INDEX_STRIDE):
+        self.file_path = file_path
+        self.index_stride = index_stride
+        self.is_segment = is_segment(file_path)
+
+    def get_index(self) -> LogIndex:
+        """
+        cached index of the file, extended from the last indexed byte when the file grew,
+        rebuilt when it was replaced or truncated. The partial last line is indexed once complete.
+        A compressed segment has no offsets, its members are indexed by log_segment
+        """
+        try:
+            stat = os.stat(self.file_path)
+            if self.is_segment:
+                return LogIndex(inode=stat.st_ino, indexed_size=stat.st_size,
+                                line_count=read_segment_index(self.file_path)["line_count"], offsets=None)
+            with log_indexes_lock:
+                log_index = log_indexes.get(self.file_path)
+                if log_index is None or log_index.inode != stat.st_ino or log_index.indexed_size > stat.st_size:
+                    log_index = LogIndex(inode=stat.st_ino, indexed_size=0, line_count=0, offsets=[0])
+                if log_index.indexed_size < stat.st_size:
+                    log_index = self.extend_index(log_index)
+                    log_indexes[self.file_path] = log_index
+                if self.file_path in log_indexes:
+                    log_indexes.move_to_end(self.file_path)
+                    while len(log_indexes) > LOG_INDEX_CACHE_SIZE:
+                        log_indexes.popitem(last=False)
+                return log_index
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def extend_index(self, log_index: LogIndex) -> LogIndex:
+        offsets = list(log_index.offsets)
+        line_count = log_index.line_count
+        indexed_size = log_index.indexed_size
+        with open(self.file_path, "rb") as log_file:
+            log_file.seek(indexed_size)
+            chunk_start = indexed_size
+            while True:
+                chunk = log_file.read(LOG_READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                #line n + 1 starts after the nth newline
+                line_starts = chunk_start + np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord("\n")) + 1
+                line_numbers = np.arange(line_count + 1, line_count + 1 + len(line_starts))
+                offsets.extend(line_starts[line_numbers % self.index_stride == 0].tolist())
+                if len(line_starts) > 0:
+                    line_count += len(line_starts)
+                    indexed_size = int(line_starts[-1])
+                chunk_start += len(chunk)
+        return LogIndex(inode=log_index.inode, indexed_size=indexed_size, line_count=line_count, offsets=offsets)
+
+    def read_lines(self, start: int, count: int) -> list:
+        """complete lines start to start + count, by seeking to the indexed line before start"""
+        try:
+            log_index = self.get_index()
+            start = max(0, min(start, log_index.line_count))
+            count = max(0, min(count, log_index.line_count - start))
+            if self.is_segment:
+                return read_segment_lines(self.file_path, read_segment_index(self.file_path), start=start, count=count)
+            lines = []
+            with open(self.file_path, "rb") as log_file:
+                log_file.seek(log_index.offsets[start // self.index_stride])
+                for _ in range(start % self.index_stride):
+                    log_file.readline()
+                for _ in range(count):
+                    lines.append(log_file.readline().decode("utf-8", errors="replace"))
+            return lines
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_page(self, page: int, page_size: int = LOG_PAGE_SIZE) -> LogPage:
+        """page: 0 based, negative pages count from the end, -1 is the latest"""
+        log_index = self.get_index()
+        page_count = max(1, -(-log_index.line_count // page_size))
+        page = min(max(page if page >= 0 else page_count + page, 0), page_count - 1)
+        lines = self.read_lines(start=page * page_size, count=page_size)
+        return LogPage(records=[get_log_record(line) for line in lines], page=page, page_count=page_count,
+                       line_count=log_index.line_count)
+
+    def tail(self, line_count: int = LOG_PAGE_SIZE) -> list:
+        log_index = self.get_index()
+        lines = self.read_lines(start=log_index.line_count - line_count, count=line_count)
+        return [get_log_record(line) for line in lines]
+
+    def may_match(self, line_filter: LogLineFilter) -> bool:
+        """
+        False if the file cannot hold a matching line: a segment by its index, a plain file only
+        by its time window, from its first line to its last modification
+        """
+        try:
+            if self.is_segment:
+                return line_filter.may_match_segment(read_segment_index(self.file_path))
+            if line_filter.start_time is not None and get_file_time(os.path.getmtime(self.file_path)) < line_filter.start_time:
+                return False
+            if line_filter.end_time is not None:
+                with open(self.file_path, "rb") as log_file:
+                    first_time = str(get_log_record(log_file.readline().decode("utf-8", errors="replace")).get("time", ""))
+                return not first_time or first_time[:len(line_filter.end_time)] <= line_filter.end_time
+            return True
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def search(self, min_level: str = None, text: str = None, offset: int = 0, limit: int = LOG_PAGE_SIZE,
+               max_scan_bytes: int = LOG_MAX_SCAN_BYTES, start_time: str = None, end_time: str = None) -> LogSearchResult:
+        """
+        records at or above min_level containing text, case sensitive, within the time window,
+        scanned from byte offset in chunks, of a compressed segment from member offset.
+        next_offset continues the search, it is None once the end of the file was reached
+        """
+        try:
+            line_filter = LogLineFilter(min_level=min_level, text=text, start_time=start_time, end_time=end_time)
+            if self.is_segment:
+                return self.search_segment(line_filter, block_number=offset, limit=limit, max_scan_bytes=max_scan_bytes)
+            records = []
+            with open(self.file_path, "rb") as log_file:
+                log_file.seek(offset)
+                position = offset
+                scanned_bytes = 0
+                while len(records) < limit and scanned_bytes < max_scan_bytes:
+                    chunk = log_file.read(LOG_READ_CHUNK_SIZE)
+                    end = chunk.rfind(b"\n") + 1
+                    if end == 0 and len(chunk) < LOG_READ_CHUNK_SIZE:
+                        return LogSearchResult(records=records, next_offset=None, scanned_bytes=scanned_bytes)
+                    #a line longer than a chunk is skipped
+                    end = end or len(chunk)
+                    for record, line_end in line_filter.get_records(chunk[:end]):
+                        records.append(record)
+                        if len(records) == limit:
+                            return LogSearchResult(records=records, next_offset=position + line_end,
+                                                   scanned_bytes=scanned_bytes + line_end)
+                    position += end
+                    scanned_bytes += end
+                    log_file.seek(position)
+            return LogSearchResult(records=records, next_offset=position, scanned_bytes=scanned_bytes)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def search_segment(self, line_filter: LogLineFilter, block_number: int, limit: int, max_scan_bytes: int) -> LogSearchResult:
+        """
+        members are searched whole, the result may exceed limit by the matches of the last one.
+        next_offset is the next member to search
+        """
+        blocks = read_segment_index(self.file_path)["blocks"]
+        records = []
+        scanned_bytes = 0
+        for block_number in range(block_number, len(blocks)):
+            if len(records) >= limit or scanned_bytes >= max_scan_bytes:
+                return LogSearchResult(records=records, next_offset=block_number, scanned_bytes=scanned_bytes)
+            if not line_filter.may_match_segment(blocks[block_number]):
+                continue
+            data = read_segment_block(self.file_path, blocks[block_number])
+            records.extend(record for record, _ in line_filter.get_records(data))
+            scanned_bytes += len(data)
+        return LogSearchResult(records=records, next_offset=None, scanned_bytes=scanned_bytes)
+
+
+def is_log_file(file_name: str) -> bool:
+    """plain log files and compressed segments, not segment indexes or files being written"""
+    return file_name.endswith(LOG_FILE_EXTENSION) or is_segment(file_name)
+
+
+def get_log_file_names(log_dir: str) -> list:
+    """file names order segments of a process before its current file"""
+    return sorted(file_name for file_name in os.listdir(log_dir) if is_log_file(file_name))
+
+
+def search_logs(log_dir: str, min_level: str = None, text: str = None, start_time: str = None, end_time: str = None,
+                cursor: str = None, limit: int = LOG_PAGE_SIZE) -> LogSearchResult:
+    """
+    records of every log file of log_dir in file name order, each with its file name.
+    Files that cannot match are not opened past their index or first line.
+    cursor: next_offset of the previous result, "<file name>:<offset>", None once every file was searched
+    """
+    try:
+        line_filter = LogLineFilter(min_level=min_level, text=text, start_time=start_time, end_time=end_time)
+        cursor_file_name, cursor_offset = cursor.rsplit(":", 1) if cursor else (None, 0)
+        records = []
+        scanned_bytes = 0
+        for file_name in get_log_file_names(log_dir):
+            if cursor_file_name is not None and file_name < cursor_file_name:
+                continue
+            log_reader = LogReader(os.path.join(log_dir, file_name))
+            if not log_reader.may_match(line_filter):
+                continue
+            search_result = log_reader.search(min_level=min_level, text=text, start_time=start_time, end_time=end_time,
+                                              offset=int(cursor_offset) if file_name == cursor_file_name else 0,
+                                              limit=limit - len(records), max_scan_bytes=LOG_MAX_SCAN_BYTES - scanned_bytes)
+            records.extend(dict(record, file=file_name) for record in search_result.records)
+            scanned_bytes += search_result.scanned_bytes
+            if search_result.next_offset is not None:
+                return LogSearchResult(records=records, next_offset=f"{file_name}:{search_result.next_offset}",
+                                       scanned_bytes=scanned_bytes)
+        return LogSearchResult(records=records, next_offset=None, scanned_bytes=scanned_bytes)
+    except Exception as e:
+        raise HousingException(e, sys) from e
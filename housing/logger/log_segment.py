@@ -0,0 +1,202 @@
+"""
+Size based rotation of log files. A log file reaching max_bytes is renamed to its next segment,
+log_<time stamp>_<pid>.<n>.log, and compressed by a background thread to .log.gz next to a
+.log.gz.idx index. The gzip file is a series of members of LOG_SEGMENT_BLOCK_LINES lines each,
+any member can be decompressed on its own, the index holds the offset, line range, time range
+and level counts of every member. Readers skip segments and members that cannot match a time
+window or level and decompress only the members they read.
+
+The last segment is rotated and compressed when the process exits. A segment left uncompressed
+by a crash stays a plain .log file, readable like any other.
+"""
+import os
+import sys
+import json
+import gzip
+import queue
+import itertools
+import logging
+import threading
+import traceback
+
+LOG_SEGMENT_BLOCK_LINES = 1000
+LOG_SEGMENT_SUFFIX = ".gz"
+LOG_SEGMENT_INDEX_SUFFIX = ".idx"
+#separator of log files written before json lines
+LEGACY_LOG_SEPARATOR = "^;"
+LEGACY_LOG_COLUMNS = ["Time stamp","Log level","line number","file name","function name","message"]
+#every json line starts with its time, see JsonFormatter
+JSON_LINE_TIME_PREFIX = b'{"time": "'
+JSON_LINE_LEVEL_PREFIX = b'"level": "'
+
+
+def get_log_record(line: str) -> dict:
+    """one line of a json lines log, or of a log written with the legacy separator"""
+    if line.startswith("{"):
+        try:
+            return json.loads(line)
+        except ValueError:
+            #line cut short by a crashed process
+            return {"time": "", "message": line.rstrip("\n")}
+    values = line.rstrip("\n").split(LEGACY_LOG_SEPARATOR)
+    if len(values) != len(LEGACY_LOG_COLUMNS):
+        return {"time": "", "message": line.rstrip("\n")}
+    #legacy times use a comma before milliseconds, a dot keeps them comparable with json lines
+    return {"time": values[0].strip("[]").replace(",", "."), "level": values[1], "line": values[2], "module": values[3],
+            "function": values[4], "message": values[5]}
+
+
+def get_time_and_level(line: bytes) -> tuple:
+    """time and level of a log line, sliced from json lines without parsing them"""
+    if line.startswith(JSON_LINE_TIME_PREFIX):
+        time_end = line.find(b'"', len(JSON_LINE_TIME_PREFIX))
+        level_start = line.find(JSON_LINE_LEVEL_PREFIX, time_end) + len(JSON_LINE_LEVEL_PREFIX)
+        if time_end > 0 and level_start >= len(JSON_LINE_LEVEL_PREFIX):
+            return (line[len(JSON_LINE_TIME_PREFIX):time_end].decode(),
+                    line[level_start:line.find(b'"', level_start)].decode())
+    record = get_log_record(line.decode("utf-8", errors="replace"))
+    return record.get("time", ""), record.get("level", "")
+
+
+def get_segment_file_path(log_file_path: str, segment_number: int) -> str:
+    """log/log_<time stamp>_<pid>.log -> log/log_<time stamp>_<pid>.<segment number>.log"""
+    base, extension = os.path.splitext(log_file_path)
+    return f"{base}.{segment_number:04d}{extension}"
+
+
+def is_segment(file_path: str) -> bool:
+    return file_path.endswith(LOG_SEGMENT_SUFFIX)
+
+
+def compress_segment(segment_file_path: str, block_lines: int = LOG_SEGMENT_BLOCK_LINES) -> str:
+    """
+    compresses a rotated log file to gzip members of block_lines lines with their index,
+    then removes it. return: compressed file path
+    """
+    compressed_file_path = f"{segment_file_path}{LOG_SEGMENT_SUFFIX}"
+    blocks = []
+    line_count = 0
+    with open(segment_file_path, "rb") as segment_file, open(f"{compressed_file_path}.tmp", "wb") as compressed_file:
+        for lines in iter(lambda: list(itertools.islice(segment_file, block_lines)), []):
+            times_and_levels = [get_time_and_level(line) for line in lines]
+            times = [time for time, _ in times_and_levels if time]
+            level_counts = dict()
+            for _, level in times_and_levels:
+                level_counts[level] = level_counts.get(level, 0) + 1
+            offset = compressed_file.tell()
+            compressed_file.write(gzip.compress(b"".join(lines), mtime=0))
+            blocks.append({"offset": offset, "size": compressed_file.tell() - offset,
+                           "first_line": line_count, "line_count": len(lines),
+                           "first_time": min(times, default=""), "last_time": max(times, default=""),
+                           "level_counts": level_counts})
+            line_count += len(lines)
+    level_counts = dict()
+    for block in blocks:
+        for level, count in block["level_counts"].items():
+            level_counts[level] = level_counts.get(level, 0) + count
+    segment_index = {"line_count": line_count,
+                     "first_time": min([block["first_time"] for block in blocks if block["first_time"]], default=""),
+                     "last_time": max([block["last_time"] for block in blocks], default=""),
+                     "level_counts": level_counts,
+                     "blocks": blocks}
+    index_file_path = f"{compressed_file_path}{LOG_SEGMENT_INDEX_SUFFIX}"
+    with open(f"{index_file_path}.tmp", "w") as index_file:
+        json.dump(segment_index, index_file)
+    #index first, a segment is complete once its gzip file exists
+    os.replace(f"{index_file_path}.tmp", index_file_path)
+    os.replace(f"{compressed_file_path}.tmp", compressed_file_path)
+    os.remove(segment_file_path)
+    return compressed_file_path
+
+
+def read_segment_index(compressed_file_path: str) -> dict:
+    with open(f"{compressed_file_path}{LOG_SEGMENT_INDEX_SUFFIX}") as index_file:
+        return json.load(index_file)
+
+
+def read_segment_block(compressed_file_path: str, block: dict) -> bytes:
+    """decompressed lines of one member"""
+    with open(compressed_file_path, "rb") as compressed_file:
+        compressed_file.seek(block["offset"])
+        return gzip.decompress(compressed_file.read(block["size"]))
+
+
+def read_segment_lines(compressed_file_path: str, segment_index: dict, start: int, count: int) -> list:
+    """lines start to start + count, decompressing only the members holding them"""
+    lines = []
+    for block in segment_index["blocks"]:
+        block_end = block["first_line"] + block["line_count"]
+        if block_end <= start or block["first_line"] >= start + count:
+            continue
+        block_lines = read_segment_block(compressed_file_path, block).splitlines(keepends=True)
+        lines.extend(line.decode("utf-8", errors="replace")
+                     for line in block_lines[max(0, start - block["first_line"]):start + count - block["first_line"]])
+    return lines
+
+
+class SegmentRotatingFileHandler(logging.FileHandler):
+    """
+    writes to file_path until it holds max_bytes, then moves it to the next segment and hands
+    that to a background compressor thread. Only one process may write to file_path
+    """
+
+    def __init__(self, file_path: str, max_bytes: int):
+        super().__init__(file_path, mode="w", encoding="utf-8")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.segment_count = 0
+        #rotated segment paths, None stops the compressor. A daemon thread, not an executor:
+        #executors stop taking work at exit before the queue listener wrote its last records
+        self.segments = queue.SimpleQueue()
+        self.compressor = threading.Thread(target=self.compress_segments, name="log-segment-compressor", daemon=True)
+        self.compressor.start()
+
+    def emit(self, record: logging.LogRecord):
+        #records of threads still logging after close are dropped
+        if self.stream is None:
+            return
+        try:
+            message = f"{self.format(record)}{self.terminator}"
+            self.stream.write(message)
+            self.stream.flush()
+            #characters, not bytes, rotation only needs to be about right
+            self.size += len(message)
+            if self.size >= self.max_bytes:
+                self.segments.put(self.rotate())
+        except Exception:
+            self.handleError(record)
+
+    def rotate(self) -> str:
+        """return: path of the rotated segment"""
+        self.stream.close()
+        self.segment_count += 1
+        segment_file_path = get_segment_file_path(self.baseFilename, self.segment_count)
+        os.replace(self.baseFilename, segment_file_path)
+        self.stream = self._open()
+        self.size = 0
+        return segment_file_path
+
+    def compress_segments(self):
+        for segment_file_path in iter(self.segments.get, None):
+            try:
+                compress_segment(segment_file_path)
+            except Exception:
+                #logging cannot report errors of its own writer, the segment stays a plain .log file
+                print(f"Compressing log segment [{segment_file_path}] failed", file=sys.stderr)
+                traceback.print_exc(file=sys.stderr)
+
+    def close(self):
+        """rotates the last segment and waits until every segment is compressed"""
+        self.acquire()
+        try:
+            if self.stream is not None and not self.stream.closed:
+                if self.size > 0:
+                    self.segments.put(self.rotate())
+                self.stream.close()
+                self.stream = None
+                os.remove(self.baseFilename)
+                self.segments.put(None)
+                self.compressor.join()
+        finally:
+            self.release()
+            super().close()
@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import threading
+from datetime import datetime
+from housing.exception import HousingException
+from housing.logger import logging
+from housing.util.util import save_object, load_object
+from housing.pipeline.stage_executor import StageRun, StageExecutor
+
+CHECKPOINT_MANIFEST_FILE_NAME = "manifest.json"
+STAGE_COMPLETED = "completed"
+STAGE_FAILED = "failed"
+#set once every fatal stage succeeded, failed stages which are not fatal do not keep a run resumable
+RUN_COMPLETED_KEY = "is_completed"
+
+
+class PipelineCheckpoint:
+    """
+    Checkpoint of one pipeline run kept in checkpoint_dir:
+        manifest.json: experiment id, time stamp, whether the run completed and per stage status, fingerprint
+                       and artifact file path
+        <stage>.pkl: artifact of every completed stage
+    The manifest is rewritten after every stage, so a crashed run can be resumed from its
+    first incomplete stage with the artifacts of the completed ones.
+    """
+
+    def __init__(self, checkpoint_dir: str):
+        self.checkpoint_dir = checkpoint_dir
+        self.manifest_file_path = os.path.join(checkpoint_dir, CHECKPOINT_MANIFEST_FILE_NAME)
+        self.lock = threading.Lock()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_file_path)
+
+    def read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_file_path) as manifest_file:
+                return json.load(manifest_file)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def write_manifest(self, manifest: dict):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        tmp_file_path = f"{self.manifest_file_path}.tmp"
+        with open(tmp_file_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=4, default=str)
+        os.replace(tmp_file_path, self.manifest_file_path)
+
+    def start(self, experiment_id: str, time_stamp: str):
+        """new manifest for a fresh run, stages of a resumed run are kept"""
+        try:
+            with self.lock:
+                manifest = self.read_manifest() if self.exists() else {"stages": dict()}
+                manifest.update({"experiment_id": experiment_id, "time_stamp": time_stamp, RUN_COMPLETED_KEY: False,
+                                 "updated_at": datetime.now().isoformat()})
+                self.write_manifest(manifest)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def save_stage(self, stage_run: StageRun, artifact):
+        """records a completed stage, called by StageExecutor as soon as the stage is done"""
+        try:
+            artifact_file_path = os.path.join(self.checkpoint_dir, f"{stage_run.name}.pkl")
+            save_object(file_path=artifact_file_path, obj=artifact)
+            with self.lock:
+                manifest = self.read_manifest()
+                manifest["stages"][stage_run.name] = {"status": STAGE_COMPLETED,
+                                                      "fingerprint": stage_run.fingerprint,
+                                                      "run_status": stage_run.status,
+                                                      "duration": stage_run.duration,
+                                                      "artifact_file_path": artifact_file_path,
+                                                      "updated_at": datetime.now().isoformat()}
+                manifest["updated_at"] = datetime.now().isoformat()
+                self.write_manifest(manifest)
+            logging.info(f"Checkpoint of stage [{stage_run.name}] saved to [{artifact_file_path}]")
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def save_failure(self, stage_name: str, error: Exception):
+        try:
+            with self.lock:
+                manifest = self.read_manifest()
+                manifest["stages"][stage_name] = {"status": STAGE_FAILED,
+                                                  "error": str(error),
+                                                  "updated_at": datetime.now().isoformat()}
+                manifest["updated_at"] = datetime.now().isoformat()
+                self.write_manifest(manifest)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def complete(self):
+        """marks the run completed, called once StageExecutor returned"""
+        try:
+            with self.lock:
+                manifest = self.read_manifest()
+                manifest[RUN_COMPLETED_KEY] = True
+                manifest["updated_at"] = datetime.now().isoformat()
+                self.write_manifest(manifest)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_completed_stages(self) -> dict:
+        """
+        return: stage name -> (artifact, StageRun) of completed stages whose artifact and
+        the files it points to still exist, input of StageExecutor.run
+        """
+        try:
+            completed_stages = dict()
+            for stage_name, stage_info in self.read_manifest()["stages"].items():
+                if stage_info["status"] != STAGE_COMPLETED or not os.path.exists(stage_info["artifact_file_path"]):
+                    continue
+                artifact = load_object(file_path=stage_info["artifact_file_path"])
+                if artifact is not None and not StageExecutor.is_artifact_usable(artifact):
+                    logging.info(f"Checkpoint of stage [{stage_name}] points to missing files, stage will run again")
+                    continue
+                completed_stages[stage_name] = (artifact, StageRun(name=stage_name, status=stage_info["run_status"],
+                                                                   fingerprint=stage_info["fingerprint"],
+                                                                   duration=stage_info["duration"],
+                                                                   artifact_file_path=stage_info["artifact_file_path"]))
+            return completed_stages
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+
+def get_incomplete_time_stamps(checkpoint_root_dir: str, stage_names: list) -> list:
+    """
+    time stamps of checkpointed runs not marked completed, oldest first. Manifests written before runs
+    were marked count as incomplete while a stage of stage_names is not completed
+    """
+    try:
+        if not os.path.isdir(checkpoint_root_dir):
+            return []
+        time_stamps = []
+        for time_stamp in sorted(os.listdir(checkpoint_root_dir)):
+            checkpoint = PipelineCheckpoint(os.path.join(checkpoint_root_dir, time_stamp))
+            if not checkpoint.exists():
+                continue
+            manifest = checkpoint.read_manifest()
+            if manifest.get(RUN_COMPLETED_KEY, False):
+                continue
+            stages = manifest["stages"]
+            if RUN_COMPLETED_KEY in manifest or \
+                    any(stages.get(stage_name, {}).get("status") != STAGE_COMPLETED for stage_name in stage_names):
+                time_stamps.append(time_stamp)
+        return time_stamps
+    except Exception as e:
+        raise HousingException(e, sys) from e
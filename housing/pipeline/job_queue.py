@@ -0,0 +1,155 @@
+import os
+import sys
+import uuid
+import sqlite3
+from contextlib import closing
+import pandas as pd
+from datetime import datetime
+from housing.exception import HousingException
+
+TRAIN_JOB = "train"
+RESUME_JOB = "resume"
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+JOB_COLUMNS = ["job_id", "kind", "status", "time_stamp", "pid", "message", "created_at", "started_at", "finished_at"]
+
+
+class JobQueue:
+    """
+    Persistent training job queue in a SQLite file shared by every web worker and the job runner.
+    Every call opens its own connection, claiming a job runs in an immediate transaction
+    so two runners never start the same job.
+    """
+
+    def __init__(self, db_file_path: str):
+        try:
+            self.db_file_path = db_file_path
+            os.makedirs(os.path.dirname(db_file_path), exist_ok=True)
+            with closing(self.connect()) as connection:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("""CREATE TABLE IF NOT EXISTS job (
+                                        job_id TEXT PRIMARY KEY,
+                                        kind TEXT NOT NULL,
+                                        status TEXT NOT NULL,
+                                        time_stamp TEXT,
+                                        pid INTEGER,
+                                        message TEXT,
+                                        created_at TEXT NOT NULL,
+                                        started_at TEXT,
+                                        finished_at TEXT)""")
+                connection.execute("CREATE INDEX IF NOT EXISTS job_status_created_at ON job (status, created_at)")
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_file_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def enqueue(self, kind: str, time_stamp: str = None) -> str:
+        """
+        kind: TRAIN_JOB or RESUME_JOB, time_stamp is the run to resume
+        return: job id
+        """
+        try:
+            job_id = str(uuid.uuid4())
+            with closing(self.connect()) as connection:
+                connection.execute("INSERT INTO job (job_id, kind, status, time_stamp, created_at) VALUES (?, ?, ?, ?, ?)",
+                                   (job_id, kind, JOB_QUEUED, time_stamp, datetime.now().isoformat()))
+            return job_id
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def claim_next(self, time_stamp: str) -> dict:
+        """
+        marks the oldest queued job running, a train job gets time_stamp as its run time stamp.
+        A resume job of a run which is still running fails instead, two processes would write the same run
+        return: job or None if queue is empty
+        """
+        connection = self.connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            running_time_stamps = {row["time_stamp"] for row in
+                                   connection.execute("SELECT time_stamp FROM job WHERE status = ?", (JOB_RUNNING,))}
+            row = None
+            for queued_row in connection.execute("SELECT * FROM job WHERE status = ? ORDER BY created_at", (JOB_QUEUED,)).fetchall():
+                if queued_row["kind"] == RESUME_JOB and queued_row["time_stamp"] in running_time_stamps:
+                    connection.execute("UPDATE job SET status = ?, message = ?, finished_at = ? WHERE job_id = ?",
+                                       (JOB_FAILED, f"Run [{queued_row['time_stamp']}] is already running",
+                                        datetime.now().isoformat(), queued_row["job_id"]))
+                    continue
+                row = queued_row
+                break
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            job = dict(row)
+            job.update(status=JOB_RUNNING, started_at=datetime.now().isoformat(),
+                       time_stamp=job["time_stamp"] if job["kind"] == RESUME_JOB else time_stamp)
+            connection.execute("UPDATE job SET status = ?, started_at = ?, time_stamp = ? WHERE job_id = ?",
+                               (job["status"], job["started_at"], job["time_stamp"], job["job_id"]))
+            connection.execute("COMMIT")
+            return job
+        except Exception as e:
+            connection.execute("ROLLBACK")
+            raise HousingException(e, sys) from e
+        finally:
+            connection.close()
+
+    def set_pid(self, job_id: str, pid: int):
+        try:
+            with closing(self.connect()) as connection:
+                connection.execute("UPDATE job SET pid = ? WHERE job_id = ?", (pid, job_id))
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def finish(self, job_id: str, status: str, message: str):
+        """records the outcome of a running job, a job finished already is left as it is"""
+        try:
+            with closing(self.connect()) as connection:
+                connection.execute("UPDATE job SET status = ?, message = ?, finished_at = ? WHERE job_id = ? AND status = ?",
+                                   (status, message, datetime.now().isoformat(), job_id, JOB_RUNNING))
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_job(self, job_id: str) -> dict:
+        try:
+            with closing(self.connect()) as connection:
+                row = connection.execute("SELECT * FROM job WHERE job_id = ?", (job_id,)).fetchone()
+            return None if row is None else dict(row)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_jobs(self, status: str = None, limit: int = 10) -> pd.DataFrame:
+        """latest jobs first"""
+        try:
+            query, parameters = "SELECT * FROM job", []
+            if status is not None:
+                query, parameters = f"{query} WHERE status = ?", [status]
+            with closing(self.connect()) as connection:
+                rows = connection.execute(f"{query} ORDER BY created_at DESC LIMIT ?", parameters + [limit]).fetchall()
+            return pd.DataFrame([dict(row) for row in rows], columns=JOB_COLUMNS)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_active_time_stamps(self) -> set:
+        """run time stamps of queued resume jobs and running jobs, queued train jobs have none yet"""
+        try:
+            with closing(self.connect()) as connection:
+                rows = connection.execute("SELECT time_stamp FROM job WHERE status IN (?, ?) AND time_stamp IS NOT NULL",
+                                          (JOB_QUEUED, JOB_RUNNING)).fetchall()
+            return {row["time_stamp"] for row in rows}
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_active_count(self) -> int:
+        """queued and running jobs"""
+        try:
+            with closing(self.connect()) as connection:
+                return connection.execute("SELECT COUNT(*) FROM job WHERE status IN (?, ?)", (JOB_QUEUED, JOB_RUNNING)).fetchone()[0]
+        except Exception as e:
+            raise HousingException(e, sys) from e
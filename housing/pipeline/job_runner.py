@@ -0,0 +1,163 @@
+"""
+Training job runner, started next to the web server:
+
+    python -m housing.pipeline.job_runner [--until-idle]
+
+Web workers only enqueue jobs in the JobQueue. The runner starts every job as its own
+process, up to max_concurrent_jobs at once, each pinned to cpus_per_job cpus with
+numerical libraries limited to as many threads.
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import pandas as pd
+from housing.exception import HousingException
+from housing.logger import logging
+from housing.constants import CONFIG_FILE_PATH, get_current_time_stamp
+from housing.config.configuration import configuration
+from housing.entity.config_entity import JobRunnerConfig
+from housing.pipeline.job_queue import JobQueue, TRAIN_JOB, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+
+THREAD_LIMIT_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+
+def is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def get_cpu_sets(slot_count: int, cpus_per_slot: int) -> list:
+    """one cpu set per concurrent slot, slots share cpus only when there are not enough of them"""
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    cpus_per_slot = min(cpus_per_slot, len(cpus))
+    return [[cpus[(slot * cpus_per_slot + index) % len(cpus)] for index in range(cpus_per_slot)]
+            for slot in range(slot_count)]
+
+
+def start_limited_process(command: list, cpus: list) -> subprocess.Popen:
+    """starts command pinned to cpus, with numerical libraries limited to as many threads"""
+    env = dict(os.environ, **{env_var: str(len(cpus)) for env_var in THREAD_LIMIT_ENV_VARS})
+    preexec_fn = (lambda: os.sched_setaffinity(0, cpus)) if hasattr(os, "sched_setaffinity") else None
+    return subprocess.Popen(command, env=env, preexec_fn=preexec_fn)
+
+
+class JobRunner:
+
+    def __init__(self, job_runner_config: JobRunnerConfig, config_file_path: str = CONFIG_FILE_PATH):
+        try:
+            self.job_runner_config = job_runner_config
+            self.config_file_path = config_file_path
+            self.job_queue = JobQueue(db_file_path=job_runner_config.job_db_file_path)
+            self.cpu_sets = get_cpu_sets(slot_count=job_runner_config.max_concurrent_jobs,
+                                         cpus_per_slot=job_runner_config.cpus_per_job)
+            #slot index -> (job, process)
+            self.running = dict()
+            self.last_time_stamp = None
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def recover_orphaned_jobs(self):
+        """jobs left running by a previous runner whose process is gone are marked failed, their checkpoint can be resumed"""
+        orphaned_jobs = self.job_queue.get_jobs(status=JOB_RUNNING, limit=-1)
+        for job in orphaned_jobs.to_dict(orient="records"):
+            if pd.isna(job["pid"]) or not is_process_alive(int(job["pid"])):
+                logging.info(f"Job [{job['job_id']}] was left running by a stopped runner, marking it failed")
+                self.job_queue.finish(job_id=job["job_id"], status=JOB_FAILED,
+                                      message=f"Job runner stopped, resume run [{job['time_stamp']}] to continue")
+
+    def get_next_time_stamp(self) -> str:
+        """every run needs its own artifact time stamp, which has a resolution of one second"""
+        time_stamp = get_current_time_stamp()
+        while time_stamp == self.last_time_stamp:
+            time.sleep(0.1)
+            time_stamp = get_current_time_stamp()
+        self.last_time_stamp = time_stamp
+        return time_stamp
+
+    def start_job(self, job: dict, cpus: list) -> subprocess.Popen:
+        process = start_limited_process(command=[sys.executable, "-m", "housing.pipeline.job_runner",
+                                                 "--job-id", job["job_id"], "--config-file-path", self.config_file_path],
+                                        cpus=cpus)
+        self.job_queue.set_pid(job_id=job["job_id"], pid=process.pid)
+        logging.info(f"Started {job['kind']} job [{job['job_id']}] of run [{job['time_stamp']}] as process [{process.pid}] on cpus {cpus}")
+        return process
+
+    def reap_finished_jobs(self):
+        for slot, (job, process) in list(self.running.items()):
+            return_code = process.poll()
+            if return_code is None:
+                continue
+            del self.running[slot]
+            #job process records its own outcome, this covers processes killed before they could
+            self.job_queue.finish(job_id=job["job_id"], status=JOB_FAILED,
+                                  message=f"Job process exited with code [{return_code}]")
+            logging.info(f"Job [{job['job_id']}] process exited with code [{return_code}]")
+
+    def fill_free_slots(self):
+        for slot, cpus in enumerate(self.cpu_sets):
+            if slot in self.running:
+                continue
+            job = self.job_queue.claim_next(time_stamp=self.get_next_time_stamp())
+            if job is None:
+                return
+            self.running[slot] = (job, self.start_job(job=job, cpus=cpus))
+
+    def run(self, until_idle: bool = False):
+        """until_idle: return once the queue is empty and every job finished, otherwise poll forever"""
+        try:
+            self.recover_orphaned_jobs()
+            logging.info(f"Job runner started with cpu sets {self.cpu_sets}")
+            while True:
+                self.reap_finished_jobs()
+                self.fill_free_slots()
+                if until_idle and len(self.running) == 0:
+                    return
+                time.sleep(self.job_runner_config.poll_interval)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+
+def run_job(job_id: str, config_file_path: str) -> int:
+    """runs one claimed job in the current process, return: exit code"""
+    #imported here so the runner process never loads the training stack
+    from housing.pipeline.pipeline import Pipeline
+    job_queue = JobQueue(db_file_path=configuration(config_file_path=config_file_path).get_job_runner_config().job_db_file_path)
+    job = job_queue.get_job(job_id)
+    if job is None:
+        logging.error(f"Job [{job_id}] does not exist")
+        return 1
+    try:
+        if job["kind"] == TRAIN_JOB:
+            Pipeline(config=configuration(config_file_path=config_file_path, current_time_stamp=job["time_stamp"])).run_pipeline()
+        else:
+            Pipeline.resume_pipeline(time_stamp=job["time_stamp"], config_file_path=config_file_path)
+        job_queue.finish(job_id=job_id, status=JOB_SUCCEEDED, message=Pipeline.experiment.message)
+        return 0
+    except Exception as e:
+        logging.exception(e)
+        job_queue.finish(job_id=job_id, status=JOB_FAILED, message=str(e))
+        return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs queued training jobs")
+    parser.add_argument("--job-id", default=None, help="run this claimed job in the current process")
+    parser.add_argument("--config-file-path", default=CONFIG_FILE_PATH)
+    parser.add_argument("--until-idle", action="store_true", help="exit once no job is queued or running")
+    args = parser.parse_args()
+    if args.job_id is not None:
+        return run_job(job_id=args.job_id, config_file_path=args.config_file_path)
+    job_runner_config = configuration(config_file_path=args.config_file_path).get_job_runner_config()
+    JobRunner(job_runner_config=job_runner_config, config_file_path=args.config_file_path).run(until_idle=args.until_idle)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,14 @@
 from housing.component.data_ingestion import DataIngestion
-from housing.component.data_validation import DataValidation
+from housing.component.data_validation import DataValidation, get_baseline_sketch_file_paths
 from housing.component.data_transformation import DataTransformation
 from housing.component.model_trainer import ModelTrainer
 from housing.component.model_evaluation import ModelEvaluation
 from housing.component.model_pusher import ModelPusher
 from housing.exception import HousingException
+from housing.util.artifact_store import ArtifactStore
+from housing.util.model_registry import ModelRegistry
+from housing.util.experiment_store import ExperimentStore
+from housing.util.tracing import start_tracing, stop_tracing
 from housing.logger import logging, get_log_file_name
 import sys,os
 import uuid
@@ -14,12 +18,12 @@ from threading import Thread
 from datetime import datetime
 from housing.entity.experiment import Experiment
 from housing.config.configuration import configuration 
-from housing.constants import EXPERIMENT_DIR_NAME,EXPERIMENT_FILE_NAME
-from housing.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact, DataTransformationArtifact, ModelTrainerArtifact, ModelEvaluationArtifact, ModelPusherArtifact
+from housing.constants import *
+from housing.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact, DataDriftArtifact, DataTransformationArtifact, ModelTrainerArtifact, ModelEvaluationArtifact, ModelPusherArtifact
 import pandas as pd 
-from multiprocessing import process
-
-from typing import list 
+import json
+from housing.pipeline.stage_executor import Stage, StageExecutor, STAGE_EXECUTED
+from housing.pipeline.checkpoint import PipelineCheckpoint, get_incomplete_time_stamps
 Experiment = namedtuple("Experiment",["experiment_id", "initialization_timestamp","artifact_time_stamp","running_status",
                                       "start_time","stop_time","execution_time","message","experiment_file_path","accuracy","is_model_accepted"])
 
@@ -29,13 +33,27 @@ Experiment = namedtuple("Experiment",["experiment_id", "initialization_timestamp
 class Pipeline(Thread):
     experiment: Experiment= Experiment(*([None] *11))
     experiment_file_path = None 
+    experiment_store: ExperimentStore = None
 
-    def __init__(self, config: configuration)-> None:
+    def __init__(self, config: configuration, resume: bool = False)-> None:
+        """
+        resume: continue the run of config.time_stamp from its checkpoint, stages it completed are not run again
+        """
         try:
             os.makedirs(config.training_pipeline_config.artifact_dir, exist_ok=True)
             Pipeline.experiment_file_path=os.path.join(config.training_pipeline_config.artifact_dir,EXPERIMENT_DIR_NAME,EXPERIMENT_FILE_NAME)
+            Pipeline.experiment_store = ExperimentStore(
+                db_file_path=os.path.join(config.training_pipeline_config.artifact_dir,EXPERIMENT_DIR_NAME,EXPERIMENT_DB_FILE_NAME),
+                csv_file_path=Pipeline.experiment_file_path)
             super().__init__(daemon=False, name= "pipeline")
             self.config = config 
+            self.artifact_store_config = config.get_artifact_store_config()
+            self.artifact_store = ArtifactStore(store_dir=self.artifact_store_config.store_dir, experiment_id=config.time_stamp)
+            self.pipeline_executor_config = config.get_pipeline_executor_config()
+            self.checkpoint = PipelineCheckpoint(checkpoint_dir=self.pipeline_executor_config.checkpoint_dir)
+            self.resume = resume
+            if resume and not self.checkpoint.exists():
+                raise Exception(f"No checkpoint of pipeline run [{config.time_stamp}] to resume")
 
         except Exception as e :
             raise HousingException(sys,e) from e 
@@ -90,10 +108,12 @@ class Pipeline(Thread):
         except Exception as e:
             raise HousingException(sys, e) from e
         
-    def start_model_pusher (self, model_evaluation_artifact: ModelEvaluationArtifact) -> ModelPusherArtifact:
+    def start_model_pusher (self, model_evaluation_artifact: ModelEvaluationArtifact,
+                            data_ingestion_artifact: DataIngestionArtifact) -> ModelPusherArtifact:
         try:
             model_pusher = ModelPusher( model_pusher_config=self.config.get_model_pusher_config(),
-                                       model_evaluation_artifact=model_evaluation_artifact)
+                                       model_evaluation_artifact=model_evaluation_artifact,
+                                       data_ingestion_artifact=data_ingestion_artifact)
             
             return model_pusher.initiate_model_pusher()
         except Exception as e:
@@ -101,48 +121,156 @@ class Pipeline(Thread):
         
     
     
+    def start_data_drift_report(self, data_ingestion_artifact: DataIngestionArtifact)-> DataDriftArtifact:
+        try:
+            data_validation = DataValidation(data_validation_config=self.config.get_data_validation_config(),data_ingestion_artifact=data_ingestion_artifact)
+            return data_validation.initiate_data_drift_report()
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
+    def get_drift_baseline_fingerprint(self, data_ingestion_artifact: DataIngestionArtifact) -> str:
+        """baseline sketch files the drift report would compare against, with their size and mtime"""
+        baseline_sketch_file_paths = get_baseline_sketch_file_paths(data_validation_config=self.config.get_data_validation_config(),
+                                                                    train_sketch_file_path=data_ingestion_artifact.train_sketch_file_path)
+        baseline = [(os.path.abspath(sketch_file_path), os.stat(sketch_file_path).st_size, os.stat(sketch_file_path).st_mtime_ns)
+                    for sketch_file_path in baseline_sketch_file_paths]
+        return json.dumps(baseline)
+
+    def start_accepted_model_pusher(self, model_evaluation_artifact: ModelEvaluationArtifact,
+                                    data_ingestion_artifact: DataIngestionArtifact):
+        """pushes model only if evaluation accepted it, returns None otherwise"""
+        if not model_evaluation_artifact.is_model_accepted:
+            logging.info(f"trained model rejected ")
+            return None
+        model_pusher_artifact = self.start_model_pusher(model_evaluation_artifact=model_evaluation_artifact,
+                                                        data_ingestion_artifact=data_ingestion_artifact)
+        logging.info(f" Model Pusher artifact:{ model_pusher_artifact}")
+        return model_pusher_artifact
+
+    def get_stages(self)-> list:
+        """
+        stage graph of the training pipeline, drift reporting runs next to transformation and training
+        and nothing depends on it, its failure does not stop them.
+        evaluation and pushing depend on saved models outside the graph hence always execute
+        """
+        schema_file_path = self.config.get_schema_file_path()
+        model_config_file_path = self.config.get_model_trainer_config().model_config_file_path
+        return [
+            Stage(name=DATA_INGESTION_STAGE,
+                  function=lambda: self.start_data_ingestion(),
+                  upstream=[], config_sections=[DATA_INGESTION_CONFIG_KEY], config_files=[schema_file_path],
+                  code_modules=["housing.component.data_ingestion", "housing.util.stratified_split", "housing.util.sketch"],
+                  #ingestion skips unchanged sources itself, downstream stages are keyed by the ingested data
+                  cacheable=False, output_fingerprint=lambda artifact: artifact.dataset_sha256),
+            Stage(name=DATA_VALIDATION_STAGE,
+                  function=lambda data_ingestion: self.start_data_validation(data_ingestion_artifact=data_ingestion),
+                  upstream=[DATA_INGESTION_STAGE], config_sections=[DATA_VALIDATION_CONFIG_KEY], config_files=[schema_file_path],
+                  code_modules=["housing.component.data_validation", "housing.util.schema_validator"],
+                  cacheable=True, output_fingerprint=None),
+            Stage(name=DATA_DRIFT_STAGE,
+                  function=lambda data_ingestion, data_validation: self.start_data_drift_report(data_ingestion_artifact=data_ingestion),
+                  upstream=[DATA_INGESTION_STAGE, DATA_VALIDATION_STAGE], config_sections=[DATA_VALIDATION_CONFIG_KEY],
+                  config_files=[schema_file_path],
+                  code_modules=["housing.component.data_validation", "housing.util.drift", "housing.util.sketch"],
+                  cacheable=True, output_fingerprint=None,
+                  #baseline of earlier ingestions changes without the dataset changing
+                  input_fingerprint=lambda data_ingestion, data_validation: self.get_drift_baseline_fingerprint(data_ingestion_artifact=data_ingestion),
+                  #a failing drift report is recorded, transformation, training and evaluation go on
+                  fatal=False),
+            Stage(name=DATA_TRANSFORMATION_STAGE,
+                  function=lambda data_ingestion, data_validation: self.start_data_transformation(data_ingestion_artifact=data_ingestion,
+                                                                                                  data_validation_artifact=data_validation),
+                  upstream=[DATA_INGESTION_STAGE, DATA_VALIDATION_STAGE], config_sections=[DATA_TRANSFORMATION_CONFIG_KEY],
+                  config_files=[schema_file_path], code_modules=["housing.component.data_transformation"],
+                  cacheable=True, output_fingerprint=None),
+            Stage(name=MODEL_TRAINER_STAGE,
+                  function=lambda data_transformation: self.start_model_trainer(data_transformation_artifact=data_transformation),
+                  upstream=[DATA_TRANSFORMATION_STAGE], config_sections=[MODEL_TRAINER_CONFIG_KEY],
+                  config_files=[model_config_file_path],
+                  code_modules=["housing.component.model_trainer", "housing.entity.model_factory"],
+                  cacheable=True, output_fingerprint=None),
+            Stage(name=MODEL_EVALUATION_STAGE,
+                  function=lambda data_ingestion, data_validation, model_trainer: self.start_model_evaluation(data_ingestion_artifact=data_ingestion,
+                                                                                                             data_validation_artifact=data_validation,
+                                                                                                             model_trainer_artifact=model_trainer),
+                  upstream=[DATA_INGESTION_STAGE, DATA_VALIDATION_STAGE, MODEL_TRAINER_STAGE], config_sections=[MODEL_EVALUATION_CONFIG_KEY],
+                  config_files=[], code_modules=["housing.component.model_evaluation"],
+                  cacheable=False, output_fingerprint=None),
+            Stage(name=MODEL_PUSHER_STAGE,
+                  function=lambda model_evaluation, data_ingestion: self.start_accepted_model_pusher(model_evaluation_artifact=model_evaluation,
+                                                                                                     data_ingestion_artifact=data_ingestion),
+                  upstream=[MODEL_EVALUATION_STAGE, DATA_INGESTION_STAGE], config_sections=[MODEL_PUSHER_CONFIG_KEY],
+                  config_files=[], code_modules=["housing.component.model_pusher"],
+                  cacheable=False, output_fingerprint=None),
+        ]
+
+    def save_run_record(self, stage_runs: dict):
+        """records which stages were reused from cache and which were executed in this run"""
+        try:
+            run_record_file_path = self.pipeline_executor_config.run_record_file_path
+            os.makedirs(os.path.dirname(run_record_file_path), exist_ok=True)
+            run_record = {"experiment_id": Pipeline.experiment.experiment_id,
+                          "time_stamp": self.config.time_stamp,
+                          "stages": {name: stage_run._asdict() for name, stage_run in stage_runs.items()}}
+            with open(run_record_file_path, "w") as run_record_file:
+                json.dump(run_record, run_record_file, indent=4)
+            logging.info(f"Pipeline run record: { {name: stage_run.status for name, stage_run in stage_runs.items()} }")
+        except Exception as e:
+            raise HousingException(e,sys) from e
+
     def run_pipeline(self):
+        is_tracing = False
         try:
             if Pipeline.experiment.running_status:
                 logging.info(f" Pipeline is already running")
                 return Pipeline.experiment
-            
-            # data ingestion
-            logging.info(f" Pipeline Starting ")
 
-            experiment_id =  str(uuid.uuid4())
+            #garbage collection of other runs is skipped until this run no longer reads artifacts
+            self.artifact_store.acquire_run_lock()
+            completed_stages = dict()
+            if self.resume:
+                completed_stages = self.checkpoint.get_completed_stages()
+                experiment_id = self.checkpoint.read_manifest()["experiment_id"]
+                logging.info(f" Pipeline resuming run [{self.config.time_stamp}], completed stages: {list(completed_stages)}")
+            else:
+                logging.info(f" Pipeline Starting ")
+                experiment_id =  str(uuid.uuid4())
 
             Pipeline.experiment= Experiment(experiment_id=experiment_id,
                                             initialization_timestamp=self.config.time_stamp,
                                              artifact_time_stamp=self.config.time_stamp,
                                               running_status= True,
-                                               start_time=None,
+                                               start_time=datetime.now(),
+                                               stop_time=None,
                                                 execution_time=None,
                                                  experiment_file_path=Pipeline.experiment_file_path,
                                                   is_model_accepted=None,
-                                                   message="pipeline has been started",
+                                                   message="pipeline has been resumed" if self.resume else "pipeline has been started",
                                                     accuracy= None, )
             
             logging.info(f" Pipeline experiment :{Pipeline.experiment}")
             self.save_experiment()
+            self.checkpoint.start(experiment_id=experiment_id, time_stamp=self.config.time_stamp)
+            start_tracing(trace_file_path=self.get_trace_file_path(), process_name=f"housing pipeline {self.config.time_stamp}")
+            is_tracing = True
 
-            data_ingestion_artifact =self.start_data_ingestion()
-            data_validation_artifact =  self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
-            data_transformation_artifact = self.start_data_transformation(data_ingestion_artifact=data_ingestion_artifact,
-                                                                          data_validation_artifact=data_validation_artifact)
-            
-            model_trainer_artifact = self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)
-            model_evaluation_artifact = self.start_model_evaluation(data_ingestion_artifact=data_ingestion_artifact,
-                                                                    data_validation_artifact=data_validation_artifact,
-                                                                    model_trainer_artifact=model_trainer_artifact)
-            
-            if model_evaluation_artifact.is_model_accepted:
-                model_pusher_artifact = self.start_model_pusher(model_evaluation_artifact=model_evaluation_artifact)
-                logging.info(f" Model Pusher artifact:{ model_pusher_artifact}")
+            stage_executor = StageExecutor(stages=self.get_stages(), config_info=self.config.config_info,
+                                           stage_cache_dir=self.pipeline_executor_config.stage_cache_dir,
+                                           max_workers=self.pipeline_executor_config.max_workers)
+            artifacts, stage_runs = stage_executor.run(completed_stages=completed_stages,
+                                                       on_stage_completed=self.checkpoint.save_stage,
+                                                       on_stage_failed=self.checkpoint.save_failure)
+            #executor returns once every fatal stage succeeded, a failed drift report does not keep the run resumable
+            self.checkpoint.complete()
+            self.save_run_record(stage_runs=stage_runs)
+
+            self.commit_artifacts(artifacts=artifacts)
 
-            else :
-                logging.info(f"trained model rejected ")
+            data_ingestion_artifact = artifacts[DATA_INGESTION_STAGE]
+            model_trainer_artifact = artifacts[MODEL_TRAINER_STAGE]
+            model_evaluation_artifact = artifacts[MODEL_EVALUATION_STAGE]
             logging.info(f" pipeline completed")
+            logging.info(f"Dataset cache stats: {data_ingestion_artifact.dataset.get_stats()}")
 
             stop_time = datetime.now()
             Pipeline.experiment = Experiment(experiment_id=Pipeline.experiment.experiment_id,
@@ -159,9 +287,72 @@ class Pipeline(Thread):
             
             logging.info(f"Pipline experiment :{Pipeline.experiment}")
             self.save_experiment()
+            self.collect_garbage()
 
         except Exception as e:
-            raise HousingException(sys, e) from e
+            if Pipeline.experiment.running_status:
+                #failed run can be resumed, it must not block the next one
+                stop_time = datetime.now()
+                Pipeline.experiment = Pipeline.experiment._replace(running_status=False, stop_time=stop_time,
+                                                                   execution_time=stop_time - Pipeline.experiment.start_time,
+                                                                   message=f"Pipeline failed, resume run [{self.config.time_stamp}] to continue")
+                self.save_experiment()
+            raise HousingException(e, sys) from e
+        finally:
+            self.artifact_store.release_run_lock()
+            if is_tracing:
+                stop_tracing()
+
+    def commit_artifacts(self, artifacts: dict):
+        """interns raw data and the files of every stage artifact into the artifact store as references of this run"""
+        try:
+            self.artifact_store.put_dir(self.config.get_data_ingestion_config().raw_data_dir)
+            #cached and resumed stages reuse files of earlier runs, this run refers to them as well
+            for artifact in artifacts.values():
+                if artifact is not None:
+                    self.artifact_store.commit_artifact(artifact)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def collect_garbage(self) -> dict:
+        """garbage collection of the artifact store, files the model registry still needs are kept"""
+        try:
+            model_registry = ModelRegistry(db_file_path=self.config.get_model_registry_file_path())
+            return self.artifact_store.collect_garbage(retained_experiments=self.artifact_store_config.retained_experiments,
+                                                       retained_file_paths=model_registry.get_retained_file_paths())
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_trace_file_path(self) -> str:
+        """trace of a resumed run is saved next to the trace of the attempt it continues"""
+        trace_file_path = self.pipeline_executor_config.trace_file_path
+        if self.resume:
+            trace_file_path = f"{os.path.splitext(trace_file_path)[0]}_resumed_{get_current_time_stamp()}.json"
+        return trace_file_path
+
+    @staticmethod
+    def get_resumable_time_stamps(config: configuration) -> list:
+        """time stamps of checkpointed runs which did not complete, oldest first, read without building a pipeline"""
+        checkpoint_root_dir = os.path.dirname(config.get_pipeline_executor_config().checkpoint_dir)
+        return get_incomplete_time_stamps(checkpoint_root_dir=checkpoint_root_dir, stage_names=PIPELINE_STAGE_NAMES)
+
+    @classmethod
+    def resume_pipeline(cls, time_stamp: str = None, config_file_path: str = CONFIG_FILE_PATH):
+        """
+        resumes the run of time_stamp, by default the latest incomplete one, in the calling thread
+        return: Experiment
+        """
+        try:
+            if time_stamp is None:
+                resumable_time_stamps = cls.get_resumable_time_stamps(config=configuration(config_file_path=config_file_path))
+                if len(resumable_time_stamps) == 0:
+                    raise Exception("No incomplete pipeline run to resume")
+                time_stamp = resumable_time_stamps[-1]
+            pipeline = cls(config=configuration(config_file_path=config_file_path, current_time_stamp=time_stamp), resume=True)
+            pipeline.run_pipeline()
+            return Pipeline.experiment
+        except Exception as e:
+            raise HousingException(e, sys) from e
         
     def run(self):
         try:
@@ -173,41 +364,28 @@ class Pipeline(Thread):
     def save_experiment(self):
         try:
             if Pipeline.experiment.experiment_id is not None:
-                experiment = Pipeline.experiment
-                experiment_dict = experiment._asdict()
-                experiment_dict: dict = {key : [value] for key, value in experiment_dict.items()}
-
-                experiment_dict.update({
-                    "created_time_stamp": [datetime.now()],
-                    "experiment_file_path": [os.path.basename(Pipeline.experiment.experiment_file_path)]
-                })
-
-                experiment_report = pd.Dataframe(experiment_dict)
-                os.makedirs(os.path.dirname(Pipeline.experiment_file_path), exist_ok=True)
-                if os.path.exists(Pipeline.experiment_file_path):
-                    experiment_report.to_csv(Pipeline.experiment_file_path, index= False ,header = False , mode= "a")
-                else :
-                    experiment_report.to_csv(Pipeline.experiment_file_path, mode= "w", index=False, header= True)
-
+                Pipeline.experiment_store.save_experiment(Pipeline.experiment._asdict())
             else: 
                 print(" first start Experiment")
 
 
         except Exception as e:
-            raise HousingException(sys,e ) from e
+            raise HousingException(e, sys) from e
         
 
     @classmethod
-    def get_experiments_status(cls, limit : int= 5) -> pd.DataFrame:
-        try:
-            if os.path.exists(Pipeline.experiment_file_path):
-                df= pd.read_csv(Pipeline.experiment_file_path)
-                limit =-1 * int(limit)
-                return df[limit:].drop(columns= ["experiment_file_path" , "initialization_timestamp"], axis = 1)
+    def get_experiment_store(cls) -> ExperimentStore:
+        if cls.experiment_store is None:
+            experiment_dir = os.path.join(configuration().training_pipeline_config.artifact_dir, EXPERIMENT_DIR_NAME)
+            cls.experiment_store = ExperimentStore(db_file_path=os.path.join(experiment_dir, EXPERIMENT_DB_FILE_NAME),
+                                                   csv_file_path=os.path.join(experiment_dir, EXPERIMENT_FILE_NAME))
+        return cls.experiment_store
 
-            else:
-                return pd.DataFrame()
-            
+    @classmethod
+    def get_experiments_status(cls, limit : int= 5, running_status: bool = None) -> pd.DataFrame:
+        try:
+            experiment_df = cls.get_experiment_store().get_experiments(limit=limit, running_status=running_status)
+            return experiment_df.drop(columns= ["experiment_file_path" , "initialization_timestamp"])
         except Exception as e:
             raise HousingException(e,sys) from e
 
@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import inspect
+import importlib
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from housing.exception import HousingException
+from housing.logger import logging
+from housing.util.util import save_object, load_object
+from housing.util.tracing import span, TRACE_STAGE_CATEGORY
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+STAGE_CACHED = "cached"
+STAGE_EXECUTED = "executed"
+STAGE_RESUMED = "resumed"
+
+#name: unique stage name
+#function: callable receiving upstream artifacts as keyword arguments named after upstream stages
+#upstream: names of stages whose artifacts the stage consumes
+#config_sections: keys of config.yaml the stage reads
+#config_files: other files the stage reads, e.g. schema.yaml or model.yaml
+#code_modules: modules implementing the stage, their source is part of the fingerprint
+#cacheable: False for stages depending on state outside their inputs, they always execute
+#output_fingerprint: optional callable artifact -> str identifying the output of a stage which always
+#                    executes, downstream stages are skipped as long as it does not change
+#input_fingerprint: optional callable receiving upstream artifacts like function, returns str identifying
+#                   state outside the graph the stage reads, e.g. files of earlier runs
+#fatal: False for a stage whose failure is recorded without stopping the stages not depending on it
+Stage = namedtuple("Stage", ["name", "function", "upstream", "config_sections", "config_files", "code_modules",
+                             "cacheable", "output_fingerprint", "input_fingerprint", "fatal"], defaults=[None, True])
+
+StageRun = namedtuple("StageRun", ["name", "status", "fingerprint", "duration", "artifact_file_path"])
+
+
+class StageExecutor:
+    """
+    Runs a graph of stages, each stage as soon as its upstream stages are done, up to max_workers at once.
+    Every stage gets a fingerprint from its config sections, config files, code and upstream fingerprints.
+    The artifact of a cacheable stage is saved under stage_cache_dir/<stage>/<fingerprint>.pkl, a later run
+    computing the same fingerprint reuses it instead of executing the stage, provided every
+    *_file_path of the artifact still exists.
+    """
+
+    def __init__(self, stages: list, config_info: dict, stage_cache_dir: str, max_workers: int):
+        try:
+            self.stages = {stage.name: stage for stage in stages}
+            self.config_info = config_info
+            self.stage_cache_dir = stage_cache_dir
+            self.max_workers = max_workers
+            self.code_hashes = dict()
+            for stage in stages:
+                unknown_upstream = [name for name in stage.upstream if name not in self.stages]
+                if len(unknown_upstream) > 0:
+                    raise Exception(f"Stage [{stage.name}] depends on unknown stages {unknown_upstream}")
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_code_hash(self, module_name: str) -> str:
+        if module_name not in self.code_hashes:
+            source_file_path = inspect.getsourcefile(importlib.import_module(module_name))
+            with open(source_file_path, "rb") as source_file:
+                self.code_hashes[module_name] = hashlib.sha256(source_file.read()).hexdigest()
+        return self.code_hashes[module_name]
+
+    def get_fingerprint(self, stage: Stage, upstream_fingerprints: dict, upstream_artifacts: dict = None) -> str:
+        fingerprint_input = {
+            "stage": stage.name,
+            "config": {section: self.config_info.get(section) for section in stage.config_sections},
+            "config_files": {},
+            "code": {module_name: self.get_code_hash(module_name) for module_name in stage.code_modules},
+            "upstream": {name: upstream_fingerprints[name] for name in stage.upstream},
+        }
+        if stage.input_fingerprint is not None:
+            fingerprint_input["input"] = stage.input_fingerprint(**{name: upstream_artifacts[name] for name in stage.upstream})
+        for config_file_path in stage.config_files:
+            with open(config_file_path, "rb") as config_file:
+                fingerprint_input["config_files"][os.path.basename(config_file_path)] = hashlib.sha256(config_file.read()).hexdigest()
+        return hashlib.sha256(json.dumps(fingerprint_input, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get_artifact_file_path(self, stage: Stage, fingerprint: str) -> str:
+        return os.path.join(self.stage_cache_dir, stage.name, f"{fingerprint}.pkl")
+
+    @staticmethod
+    def is_artifact_usable(artifact) -> bool:
+        """cached artifact is only reused while the files it points to are still there"""
+        return all(os.path.exists(value) for field_name, value in artifact._asdict().items()
+                   if field_name.endswith("_file_path") and isinstance(value, str))
+
+    def load_cached_artifact(self, stage: Stage, fingerprint: str):
+        artifact_file_path = self.get_artifact_file_path(stage, fingerprint)
+        if not stage.cacheable or not os.path.exists(artifact_file_path):
+            return None
+        artifact = load_object(file_path=artifact_file_path)
+        return artifact if StageExecutor.is_artifact_usable(artifact) else None
+
+    @contextmanager
+    def stage_cache_lock(self, stage: Stage, fingerprint: str):
+        """
+        processes sharing stage_cache_dir, e.g. runs of a sweep, compute a cacheable stage once:
+        others wait for the lock and then find its artifact in the cache
+        """
+        if not stage.cacheable or fcntl is None:
+            yield
+            return
+        lock_file_path = f"{self.get_artifact_file_path(stage, fingerprint)}.lock"
+        os.makedirs(os.path.dirname(lock_file_path), exist_ok=True)
+        with open(lock_file_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def run_stage(self, stage: Stage, fingerprint: str, upstream_artifacts: dict):
+        """return: (artifact, StageRun)"""
+        with span(stage.name, TRACE_STAGE_CATEGORY, fingerprint=fingerprint) as span_args, \
+                self.stage_cache_lock(stage, fingerprint):
+            start_time = time.perf_counter()
+            artifact = self.load_cached_artifact(stage, fingerprint)
+            if artifact is not None:
+                logging.info(f"Stage [{stage.name}] is unchanged, reusing artifact of fingerprint [{fingerprint}]")
+                span_args["status"] = STAGE_CACHED
+                return artifact, StageRun(name=stage.name, status=STAGE_CACHED, fingerprint=fingerprint,
+                                          duration=time.perf_counter() - start_time,
+                                          artifact_file_path=self.get_artifact_file_path(stage, fingerprint))
+
+            logging.info(f"Executing stage [{stage.name}] with fingerprint [{fingerprint}]")
+            artifact = stage.function(**{name: upstream_artifacts[name] for name in stage.upstream})
+            artifact_file_path = None
+            if stage.cacheable:
+                artifact_file_path = self.get_artifact_file_path(stage, fingerprint)
+                save_object(file_path=artifact_file_path, obj=artifact)
+            span_args["status"] = STAGE_EXECUTED
+            return artifact, StageRun(name=stage.name, status=STAGE_EXECUTED, fingerprint=fingerprint,
+                                      duration=time.perf_counter() - start_time, artifact_file_path=artifact_file_path)
+
+    def get_output_fingerprint(self, stage: Stage, stage_run: StageRun, artifact) -> str:
+        if stage.output_fingerprint is None:
+            return stage_run.fingerprint
+        return hashlib.sha256(f"{stage_run.fingerprint}:{stage.output_fingerprint(artifact)}".encode()).hexdigest()
+
+    def get_downstream_stage_names(self, stage_name: str) -> set:
+        """stages depending on stage_name directly or through other stages"""
+        downstream_stage_names, stage_names = set(), [stage_name]
+        while len(stage_names) > 0:
+            upstream_name = stage_names.pop()
+            for stage in self.stages.values():
+                if upstream_name in stage.upstream and stage.name not in downstream_stage_names:
+                    downstream_stage_names.add(stage.name)
+                    stage_names.append(stage.name)
+        return downstream_stage_names
+
+    def run(self, completed_stages: dict = None, on_stage_completed=None, on_stage_failed=None):
+        """
+        executes the graph, independent stages run concurrently
+        completed_stages: stage name -> (artifact, StageRun) of an earlier attempt, such a stage is not run again
+                          as long as its fingerprint is unchanged
+        on_stage_completed: called with (StageRun, artifact) as soon as a stage is done
+        on_stage_failed: called with (stage name, exception), stages already running are finished before the error is raised.
+                         A stage which is not fatal only skips the stages depending on it, the run goes on
+        return: (stage name -> artifact, stage name -> StageRun), without failed and skipped stages
+        """
+        try:
+            completed_stages = completed_stages or dict()
+            artifacts, stage_runs, output_fingerprints = dict(), dict(), dict()
+            pending = dict(self.stages)
+            running = dict()
+            failures = dict()
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as executor:
+                while len(running) > 0 or (len(pending) > 0 and len(failures) == 0):
+                    ready = [stage for stage in pending.values() if all(name in artifacts for name in stage.upstream)]
+                    for stage in ready if len(failures) == 0 else []:
+                        del pending[stage.name]
+                        fingerprint = self.get_fingerprint(stage, output_fingerprints, artifacts)
+                        if stage.name in completed_stages and completed_stages[stage.name][1].fingerprint == fingerprint:
+                            artifact, stage_run = completed_stages[stage.name]
+                            logging.info(f"Stage [{stage.name}] was completed by an earlier attempt, resuming with its artifact")
+                            artifacts[stage.name] = artifact
+                            stage_runs[stage.name] = stage_run._replace(status=STAGE_RESUMED, duration=0.0)
+                            output_fingerprints[stage.name] = self.get_output_fingerprint(stage, stage_run, artifact)
+                            continue
+                        running[executor.submit(self.run_stage, stage, fingerprint, dict(artifacts))] = stage
+                    if len(running) == 0:
+                        if len(pending) > 0 and len(failures) == 0 and len(ready) == 0:
+                            raise Exception(f"Stages {list(pending)} can never run, their upstream stages form a cycle")
+                        continue
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage = running.pop(future)
+                        try:
+                            artifact, stage_run = future.result()
+                        except Exception as e:
+                            logging.info(f"Stage [{stage.name}] failed: {e}")
+                            if on_stage_failed is not None:
+                                on_stage_failed(stage.name, e)
+                            if stage.fatal:
+                                failures[stage.name] = e
+                                continue
+                            skipped_stage_names = [name for name in self.get_downstream_stage_names(stage.name) if name in pending]
+                            for name in skipped_stage_names:
+                                del pending[name]
+                            logging.info(f"Stage [{stage.name}] is not fatal, skipping stages {skipped_stage_names} depending on it")
+                            continue
+                        artifacts[stage.name] = artifact
+                        stage_runs[stage.name] = stage_run
+                        output_fingerprints[stage.name] = self.get_output_fingerprint(stage, stage_run, artifact)
+                        logging.info(f"Stage [{stage.name}] {stage_run.status} in [{stage_run.duration:.3f}] seconds")
+                        if on_stage_completed is not None:
+                            on_stage_completed(stage_run, artifact)
+            if len(failures) > 0:
+                failed_stage_name, error = next(iter(failures.items()))
+                raise Exception(f"Stage [{failed_stage_name}] failed, stages {list(pending)} were not run: {error}") from error
+            return artifacts, stage_runs
+        except Exception as e:
+            raise HousingException(e, sys) from e
@@ -0,0 +1,224 @@
+"""
+Config matrix sweep:
+
+    python -m housing.pipeline.sweep [--matrix config/sweep.yaml]
+
+The matrix maps dotted config.yaml keys to lists of values, every combination is one run, e.g.
+    matrix:
+      data_transformation_config.add_bedroom_per_room: [true, false]
+      model_trainer_config.model_config_file_name: [model.yaml, model_small.yaml]
+
+Ingestion runs once for the whole sweep, every run then starts from its artifact. Runs are
+processes sharing the stage cache, a stage with the same fingerprint in several runs, e.g.
+validation or a transformation only model.yaml differs for, is computed by one of them and
+reused by the others. Up to cpu_budget // cpus_per_run runs execute at once, each pinned to
+cpus_per_run cpus. Runs stop after training: evaluation and pushing compare against and
+replace the served model, which a sweep must not do.
+Like pipeline runs, every run commits its artifacts to the artifact store under its own time
+stamp, so equal files of runs are deduplicated and expire with them. Garbage collection runs
+once after the last run finished.
+"""
+import os
+import sys
+import copy
+import json
+import time
+import argparse
+import itertools
+import pandas as pd
+from housing.exception import HousingException
+from housing.logger import logging
+from housing.constants import *
+from housing.config.configuration import configuration
+from housing.entity.config_entity import SweepConfig
+from housing.util.util import read_yaml_file, write_yaml_file, save_object, load_object
+from housing.pipeline.job_runner import get_cpu_sets, start_limited_process
+
+SWEEP_SKIPPED_STAGES = [MODEL_EVALUATION_STAGE, MODEL_PUSHER_STAGE]
+SWEEP_INGESTION_FILE_NAME = "data_ingestion.pkl"
+SWEEP_RUN_INFO_FILE_NAME = "run_info.json"
+SWEEP_RUN_CONFIG_FILE_NAME = "config.yaml"
+SWEEP_RUN_RESULT_FILE_NAME = "result.json"
+SWEEP_RUN_TRACE_FILE_NAME = "trace.json"
+SWEEP_COMPARISON_FILE_NAME = "comparison.csv"
+SWEEP_RESULT_COLUMNS = ["model_accuracy", "train_accuracy", "test_accuracy", "train_rmse", "test_rmse"]
+
+
+def set_config_value(config_info: dict, dotted_key: str, value):
+    """sets config_info[a][b] for key a.b, the key must exist so a typo cannot silently add a setting"""
+    *parent_keys, key = dotted_key.split(".")
+    section = config_info
+    for parent_key in parent_keys:
+        section = section[parent_key]
+    if not isinstance(section, dict) or key not in section:
+        raise Exception(f"Sweep key [{dotted_key}] is not a setting of config.yaml")
+    section[key] = value
+
+
+def get_combinations(matrix: dict) -> list:
+    """return: one {dotted key: value} dict per combination of matrix values"""
+    keys = list(matrix)
+    return [dict(zip(keys, values)) for values in itertools.product(*[matrix[key] for key in keys])]
+
+
+class Sweep:
+
+    def __init__(self, sweep_config: SweepConfig, matrix: dict, config_file_path: str = CONFIG_FILE_PATH,
+                 time_stamp: str = CURRENT_TIME_STAMP):
+        try:
+            self.sweep_config = sweep_config
+            self.matrix = matrix
+            self.config_file_path = config_file_path
+            self.time_stamp = time_stamp
+            self.combinations = get_combinations(matrix)
+            self.ingestion_file_path = os.path.join(sweep_config.sweep_dir, SWEEP_INGESTION_FILE_NAME)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def write_run_dirs(self) -> list:
+        """run dir with config.yaml and run info per combination, return: run dirs"""
+        base_config_info = read_yaml_file(file_path=self.config_file_path)
+        run_dirs = []
+        for index, overrides in enumerate(self.combinations):
+            run_config_info = copy.deepcopy(base_config_info)
+            for dotted_key, value in overrides.items():
+                set_config_value(run_config_info, dotted_key, value)
+            run_dir = os.path.join(self.sweep_config.sweep_dir, f"run_{index}")
+            write_yaml_file(file_path=os.path.join(run_dir, SWEEP_RUN_CONFIG_FILE_NAME), data=run_config_info)
+            with open(os.path.join(run_dir, SWEEP_RUN_INFO_FILE_NAME), "w") as run_info_file:
+                json.dump({"index": index, "time_stamp": f"{self.time_stamp}-{index}", "overrides": overrides,
+                           "ingestion_file_path": self.ingestion_file_path}, run_info_file, indent=4)
+            run_dirs.append(run_dir)
+        return run_dirs
+
+    def run_shared_ingestion(self):
+        """ingests once with the base config, runs overriding data_ingestion_config ingest on their own"""
+        from housing.pipeline.pipeline import Pipeline
+        from housing.pipeline.stage_executor import StageExecutor
+        pipeline = Pipeline(config=configuration(config_file_path=self.config_file_path, current_time_stamp=self.time_stamp))
+        ingestion_stages = [stage for stage in pipeline.get_stages() if stage.name == DATA_INGESTION_STAGE]
+        stage_executor = StageExecutor(stages=ingestion_stages, config_info=pipeline.config.config_info,
+                                       stage_cache_dir=pipeline.pipeline_executor_config.stage_cache_dir, max_workers=1)
+        pipeline.artifact_store.acquire_run_lock()
+        try:
+            artifacts, stage_runs = stage_executor.run()
+            pipeline.commit_artifacts(artifacts=artifacts)
+        finally:
+            pipeline.artifact_store.release_run_lock()
+        save_object(file_path=self.ingestion_file_path,
+                    obj={DATA_INGESTION_STAGE: (artifacts[DATA_INGESTION_STAGE], stage_runs[DATA_INGESTION_STAGE])})
+
+    def collect_garbage(self) -> dict:
+        from housing.pipeline.pipeline import Pipeline
+        pipeline = Pipeline(config=configuration(config_file_path=self.config_file_path, current_time_stamp=self.time_stamp))
+        return pipeline.collect_garbage()
+
+    def run_processes(self, run_dirs: list):
+        slot_count = max(1, self.sweep_config.cpu_budget // self.sweep_config.cpus_per_run)
+        cpu_sets = get_cpu_sets(slot_count=slot_count, cpus_per_slot=self.sweep_config.cpus_per_run)
+        pending = list(run_dirs)
+        running = dict()
+        while len(pending) > 0 or len(running) > 0:
+            for slot, cpus in enumerate(cpu_sets):
+                if slot not in running and len(pending) > 0:
+                    run_dir = pending.pop(0)
+                    running[slot] = (run_dir, start_limited_process(command=[sys.executable, "-m", "housing.pipeline.sweep",
+                                                                             "--run-dir", run_dir], cpus=cpus))
+                    logging.info(f"Sweep run [{run_dir}] started on cpus {cpus}")
+            time.sleep(0.2)
+            for slot, (run_dir, process) in list(running.items()):
+                if process.poll() is not None:
+                    del running[slot]
+                    logging.info(f"Sweep run [{run_dir}] exited with code [{process.returncode}]")
+
+    def get_comparison(self, run_dirs: list) -> pd.DataFrame:
+        rows = []
+        for run_dir in run_dirs:
+            with open(os.path.join(run_dir, SWEEP_RUN_INFO_FILE_NAME)) as run_info_file:
+                run_info = json.load(run_info_file)
+            row = {"run": run_info["index"], **run_info["overrides"]}
+            result_file_path = os.path.join(run_dir, SWEEP_RUN_RESULT_FILE_NAME)
+            if os.path.exists(result_file_path):
+                with open(result_file_path) as result_file:
+                    row.update(json.load(result_file))
+            else:
+                row["status"] = "failed"
+            rows.append(row)
+        comparison_df = pd.DataFrame(rows)
+        comparison_df = comparison_df.reindex(columns=list(dict.fromkeys(
+            ["run", *self.matrix, "status", *SWEEP_RESULT_COLUMNS, "duration", "executed_stages", "reused_stages", "error"])))
+        return comparison_df.sort_values(by="model_accuracy", ascending=False, na_position="last")
+
+    def run(self) -> pd.DataFrame:
+        """return: comparison table of every run, best model accuracy first, also saved as comparison.csv"""
+        try:
+            logging.info(f"Sweep of [{len(self.combinations)}] runs over {list(self.matrix)} started")
+            run_dirs = self.write_run_dirs()
+            self.run_shared_ingestion()
+            self.run_processes(run_dirs)
+            self.collect_garbage()
+            comparison_df = self.get_comparison(run_dirs)
+            comparison_file_path = os.path.join(self.sweep_config.sweep_dir, SWEEP_COMPARISON_FILE_NAME)
+            comparison_df.to_csv(comparison_file_path, index=False)
+            logging.info(f"Sweep comparison saved to [{comparison_file_path}]")
+            return comparison_df
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+
+def run_sweep_run(run_dir: str) -> int:
+    """runs the stages of one combination in the current process, return: exit code"""
+    from housing.pipeline.pipeline import Pipeline
+    from housing.pipeline.stage_executor import StageExecutor, STAGE_EXECUTED
+    from housing.util.tracing import start_tracing, stop_tracing
+    start_time = time.perf_counter()
+    result = {"status": "succeeded"}
+    try:
+        with open(os.path.join(run_dir, SWEEP_RUN_INFO_FILE_NAME)) as run_info_file:
+            run_info = json.load(run_info_file)
+        config = configuration(config_file_path=os.path.join(run_dir, SWEEP_RUN_CONFIG_FILE_NAME),
+                               current_time_stamp=run_info["time_stamp"])
+        pipeline = Pipeline(config=config)
+        stages = [stage for stage in pipeline.get_stages() if stage.name not in SWEEP_SKIPPED_STAGES]
+        stage_executor = StageExecutor(stages=stages, config_info=config.config_info,
+                                       stage_cache_dir=pipeline.pipeline_executor_config.stage_cache_dir,
+                                       max_workers=pipeline.pipeline_executor_config.max_workers)
+        start_tracing(trace_file_path=os.path.join(run_dir, SWEEP_RUN_TRACE_FILE_NAME), process_name=f"sweep {run_dir}")
+        #garbage collection of other runs is skipped while this run reads artifacts
+        pipeline.artifact_store.acquire_run_lock()
+        try:
+            artifacts, stage_runs = stage_executor.run(completed_stages=load_object(file_path=run_info["ingestion_file_path"]))
+            pipeline.commit_artifacts(artifacts=artifacts)
+        finally:
+            pipeline.artifact_store.release_run_lock()
+            stop_tracing()
+        model_trainer_artifact = artifacts[MODEL_TRAINER_STAGE]
+        result.update({column: getattr(model_trainer_artifact, column) for column in SWEEP_RESULT_COLUMNS})
+        result["executed_stages"] = ", ".join(name for name, stage_run in stage_runs.items() if stage_run.status == STAGE_EXECUTED)
+        result["reused_stages"] = ", ".join(name for name, stage_run in stage_runs.items() if stage_run.status != STAGE_EXECUTED)
+    except Exception as e:
+        logging.exception(e)
+        result.update(status="failed", error=str(e))
+    result["duration"] = time.perf_counter() - start_time
+    with open(os.path.join(run_dir, SWEEP_RUN_RESULT_FILE_NAME), "w") as result_file:
+        json.dump(result, result_file, indent=4, default=float)
+    return 0 if result["status"] == "succeeded" else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs every combination of a config matrix")
+    parser.add_argument("--matrix", default=SWEEP_FILE_PATH, help="yaml file with a matrix of dotted config.yaml keys")
+    parser.add_argument("--config-file-path", default=CONFIG_FILE_PATH)
+    parser.add_argument("--run-dir", default=None, help="run one prepared combination in the current process")
+    args = parser.parse_args()
+    if args.run_dir is not None:
+        return run_sweep_run(run_dir=args.run_dir)
+    matrix = read_yaml_file(file_path=args.matrix)[SWEEP_MATRIX_KEY]
+    sweep_config = configuration(config_file_path=args.config_file_path).get_sweep_config()
+    comparison_df = Sweep(sweep_config=sweep_config, matrix=matrix, config_file_path=args.config_file_path).run()
+    print(comparison_df.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+from housing.exception import HousingException
+from housing.logger import logging
+from housing.constants import *
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class ArtifactStore:
+    """
+    Content addressed blob store for pipeline artifacts.
+    Every artifact file is hashed and kept once under objects/<digest[:2]>/<digest>,
+    the timestamped artifact path is turned into a hardlink of that blob and
+    refs/<experiment_id>.json records which blobs an experiment refers to.
+    Artifacts interned in the store must be treated as immutable.
+    A run holds a shared lock on the store while it reads artifacts, garbage collection needs it exclusively
+    and is skipped while any other run, of another job or a sweep, is in progress.
+    """
+
+    def __init__(self, store_dir: str, experiment_id: str):
+        try:
+            self.store_dir = store_dir
+            self.objects_dir = os.path.join(store_dir, ARTIFACT_STORE_OBJECTS_DIR_NAME)
+            self.refs_dir = os.path.join(store_dir, ARTIFACT_STORE_REFS_DIR_NAME)
+            self.experiment_id = experiment_id
+            self.ref_file_path = os.path.join(self.refs_dir, f"{experiment_id}.json")
+            self.lock_file_path = os.path.join(store_dir, ARTIFACT_STORE_LOCK_FILE_NAME)
+            self.run_lock_file = None
+            os.makedirs(self.objects_dir, exist_ok=True)
+            os.makedirs(self.refs_dir, exist_ok=True)
+            self.references = self.read_references(self.ref_file_path)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @staticmethod
+    def get_file_digest(file_path: str) -> str:
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as file_obj:
+            for chunk in iter(lambda: file_obj.read(DOWNLOAD_CHUNK_SIZE), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    @staticmethod
+    def read_references(ref_file_path: str) -> dict:
+        if not os.path.exists(ref_file_path):
+            return dict()
+        with open(ref_file_path) as ref_file:
+            return json.load(ref_file)
+
+    def get_blob_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def save_references(self):
+        tmp_ref_file_path = f"{self.ref_file_path}.tmp"
+        with open(tmp_ref_file_path, "w") as ref_file:
+            json.dump(self.references, ref_file, indent=2)
+        os.replace(tmp_ref_file_path, self.ref_file_path)
+
+    @staticmethod
+    def link_or_copy(src: str, dst: str) -> bool:
+        """hardlinks src at dst atomically, falls back to copy where hardlinks are not supported
+        return: True if dst is a hardlink of src"""
+        tmp_dst = f"{dst}.{os.getpid()}.tmp"
+        try:
+            os.link(src, tmp_dst)
+            is_linked = True
+        except OSError:
+            shutil.copyfile(src, tmp_dst)
+            is_linked = False
+        os.replace(tmp_dst, dst)
+        return is_linked
+
+    def put_file(self, file_path: str) -> str:
+        """interns file_path into the store
+        return: sha256 digest of file content"""
+        try:
+            digest = ArtifactStore.get_file_digest(file_path)
+            blob_path = self.get_blob_path(digest)
+
+            if os.path.exists(blob_path):
+                if not os.path.samefile(blob_path, file_path):
+                    ArtifactStore.link_or_copy(src=blob_path, dst=file_path)
+                    logging.info(f"Deduplicated artifact [{file_path}] with blob [{digest}]")
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                ArtifactStore.link_or_copy(src=file_path, dst=blob_path)
+                logging.info(f"Stored artifact [{file_path}] as blob [{digest}]")
+
+            self.references[os.path.abspath(file_path)] = digest
+            self.save_references()
+            return digest
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def put_dir(self, dir_path: str):
+        try:
+            if not os.path.isdir(dir_path):
+                return
+            for root, _, file_names in os.walk(dir_path):
+                for file_name in file_names:
+                    self.put_file(os.path.join(root, file_name))
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def commit_artifact(self, artifact):
+        """interns every existing *_file_path field of a stage artifact namedtuple"""
+        try:
+            for field_name, value in artifact._asdict().items():
+                if field_name.endswith("_file_path") and isinstance(value, str) and os.path.isfile(value):
+                    self.put_file(value)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def acquire_run_lock(self):
+        """shared lock held from the start of a run until its garbage collection"""
+        try:
+            if fcntl is None or self.run_lock_file is not None:
+                return
+            self.run_lock_file = open(self.lock_file_path, "a")
+            fcntl.flock(self.run_lock_file, fcntl.LOCK_SH)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def release_run_lock(self):
+        if self.run_lock_file is None:
+            return
+        fcntl.flock(self.run_lock_file, fcntl.LOCK_UN)
+        self.run_lock_file.close()
+        self.run_lock_file = None
+
+    def try_lock_exclusive(self):
+        """
+        return: open lock file holding the exclusive lock, None while another run holds the store.
+        converting the shared lock of this run is not atomic, it is taken again when conversion fails
+        """
+        lock_file = self.run_lock_file if self.run_lock_file is not None else open(self.lock_file_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return lock_file
+        except BlockingIOError:
+            if lock_file is self.run_lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_SH)
+            else:
+                lock_file.close()
+            return None
+
+    def unlock_exclusive(self, lock_file):
+        if lock_file is self.run_lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+        else:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def remove_artifact(self, file_path: str, digest: str) -> bool:
+        """
+        removes an artifact path of an expired experiment and its directories left empty, up to the
+        directory holding the store. A file rewritten since it was interned is kept
+        return: True if file_path was removed
+        """
+        blob_path = self.get_blob_path(digest)
+        if not os.path.isfile(file_path):
+            return False
+        if os.path.exists(blob_path) and not os.path.samefile(file_path, blob_path) \
+                and ArtifactStore.get_file_digest(file_path) != digest:
+            return False
+        os.remove(file_path)
+        root_dir = os.path.dirname(os.path.abspath(self.store_dir))
+        dir_path = os.path.dirname(os.path.abspath(file_path))
+        while dir_path.startswith(f"{root_dir}{os.sep}") and len(os.listdir(dir_path)) == 0:
+            os.rmdir(dir_path)
+            dir_path = os.path.dirname(dir_path)
+        return True
+
+    def collect_garbage(self, retained_experiments: int, retained_file_paths: list = None) -> dict:
+        """
+        keeps the latest retained_experiments experiments. Artifact paths of older experiments are
+        removed unless a retained experiment refers to them too, then every blob no retained
+        experiment refers to is removed. Nothing is removed while another run holds the store
+        retained_file_paths: files still in use outside the store, e.g. models of the model registry.
+                             Their references move to the current experiment so they outlive their own
+        return: dict with number of removed refs, removed artifacts, removed blobs and freed bytes
+        """
+        lock_file = None
+        try:
+            if fcntl is not None:
+                lock_file = self.try_lock_exclusive()
+                if lock_file is None:
+                    logging.info(f"Artifact store [{self.store_dir}] is used by another run, garbage collection skipped")
+                    return {"removed_refs": 0, "removed_artifacts": 0, "removed_blobs": 0, "freed_bytes": 0, "skipped": True}
+            return self.remove_expired(retained_experiments=retained_experiments, retained_file_paths=retained_file_paths)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+        finally:
+            if lock_file is not None:
+                self.unlock_exclusive(lock_file)
+
+    def remove_expired(self, retained_experiments: int, retained_file_paths: list = None) -> dict:
+        """garbage collection of collect_garbage, the caller holds the store exclusively"""
+        try:
+            retained_file_paths = {os.path.abspath(file_path) for file_path in retained_file_paths or [] if file_path is not None}
+            ref_file_names = sorted(file_name for file_name in os.listdir(self.refs_dir) if file_name.endswith(".json"))
+            retained_ref_file_names = ref_file_names[-retained_experiments:] if retained_experiments > 0 else []
+            retained_ref_file_names = set(retained_ref_file_names) | {os.path.basename(self.ref_file_path)}
+
+            retained_references = dict(self.references)
+            for ref_file_name in retained_ref_file_names:
+                retained_references.update(self.read_references(os.path.join(self.refs_dir, ref_file_name)))
+            referenced_digests = set(retained_references.values())
+
+            removed_refs, removed_artifacts = 0, 0
+            for ref_file_name in ref_file_names:
+                if ref_file_name in retained_ref_file_names:
+                    continue
+                ref_file_path = os.path.join(self.refs_dir, ref_file_name)
+                for file_path, digest in self.read_references(ref_file_path).items():
+                    if file_path in retained_file_paths and file_path not in retained_references:
+                        self.references[file_path] = digest
+                        retained_references[file_path] = digest
+                        referenced_digests.add(digest)
+                        continue
+                    #ingestion may reuse files of an earlier run, those stay while a retained run refers to them
+                    if file_path not in retained_references and self.remove_artifact(file_path, digest):
+                        removed_artifacts += 1
+                #references are carried over before the ref file holding them goes away
+                self.save_references()
+                os.remove(ref_file_path)
+                removed_refs += 1
+
+            removed_blobs, freed_bytes = 0, 0
+            for prefix in os.listdir(self.objects_dir):
+                prefix_dir = os.path.join(self.objects_dir, prefix)
+                for digest in os.listdir(prefix_dir):
+                    if digest in referenced_digests:
+                        continue
+                    blob_path = os.path.join(prefix_dir, digest)
+                    blob_stat = os.stat(blob_path)
+                    os.remove(blob_path)
+                    removed_blobs += 1
+                    #content still linked from elsewhere is not freed by removing the blob
+                    if blob_stat.st_nlink == 1:
+                        freed_bytes += blob_stat.st_size
+                if len(os.listdir(prefix_dir)) == 0:
+                    os.rmdir(prefix_dir)
+
+            gc_report = {"removed_refs": removed_refs, "removed_artifacts": removed_artifacts,
+                         "removed_blobs": removed_blobs, "freed_bytes": freed_bytes, "skipped": False}
+            logging.info(f"Artifact store garbage collection: {gc_report}")
+            return gc_report
+        except Exception as e:
+            raise HousingException(e, sys) from e
@@ -0,0 +1,126 @@
+import sys
+import threading
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from housing.exception import HousingException
+from housing.logger import logging
+from housing.constants import *
+from housing.util.util import read_yaml_file, load_data
+
+TRAIN_SPLIT = "train"
+TEST_SPLIT = "test"
+
+
+class DatasetHandle:
+    """
+    Lazily loaded train/test dataset shared read only by all stages of a pipeline run.
+    Each split file is parsed at most once while it stays cached, typed frames and derived
+    column arrays are kept in a least recently used cache bounded by cache_size_bytes.
+    Callers get shallow copies of cached frames and read only arrays, so the cache is never
+    modified through them. Only file paths are pickled, caches are rebuilt on first use.
+    """
+
+    def __init__(self, train_file_path: str, test_file_path: str, schema_file_path: str, cache_size_bytes: int):
+        self.train_file_path = train_file_path
+        self.test_file_path = test_file_path
+        self.schema_file_path = schema_file_path
+        self.cache_size_bytes = cache_size_bytes
+        self.init_cache()
+
+    def init_cache(self):
+        self.lock = threading.RLock()
+        self.cache = OrderedDict()
+        self.cached_bytes = 0
+        self.schema = None
+        self.stats = {"parse_count": 0, "cache_hit_count": 0, "eviction_count": 0}
+
+    def __getstate__(self):
+        return {"train_file_path": self.train_file_path, "test_file_path": self.test_file_path,
+                "schema_file_path": self.schema_file_path, "cache_size_bytes": self.cache_size_bytes}
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self.init_cache()
+
+    def __repr__(self):
+        return f"DatasetHandle(train_file_path={self.train_file_path!r}, test_file_path={self.test_file_path!r})"
+
+    def get_file_path(self, split: str) -> str:
+        if split == TRAIN_SPLIT:
+            return self.train_file_path
+        if split == TEST_SPLIT:
+            return self.test_file_path
+        raise Exception(f"Unknown dataset split: [{split}]")
+
+    def get_schema(self) -> dict:
+        """schema.yaml content, read once per handle"""
+        try:
+            with self.lock:
+                if self.schema is None:
+                    self.schema = read_yaml_file(file_path=self.schema_file_path)
+                else:
+                    self.stats["cache_hit_count"] += 1
+                return self.schema
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_cached(self, key: tuple):
+        value = self.cache.get(key)
+        if value is not None:
+            self.cache.move_to_end(key)
+            self.stats["cache_hit_count"] += 1
+        return value
+
+    def put_cached(self, key: tuple, value, size_bytes: int):
+        """caches value evicting least recently used entries, values larger than the whole cache are not kept"""
+        if size_bytes > self.cache_size_bytes:
+            return
+        while self.cached_bytes + size_bytes > self.cache_size_bytes and len(self.cache) > 0:
+            evicted_key, (_, evicted_size_bytes) = self.cache.popitem(last=False)
+            self.cached_bytes -= evicted_size_bytes
+            self.stats["eviction_count"] += 1
+            logging.info(f"Evicted [{evicted_key}] from dataset cache")
+        self.cache[key] = (value, size_bytes)
+        self.cached_bytes += size_bytes
+
+    def get_dataframe(self, split: str, columns: list = None) -> pd.DataFrame:
+        """
+        typed dataframe of one split, all schema columns are parsed once and columns selected from the cached frame
+        returned frame may be modified freely by caller, cached frame is not affected
+        """
+        try:
+            with self.lock:
+                key = ("frame", split)
+                cached = self.get_cached(key)
+                if cached is None:
+                    dataframe = load_data(file_path=self.get_file_path(split), schema_file_path=self.schema_file_path)
+                    self.stats["parse_count"] += 1
+                    self.put_cached(key, dataframe, int(dataframe.memory_usage(deep=True).sum()))
+                else:
+                    dataframe = cached[0]
+            if columns is not None:
+                return dataframe[columns]
+            return dataframe.copy(deep=False)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_column_array(self, split: str, column: str) -> np.ndarray:
+        """read only numpy array of one column, derived from cached frame once"""
+        try:
+            with self.lock:
+                key = ("array", split, column)
+                cached = self.get_cached(key)
+                if cached is not None:
+                    return cached[0]
+                array = self.get_dataframe(split=split, columns=[column])[column].to_numpy(copy=True)
+                array.flags.writeable = False
+                self.put_cached(key, array, array.nbytes)
+                return array
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_stats(self) -> dict:
+        """parse_count: files parsed, cache_hit_count: parses and schema reads saved by the cache"""
+        with self.lock:
+            return dict(self.stats, cached_bytes=self.cached_bytes)
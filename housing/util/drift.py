@@ -0,0 +1,236 @@
+import os
+import sys
+import html
+import json
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from scipy import stats
+from housing.exception import HousingException
+from housing.entity.config_entity import DriftConfig
+from housing.util.sketch import DatasetSketch, NumericalSketch, CategoricalSketch
+
+NUMERICAL_COLUMN_TYPE = "num"
+CATEGORICAL_COLUMN_TYPE = "cat"
+PSI_EPSILON = 1e-4
+#part of the page fingerprint, bump it when render_drift_report_html output changes
+REPORT_PAGE_VERSION = "1"
+
+
+def get_numerical_counts(reference: np.ndarray, current: np.ndarray, bins: int):
+    """
+    bins both samples on quantile edges of reference sample
+    return: (edges, reference counts, current counts), missing values are not counted
+    """
+    reference = reference[~np.isnan(reference)]
+    current = current[~np.isnan(current)]
+    if len(reference) == 0:
+        edges = np.array([], dtype=float)
+    else:
+        edges = np.unique(np.quantile(reference, np.linspace(0, 1, bins + 1)[1:-1]))
+    #bucket i holds values in (edges[i-1], edges[i]], first and last buckets are open ended
+    reference_counts = np.bincount(np.searchsorted(edges, reference, side="left"), minlength=len(edges) + 1)
+    current_counts = np.bincount(np.searchsorted(edges, current, side="left"), minlength=len(edges) + 1)
+    return edges, reference_counts, current_counts
+
+
+def get_categorical_counts(reference: pd.Series, current: pd.Series):
+    """return: (categories, reference counts, current counts) aligned on union of categories"""
+    reference_counts = reference.astype(object).value_counts(dropna=True)
+    current_counts = current.astype(object).value_counts(dropna=True)
+    categories = sorted(set(reference_counts.index) | set(current_counts.index), key=str)
+    return (categories,
+            reference_counts.reindex(categories, fill_value=0).to_numpy(),
+            current_counts.reindex(categories, fill_value=0).to_numpy())
+
+
+def get_population_stability_index(reference_counts: np.ndarray, current_counts: np.ndarray) -> float:
+    reference_share = np.maximum(reference_counts / max(reference_counts.sum(), 1), PSI_EPSILON)
+    current_share = np.maximum(current_counts / max(current_counts.sum(), 1), PSI_EPSILON)
+    return float(np.sum((current_share - reference_share) * np.log(current_share / reference_share)))
+
+
+def get_numerical_column_drift(reference_counts: np.ndarray, current_counts: np.ndarray, drift_config: DriftConfig) -> dict:
+    """two sample Kolmogorov-Smirnov test on aligned histograms of one numerical column"""
+    reference_counts = np.asarray(reference_counts, dtype=float)
+    current_counts = np.asarray(current_counts, dtype=float)
+    reference_size, current_size = reference_counts.sum(), current_counts.sum()
+    if reference_size == 0 or current_size == 0:
+        return {"column_type": NUMERICAL_COLUMN_TYPE, "stat_test": "ks", "statistic": None, "p_value": None,
+                "psi": None, "drift_detected": False}
+
+    statistic = float(np.max(np.abs(np.cumsum(reference_counts) / reference_size - np.cumsum(current_counts) / current_size)))
+    effective_size = np.sqrt(reference_size * current_size / (reference_size + current_size))
+    p_value = float(stats.kstwobign.sf(statistic * effective_size))
+    return {"column_type": NUMERICAL_COLUMN_TYPE,
+            "stat_test": "ks",
+            "statistic": statistic,
+            "p_value": p_value,
+            "psi": get_population_stability_index(reference_counts, current_counts),
+            "drift_detected": p_value < drift_config.ks_p_value}
+
+
+def get_categorical_column_drift(reference_counts: np.ndarray, current_counts: np.ndarray, drift_config: DriftConfig) -> dict:
+    """chi-square test of homogeneity and population stability index of one categorical column"""
+    reference_counts = np.asarray(reference_counts, dtype=float)
+    current_counts = np.asarray(current_counts, dtype=float)
+    psi = get_population_stability_index(reference_counts, current_counts)
+
+    observed = np.vstack([reference_counts, current_counts])
+    observed = observed[:, observed.sum(axis=0) > 0]
+    if observed.shape[1] < 2 or observed.sum(axis=1).min() == 0:
+        statistic, p_value = 0.0, 1.0
+    else:
+        expected = observed.sum(axis=1, keepdims=True) * observed.sum(axis=0, keepdims=True) / observed.sum()
+        statistic = float(np.sum((observed - expected) ** 2 / expected))
+        p_value = float(stats.chi2.sf(statistic, df=observed.shape[1] - 1))
+
+    if drift_config.categorical_stat_test == "psi":
+        drift_detected = psi > drift_config.psi
+    else:
+        drift_detected = p_value < drift_config.chi2_p_value
+    return {"column_type": CATEGORICAL_COLUMN_TYPE,
+            "stat_test": drift_config.categorical_stat_test,
+            "statistic": statistic,
+            "p_value": p_value,
+            "psi": psi,
+            "drift_detected": bool(drift_detected)}
+
+
+def get_drift_summary(column_reports: dict, drift_config: DriftConfig) -> dict:
+    drifted_columns = [column for column, column_report in column_reports.items() if column_report["drift_detected"]]
+    drift_share = len(drifted_columns) / max(len(column_reports), 1)
+    return {"number_of_columns": len(column_reports),
+            "number_of_drifted_columns": len(drifted_columns),
+            "drifted_columns": drifted_columns,
+            "share_of_drifted_columns": drift_share,
+            "dataset_drift": drift_share >= drift_config.drift_share}
+
+
+def get_data_drift_report(reference_df: pd.DataFrame, current_df: pd.DataFrame,
+                          numerical_columns: list, categorical_columns: list, drift_config: DriftConfig) -> dict:
+    """
+    compares current_df against reference_df column by column
+    return: json serializable report with per column statistics and overall drift verdict
+    """
+    try:
+        column_reports = dict()
+        for column in numerical_columns:
+            edges, reference_counts, current_counts = get_numerical_counts(reference_df[column].to_numpy(dtype=float),
+                                                                           current_df[column].to_numpy(dtype=float),
+                                                                           bins=drift_config.bins)
+            column_reports[column] = get_numerical_column_drift(reference_counts, current_counts, drift_config)
+
+        for column in categorical_columns:
+            categories, reference_counts, current_counts = get_categorical_counts(reference_df[column], current_df[column])
+            column_reports[column] = get_categorical_column_drift(reference_counts, current_counts, drift_config)
+            column_reports[column]["categories"] = [str(category) for category in categories]
+
+        return {"reference_rows": int(len(reference_df)),
+                "current_rows": int(len(current_df)),
+                "thresholds": drift_config._asdict(),
+                "columns": column_reports,
+                "data_drift": get_drift_summary(column_reports, drift_config)}
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def get_sketch_numerical_counts(reference_sketch: NumericalSketch, current_sketch: NumericalSketch, bins: int):
+    """
+    aligns bucket counts of two numerical sketches and coarsens them to about bins groups
+    on quantiles of reference sketch, the same binning get_numerical_counts uses for raw values
+    return: (reference counts, current counts)
+    """
+    reference_values, reference_bucket_counts = reference_sketch.get_histogram()
+    current_values, current_bucket_counts = current_sketch.get_histogram()
+    bucket_values = np.union1d(reference_values, current_values)
+    reference_counts = np.zeros(len(bucket_values), dtype=np.int64)
+    current_counts = np.zeros(len(bucket_values), dtype=np.int64)
+    reference_counts[np.searchsorted(bucket_values, reference_values)] = reference_bucket_counts
+    current_counts[np.searchsorted(bucket_values, current_values)] = current_bucket_counts
+
+    #group buckets by the reference quantile each bucket starts in, groups stay in value order
+    reference_cdf = (np.cumsum(reference_counts) - reference_counts) / max(reference_counts.sum(), 1)
+    groups = np.searchsorted(np.linspace(0, 1, bins + 1)[1:-1], reference_cdf, side="right")
+    return (np.bincount(groups, weights=reference_counts, minlength=bins),
+            np.bincount(groups, weights=current_counts, minlength=bins))
+
+
+def get_sketch_drift_report(reference_sketch: DatasetSketch, current_sketch: DatasetSketch, drift_config: DriftConfig) -> dict:
+    """
+    same report as get_data_drift_report computed from dataset sketches only,
+    reference_sketch may be one historical ingestion or several merged ones
+    """
+    try:
+        column_reports = dict()
+        for column, current_column_sketch in current_sketch.columns.items():
+            reference_column_sketch = reference_sketch.columns.get(column)
+            if reference_column_sketch is None:
+                continue
+            if isinstance(current_column_sketch, NumericalSketch):
+                reference_counts, current_counts = get_sketch_numerical_counts(reference_column_sketch, current_column_sketch,
+                                                                               bins=drift_config.bins)
+                column_reports[column] = get_numerical_column_drift(reference_counts, current_counts, drift_config)
+            else:
+                categories = sorted(set(reference_column_sketch.frequencies) | set(current_column_sketch.frequencies))
+                reference_counts = np.array([reference_column_sketch.frequencies.get(category, 0) for category in categories])
+                current_counts = np.array([current_column_sketch.frequencies.get(category, 0) for category in categories])
+                column_reports[column] = get_categorical_column_drift(reference_counts, current_counts, drift_config)
+                column_reports[column]["categories"] = categories
+
+        return {"reference_rows": int(reference_sketch.row_count),
+                "current_rows": int(current_sketch.row_count),
+                "thresholds": drift_config._asdict(),
+                "columns": column_reports,
+                "data_drift": get_drift_summary(column_reports, drift_config)}
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def render_drift_report_html(report: dict) -> str:
+    """renders drift report produced by get_data_drift_report as a standalone html page"""
+    def format_value(value):
+        return "-" if value is None else (f"{value:.4g}" if isinstance(value, float) else html.escape(str(value)))
+
+    rows = "".join(
+        f"<tr class=\"{'table-danger' if column_report['drift_detected'] else ''}\">"
+        f"<td>{html.escape(column)}</td><td>{column_report['column_type']}</td><td>{column_report['stat_test']}</td>"
+        f"<td>{format_value(column_report['statistic'])}</td><td>{format_value(column_report['p_value'])}</td>"
+        f"<td>{format_value(column_report['psi'])}</td><td>{column_report['drift_detected']}</td></tr>"
+        for column, column_report in report["columns"].items())
+    summary = report["data_drift"]
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Data Drift Report</title>"
+        "<link rel=\"stylesheet\" href=\"https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css\"></head>"
+        "<body class=\"container\"><h2>Data Drift Report</h2>"
+        f"<p>Reference rows: {report['reference_rows']}, current rows: {report['current_rows']}. "
+        f"Drift detected in {summary['number_of_drifted_columns']} of {summary['number_of_columns']} columns, "
+        f"dataset drift: <b>{summary['dataset_drift']}</b></p>"
+        "<table class=\"table table-striped\"><thead><tr><th>column</th><th>type</th><th>test</th><th>statistic</th>"
+        f"<th>p value</th><th>psi</th><th>drift</th></tr></thead><tbody>{rows}</tbody></table></body></html>"
+    )
+
+
+def get_drift_report_page(report_file_path: str, page_cache_dir: str) -> str:
+    """
+    renders drift report json as html on first request only, pages are cached in page_cache_dir
+    under the fingerprint of report content, so runs with identical drift data share one page
+    return: file path of rendered page
+    """
+    try:
+        with open(report_file_path, "rb") as report_file:
+            report_content = report_file.read()
+        fingerprint = hashlib.sha256(REPORT_PAGE_VERSION.encode() + report_content).hexdigest()
+        page_file_path = os.path.join(page_cache_dir, f"{fingerprint}.html")
+        if os.path.exists(page_file_path):
+            return page_file_path
+
+        os.makedirs(page_cache_dir, exist_ok=True)
+        tmp_page_file_path = f"{page_file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_page_file_path, "w", encoding="utf-8") as page_file:
+            page_file.write(render_drift_report_html(json.loads(report_content)))
+        os.replace(tmp_page_file_path, page_file_path)
+        return page_file_path
+    except Exception as e:
+        raise HousingException(e, sys) from e
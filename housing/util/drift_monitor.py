@@ -0,0 +1,83 @@
+import sys
+import threading
+import numpy as np
+from housing.exception import HousingException
+from housing.entity.config_entity import DriftConfig
+from housing.util.sketch import DatasetSketch
+from housing.util.drift import get_sketch_drift_report
+
+
+class DriftMonitor:
+    """
+    Keeps features of the last window_size served requests in fixed size ring buffers.
+    record is called on the request path: it never waits for the buffer lock, a request arriving
+    while the window is being copied for a report or another request is being recorded is dropped.
+    Drops are counted under a separate lock which is only held for the increment.
+    Memory is fixed at window_size rows per worker process.
+    """
+
+    def __init__(self, numerical_columns: list, categorical_columns: list, window_size: int):
+        self.numerical_columns = list(numerical_columns)
+        self.categorical_columns = list(categorical_columns)
+        self.window_size = window_size
+        self.numerical_window = np.full((window_size, len(self.numerical_columns)), np.nan)
+        self.categorical_window = np.full((window_size, len(self.categorical_columns)), None, dtype=object)
+        self.lock = threading.Lock()
+        self.dropped_lock = threading.Lock()
+        self.recorded_count = 0
+        self.dropped_count = 0
+
+    def record(self, features: dict) -> bool:
+        """
+        features: column name -> scalar value of one request
+        return: False if the request was dropped because the buffers were busy
+        """
+        if not self.lock.acquire(blocking=False):
+            self.count_dropped()
+            return False
+        try:
+            position = self.recorded_count % self.window_size
+            self.numerical_window[position] = [features[column] for column in self.numerical_columns]
+            self.categorical_window[position] = [features[column] for column in self.categorical_columns]
+            self.recorded_count += 1
+            return True
+        except (KeyError, TypeError, ValueError):
+            self.count_dropped()
+            return False
+        finally:
+            self.lock.release()
+
+    def count_dropped(self):
+        with self.dropped_lock:
+            self.dropped_count += 1
+
+    def get_window_sketch(self, relative_accuracy: float) -> DatasetSketch:
+        """sketch of the requests currently in the window"""
+        with self.lock:
+            row_count = min(self.recorded_count, self.window_size)
+            numerical_window = self.numerical_window[:row_count].copy()
+            categorical_window = self.categorical_window[:row_count].copy()
+
+        window_sketch = DatasetSketch(numerical_columns=self.numerical_columns, categorical_columns=self.categorical_columns,
+                                      relative_accuracy=relative_accuracy)
+        window_sketch.row_count = row_count
+        for column_index, column in enumerate(self.numerical_columns):
+            window_sketch.columns[column].update(numerical_window[:, column_index])
+        for column_index, column in enumerate(self.categorical_columns):
+            window_sketch.columns[column].update(categorical_window[:, column_index])
+        return window_sketch
+
+    def get_drift_report(self, training_sketch: DatasetSketch, drift_config: DriftConfig) -> dict:
+        """per feature drift of the served window against the training data sketch of the active model"""
+        try:
+            window_sketch = self.get_window_sketch(relative_accuracy=training_sketch.relative_accuracy)
+            report = get_sketch_drift_report(reference_sketch=training_sketch, current_sketch=window_sketch,
+                                             drift_config=drift_config)
+            report["window_size"] = self.window_size
+            with self.lock:
+                report["recorded_count"] = self.recorded_count
+            with self.dropped_lock:
+                report["dropped_count"] = self.dropped_count
+            return report
+        except Exception as e:
+            raise HousingException(e, sys) from e
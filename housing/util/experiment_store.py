@@ -0,0 +1,142 @@
+import os
+import sys
+import sqlite3
+import pandas as pd
+from datetime import datetime
+from contextlib import closing
+from housing.exception import HousingException
+from housing.logger import logging
+
+EXPERIMENT_COLUMNS = ["experiment_id", "initialization_timestamp", "artifact_time_stamp", "running_status",
+                      "start_time", "stop_time", "execution_time", "message", "experiment_file_path",
+                      "accuracy", "is_model_accepted", "created_time_stamp"]
+CSV_IMPORTED_KEY = "csv_imported"
+
+
+class ExperimentStore:
+    """
+    Experiments in a SQLite file, one row per experiment updated in place as the run progresses.
+    Rows are indexed by insertion order, running status and model acceptance, so the latest
+    experiments, a status filter or an id lookup only read the rows they return.
+    Writes run in WAL mode with a busy timeout, safe from every web worker and job process.
+    experiment.csv written by earlier versions is imported once on first use.
+    """
+
+    def __init__(self, db_file_path: str, csv_file_path: str = None):
+        try:
+            self.db_file_path = db_file_path
+            os.makedirs(os.path.dirname(db_file_path), exist_ok=True)
+            with closing(self.connect()) as connection:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("""CREATE TABLE IF NOT EXISTS experiment (
+                                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                        experiment_id TEXT NOT NULL UNIQUE,
+                                        initialization_timestamp TEXT,
+                                        artifact_time_stamp TEXT,
+                                        running_status INTEGER,
+                                        start_time TEXT,
+                                        stop_time TEXT,
+                                        execution_time TEXT,
+                                        message TEXT,
+                                        experiment_file_path TEXT,
+                                        accuracy REAL,
+                                        is_model_accepted INTEGER,
+                                        created_time_stamp TEXT)""")
+                connection.execute("CREATE INDEX IF NOT EXISTS experiment_running_status ON experiment (running_status, id)")
+                connection.execute("CREATE INDEX IF NOT EXISTS experiment_is_model_accepted ON experiment (is_model_accepted, id)")
+                connection.execute("CREATE TABLE IF NOT EXISTS store_info (key TEXT PRIMARY KEY, value TEXT)")
+            if csv_file_path is not None:
+                self.import_csv(csv_file_path)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_file_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    @staticmethod
+    def to_db_value(value):
+        if value is None or (not isinstance(value, str) and pd.isna(value)):
+            return None
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, datetime):
+            return str(value)
+        if hasattr(value, "item"):
+            return value.item()
+        if isinstance(value, (int, float, str)):
+            return value
+        return str(value)
+
+    @staticmethod
+    def upsert(connection: sqlite3.Connection, rows):
+        """rows: sequences of values in EXPERIMENT_COLUMNS order"""
+        columns = ", ".join(EXPERIMENT_COLUMNS)
+        placeholders = ", ".join(["?"] * len(EXPERIMENT_COLUMNS))
+        updates = ", ".join(f"{column} = excluded.{column}" for column in EXPERIMENT_COLUMNS if column != "experiment_id")
+        connection.executemany(f"INSERT INTO experiment ({columns}) VALUES ({placeholders}) "
+                               f"ON CONFLICT (experiment_id) DO UPDATE SET {updates}", rows)
+
+    def save_experiment(self, experiment: dict):
+        """experiment: Experiment._asdict(), inserted or updated by experiment_id"""
+        try:
+            experiment = dict(experiment, created_time_stamp=datetime.now())
+            with closing(self.connect()) as connection:
+                ExperimentStore.upsert(connection, [[ExperimentStore.to_db_value(experiment.get(column))
+                                                     for column in EXPERIMENT_COLUMNS]])
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def import_csv(self, csv_file_path: str):
+        """one time import of experiment.csv, later rows of an experiment override earlier ones"""
+        connection = self.connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            is_imported = connection.execute("SELECT value FROM store_info WHERE key = ?", (CSV_IMPORTED_KEY,)).fetchone()
+            if is_imported is not None or not os.path.exists(csv_file_path):
+                connection.execute("COMMIT")
+                return
+            experiment_df = pd.read_csv(csv_file_path).reindex(columns=EXPERIMENT_COLUMNS)
+            experiment_df = experiment_df.drop_duplicates(subset=["experiment_id"], keep="last").astype(object)
+            experiment_df = experiment_df.where(experiment_df.notna(), None)
+            ExperimentStore.upsert(connection, experiment_df.itertuples(index=False, name=None))
+            connection.execute("INSERT INTO store_info (key, value) VALUES (?, ?)", (CSV_IMPORTED_KEY, csv_file_path))
+            connection.execute("COMMIT")
+            logging.info(f"Imported [{len(experiment_df)}] experiments of [{csv_file_path}] into experiment store [{self.db_file_path}]")
+        except Exception as e:
+            connection.execute("ROLLBACK")
+            raise HousingException(e, sys) from e
+        finally:
+            connection.close()
+
+    @staticmethod
+    def to_dataframe(rows: list) -> pd.DataFrame:
+        experiment_df = pd.DataFrame([dict(row) for row in rows], columns=EXPERIMENT_COLUMNS)
+        for column in ["running_status", "is_model_accepted"]:
+            experiment_df[column] = experiment_df[column].map(lambda value: None if value is None else bool(value))
+        return experiment_df
+
+    def get_experiments(self, limit: int = 5, running_status: bool = None, is_model_accepted: bool = None) -> pd.DataFrame:
+        """latest experiments, oldest first as in the experiment history table"""
+        try:
+            conditions, parameters = [], []
+            for column, value in [("running_status", running_status), ("is_model_accepted", is_model_accepted)]:
+                if value is not None:
+                    conditions.append(f"{column} = ?")
+                    parameters.append(int(value))
+            where = f"WHERE {' AND '.join(conditions)}" if len(conditions) > 0 else ""
+            with closing(self.connect()) as connection:
+                rows = connection.execute(f"SELECT * FROM experiment {where} ORDER BY id DESC LIMIT ?",
+                                          parameters + [int(limit)]).fetchall()
+            return ExperimentStore.to_dataframe(rows[::-1])
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_experiment(self, experiment_id: str) -> dict:
+        try:
+            with closing(self.connect()) as connection:
+                row = connection.execute("SELECT * FROM experiment WHERE experiment_id = ?", (experiment_id,)).fetchone()
+            return None if row is None else ExperimentStore.to_dataframe([row]).to_dict(orient="records")[0]
+        except Exception as e:
+            raise HousingException(e, sys) from e
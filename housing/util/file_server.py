@@ -0,0 +1,110 @@
+"""
+Serves files of the artifact, saved model and log browsers. send_file streams them in blocks
+through the server's file wrapper and answers Range, If-None-Match and If-Modified-Since requests,
+a revalidated file is a 304 without body. Text files are served gzip compressed to clients
+accepting it, each file is compressed once into gzip_cache_dir and again only when it changes.
+Directory listings are cached per worker until the directory's mtime changes.
+"""
+import os
+import sys
+import gzip
+import shutil
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from flask import request, send_file, Response
+from housing.exception import HousingException
+from housing.entity.config_entity import FileServerConfig
+
+GZIP_MIMETYPES = {"application/json", "application/javascript", "application/xml", "application/x-yaml",
+                  "application/yaml", "image/svg+xml"}
+#served as text, mimetypes does not know them
+TEXT_FILE_EXTENSIONS = {".log", ".yaml", ".yml"}
+DEFAULT_MIMETYPE = "application/octet-stream"
+
+
+def get_mimetype(file_path: str) -> str:
+    if os.path.splitext(file_path)[1] in TEXT_FILE_EXTENSIONS:
+        return "text/plain"
+    mimetype, encoding = mimetypes.guess_type(file_path)
+    #already compressed files, e.g. .log.gz segments, are served as they are
+    if encoding is not None:
+        return "application/gzip" if encoding == "gzip" else DEFAULT_MIMETYPE
+    return mimetype or DEFAULT_MIMETYPE
+
+
+class FileServer:
+
+    def __init__(self, file_server_config: FileServerConfig):
+        self.file_server_config = file_server_config
+        #directory path -> (mtime, inode, sorted file names), least recently used first
+        self.listings = OrderedDict()
+        self.listings_lock = threading.Lock()
+
+    def list_dir(self, dir_path: str) -> list:
+        """sorted file names, os.listdir runs only when the directory changed since the last call"""
+        try:
+            stat = os.stat(dir_path)
+            with self.listings_lock:
+                listing = self.listings.get(dir_path)
+                if listing is not None and listing[:2] == (stat.st_mtime_ns, stat.st_ino):
+                    self.listings.move_to_end(dir_path)
+                    return listing[2]
+            file_names = sorted(os.listdir(dir_path))
+            with self.listings_lock:
+                self.listings[dir_path] = (stat.st_mtime_ns, stat.st_ino, file_names)
+                self.listings.move_to_end(dir_path)
+                while len(self.listings) > self.file_server_config.listing_cache_size:
+                    self.listings.popitem(last=False)
+            return file_names
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def is_compressible(self, mimetype: str, size: int) -> bool:
+        return size >= self.file_server_config.gzip_min_size and \
+            (mimetype.startswith("text/") or mimetype in GZIP_MIMETYPES)
+
+    def get_gzip_file_path(self, file_path: str, stat: os.stat_result) -> str:
+        """
+        compressed copy of absolute file_path, one per source file carrying the source mtime,
+        so a changed file is compressed again and the copy's etag changes with it
+        """
+        gzip_file_path = os.path.join(self.file_server_config.gzip_cache_dir,
+                                      f"{hashlib.sha256(file_path.encode()).hexdigest()}.gz")
+        if os.path.exists(gzip_file_path) and os.stat(gzip_file_path).st_mtime_ns == stat.st_mtime_ns:
+            return gzip_file_path
+        os.makedirs(self.file_server_config.gzip_cache_dir, exist_ok=True)
+        tmp_gzip_file_path = f"{gzip_file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(file_path, "rb") as source_file, gzip.open(tmp_gzip_file_path, "wb", compresslevel=6) as gzip_file:
+            shutil.copyfileobj(source_file, gzip_file)
+        os.utime(tmp_gzip_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_gzip_file_path, gzip_file_path)
+        return gzip_file_path
+
+    def send(self, file_path: str, mimetype: str = None, as_attachment: bool = False) -> Response:
+        """
+        file response of the current request, gzip compressed for text when the client accepts it
+        and asks for the whole file, range requests are answered from the file itself
+        """
+        try:
+            #send_file resolves relative paths against the app folder, not the working directory
+            file_path = os.path.abspath(file_path)
+            stat = os.stat(file_path)
+            mimetype = mimetype or get_mimetype(file_path)
+            download_name = os.path.basename(file_path)
+            if not self.is_compressible(mimetype, stat.st_size):
+                return send_file(file_path, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                                 conditional=True, etag=True)
+            if "gzip" in request.accept_encodings and request.range is None:
+                response = send_file(self.get_gzip_file_path(file_path, stat), mimetype=mimetype, as_attachment=as_attachment,
+                                     download_name=download_name, conditional=True, etag=True,
+                                     last_modified=stat.st_mtime)
+                response.headers["Content-Encoding"] = "gzip"
+            else:
+                response = send_file(file_path, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+                                     conditional=True, etag=True)
+            response.vary.add("Accept-Encoding")
+            return response
+        except Exception as e:
+            raise HousingException(e, sys) from e
@@ -0,0 +1,289 @@
+import os
+import sys
+import shutil
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from contextlib import closing
+from housing.exception import HousingException
+from housing.logger import logging
+from housing.util.util import read_yaml_file
+from housing.constants import BEST_MODEL_KEY, HISTORY_KEY, MODEL_PATH_KEY
+
+CHAMPION_STATUS = "champion"
+RETIRED_STATUS = "retired"
+CANDIDATE_STATUS = "candidate"
+REJECTED_STATUS = "rejected"
+
+METRIC_COLUMNS = ["train_rmse", "test_rmse", "train_accuracy", "test_accuracy", "model_accuracy"]
+YAML_IMPORTED_KEY = "yaml_imported"
+#promoted models are kept next to the registry file, outside timestamped artifact dirs
+MODELS_DIR_NAME = "models"
+
+
+def get_file_sha256(file_path: str) -> str:
+    """None for a file that no longer exists"""
+    if not os.path.isfile(file_path):
+        return None
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(2 ** 20), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class ModelRegistry:
+    """
+    Model versions in a SQLite file, one row per evaluated model with its metrics, artifact hash,
+    export paths and status. At most one version is champion, enforced by a partial unique index,
+    and promotion runs in an immediate transaction that fails when the champion changed since the
+    caller compared against it, so concurrent runs never silently replace each other's champion.
+    Champion, hash and export lookups are indexed and read one row.
+    A promoted version's model file is stored under models/<sha256> next to the registry file and its
+    model_path points there, so it outlives the run that trained it.
+    model_evluation.yaml written by earlier versions is imported once on first use.
+    """
+
+    def __init__(self, db_file_path: str, yaml_file_path: str = None):
+        try:
+            self.db_file_path = db_file_path
+            self.models_dir = os.path.join(os.path.dirname(db_file_path), MODELS_DIR_NAME)
+            os.makedirs(os.path.dirname(db_file_path), exist_ok=True)
+            with closing(self.connect()) as connection:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("""CREATE TABLE IF NOT EXISTS model_version (
+                                        version INTEGER PRIMARY KEY AUTOINCREMENT,
+                                        time_stamp TEXT,
+                                        model_path TEXT NOT NULL,
+                                        model_sha256 TEXT,
+                                        status TEXT NOT NULL,
+                                        train_rmse REAL,
+                                        test_rmse REAL,
+                                        train_accuracy REAL,
+                                        test_accuracy REAL,
+                                        model_accuracy REAL,
+                                        export_model_file_path TEXT,
+                                        export_sketch_file_path TEXT,
+                                        created_at TEXT NOT NULL,
+                                        promoted_at TEXT)""")
+                connection.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS model_version_champion ON model_version (status) "
+                                   f"WHERE status = '{CHAMPION_STATUS}'")
+                connection.execute("CREATE INDEX IF NOT EXISTS model_version_status ON model_version (status, version)")
+                connection.execute("CREATE INDEX IF NOT EXISTS model_version_sha256 ON model_version (model_sha256)")
+                connection.execute("CREATE INDEX IF NOT EXISTS model_version_exported ON model_version (promoted_at, version) "
+                                   "WHERE export_model_file_path IS NOT NULL")
+                connection.execute("CREATE TABLE IF NOT EXISTS store_info (key TEXT PRIMARY KEY, value TEXT)")
+            if yaml_file_path is not None:
+                self.import_yaml(yaml_file_path)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_file_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    @staticmethod
+    def insert(connection: sqlite3.Connection, model_path: str, time_stamp: str, status: str, metrics: dict = None,
+               promoted_at: str = None) -> int:
+        """return: version of the inserted row"""
+        metrics = dict() if metrics is None else metrics
+        values = [time_stamp, model_path, get_file_sha256(model_path), status,
+                  *[None if metrics.get(column) is None else float(metrics[column]) for column in METRIC_COLUMNS],
+                  datetime.now().isoformat(), promoted_at]
+        cursor = connection.execute(f"INSERT INTO model_version (time_stamp, model_path, model_sha256, status, "
+                                    f"{', '.join(METRIC_COLUMNS)}, created_at, promoted_at) "
+                                    f"VALUES ({', '.join(['?'] * len(values))})", values)
+        return cursor.lastrowid
+
+    def register(self, model_path: str, time_stamp: str, metrics: dict = None) -> int:
+        """
+        adds a candidate version of the model file, metrics: values of METRIC_COLUMNS
+        return: version
+        """
+        try:
+            with closing(self.connect()) as connection:
+                version = ModelRegistry.insert(connection, model_path=model_path, time_stamp=time_stamp,
+                                               status=CANDIDATE_STATUS, metrics=metrics)
+            logging.info(f"Registered model [{model_path}] as version [{version}]")
+            return version
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def store_model(self, model_path: str, model_sha256: str) -> str:
+        """
+        hardlinks, or copies where hardlinks are not supported, the model file into models_dir
+        return: path of the stored model, named by content so every version of the same model shares it
+        """
+        if model_sha256 is None or get_file_sha256(model_path) != model_sha256:
+            raise Exception(f"Model file [{model_path}] is missing or changed since it was registered")
+        stored_model_path = os.path.join(self.models_dir, f"{model_sha256}{os.path.splitext(model_path)[1]}")
+        if os.path.exists(stored_model_path):
+            return stored_model_path
+        os.makedirs(self.models_dir, exist_ok=True)
+        tmp_model_path = f"{stored_model_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(model_path, tmp_model_path)
+        except OSError:
+            shutil.copyfile(model_path, tmp_model_path)
+        os.replace(tmp_model_path, stored_model_path)
+        return stored_model_path
+
+    def promote(self, version: int, expected_champion_version: int = None) -> bool:
+        """
+        makes version the champion and retires the previous one, if the champion is still
+        expected_champion_version, None for no champion. The model file is stored in models_dir first
+        return: False if another version became champion in the meantime
+        """
+        row = self.get_version(version)
+        try:
+            stored_model_path = self.store_model(model_path=row["model_path"], model_sha256=row["model_sha256"])
+        except Exception as e:
+            raise HousingException(e, sys) from e
+        connection = self.connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT version FROM model_version WHERE status = ?", (CHAMPION_STATUS,)).fetchone()
+            champion_version = None if row is None else row["version"]
+            if champion_version != expected_champion_version:
+                connection.execute("COMMIT")
+                logging.info(f"Version [{version}] not promoted, champion changed from [{expected_champion_version}] "
+                             f"to [{champion_version}]")
+                return False
+            connection.execute("UPDATE model_version SET status = ? WHERE status = ?", (RETIRED_STATUS, CHAMPION_STATUS))
+            connection.execute("UPDATE model_version SET status = ?, promoted_at = ?, model_path = ? WHERE version = ?",
+                               (CHAMPION_STATUS, datetime.now().isoformat(), stored_model_path, version))
+            connection.execute("COMMIT")
+            logging.info(f"Promoted version [{version}] to champion, previous champion [{champion_version}]")
+            return True
+        except Exception as e:
+            connection.execute("ROLLBACK")
+            raise HousingException(e, sys) from e
+        finally:
+            connection.close()
+
+    def demote(self, version: int):
+        """retires version if it is still the champion, e.g. once its model file is gone"""
+        try:
+            with closing(self.connect()) as connection:
+                connection.execute("UPDATE model_version SET status = ? WHERE version = ? AND status = ?",
+                                   (RETIRED_STATUS, version, CHAMPION_STATUS))
+            logging.info(f"Demoted champion version [{version}]")
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def reject(self, version: int):
+        try:
+            with closing(self.connect()) as connection:
+                connection.execute("UPDATE model_version SET status = ? WHERE version = ? AND status = ?",
+                                   (REJECTED_STATUS, version, CANDIDATE_STATUS))
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def set_export(self, version: int, export_model_file_path: str, export_sketch_file_path: str):
+        """records where the pusher exported version for serving"""
+        try:
+            with closing(self.connect()) as connection:
+                connection.execute("UPDATE model_version SET export_model_file_path = ?, export_sketch_file_path = ? "
+                                   "WHERE version = ?", (export_model_file_path, export_sketch_file_path, version))
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_champion(self) -> dict:
+        """None while no model was accepted"""
+        try:
+            with closing(self.connect()) as connection:
+                row = connection.execute("SELECT * FROM model_version WHERE status = ?", (CHAMPION_STATUS,)).fetchone()
+            return None if row is None else dict(row)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_served_version(self) -> dict:
+        """exported version promoted last, the champion once it is exported. None if nothing was exported"""
+        try:
+            with closing(self.connect()) as connection:
+                row = connection.execute("SELECT * FROM model_version WHERE export_model_file_path IS NOT NULL "
+                                         "ORDER BY promoted_at DESC, version DESC LIMIT 1").fetchone()
+            return None if row is None else dict(row)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_version(self, version: int) -> dict:
+        try:
+            with closing(self.connect()) as connection:
+                row = connection.execute("SELECT * FROM model_version WHERE version = ?", (version,)).fetchone()
+            return None if row is None else dict(row)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def find_versions(self, model_sha256: str) -> list:
+        """versions registered for the same model file content"""
+        try:
+            with closing(self.connect()) as connection:
+                rows = connection.execute("SELECT * FROM model_version WHERE model_sha256 = ? ORDER BY version",
+                                          (model_sha256,)).fetchall()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_versions(self, limit: int = 10, status: str = None) -> list:
+        """latest versions first"""
+        try:
+            query, parameters = "SELECT * FROM model_version", []
+            if status is not None:
+                query, parameters = f"{query} WHERE status = ?", [status]
+            with closing(self.connect()) as connection:
+                rows = connection.execute(f"{query} ORDER BY version DESC LIMIT ?", parameters + [int(limit)]).fetchall()
+            return [dict(row) for row in rows]
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_retained_file_paths(self) -> list:
+        """
+        files the registry still needs: models of the champion and of candidates under evaluation,
+        exported files of the champion and of the version being served
+        """
+        try:
+            with closing(self.connect()) as connection:
+                rows = connection.execute("SELECT model_path, export_model_file_path, export_sketch_file_path, status "
+                                          "FROM model_version WHERE status IN (?, ?)",
+                                          (CHAMPION_STATUS, CANDIDATE_STATUS)).fetchall()
+            served_version = self.get_served_version()
+            file_paths = [row["model_path"] for row in rows]
+            file_paths += [row[column] for row in rows if row["status"] == CHAMPION_STATUS
+                           for column in ["export_model_file_path", "export_sketch_file_path"]]
+            if served_version is not None:
+                file_paths += [served_version["export_model_file_path"], served_version["export_sketch_file_path"]]
+            return [file_path for file_path in file_paths if file_path is not None]
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def import_yaml(self, yaml_file_path: str):
+        """one time import of model_evluation.yaml, history in time stamp order as retired versions, then the best model as champion"""
+        connection = self.connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            is_imported = connection.execute("SELECT value FROM store_info WHERE key = ?", (YAML_IMPORTED_KEY,)).fetchone()
+            if is_imported is not None or not os.path.exists(yaml_file_path):
+                connection.execute("COMMIT")
+                return
+            model_eval_content = read_yaml_file(file_path=yaml_file_path)
+            model_eval_content = dict() if model_eval_content is None else model_eval_content
+            history = model_eval_content.get(HISTORY_KEY) or dict()
+            for time_stamp in sorted(history):
+                ModelRegistry.insert(connection, model_path=history[time_stamp][MODEL_PATH_KEY], time_stamp=str(time_stamp),
+                                     status=RETIRED_STATUS)
+            if BEST_MODEL_KEY in model_eval_content:
+                champion = connection.execute("SELECT version FROM model_version WHERE status = ?", (CHAMPION_STATUS,)).fetchone()
+                ModelRegistry.insert(connection, model_path=model_eval_content[BEST_MODEL_KEY][MODEL_PATH_KEY], time_stamp=None,
+                                     status=RETIRED_STATUS if champion is not None else CHAMPION_STATUS,
+                                     promoted_at=datetime.now().isoformat())
+            connection.execute("INSERT INTO store_info (key, value) VALUES (?, ?)", (YAML_IMPORTED_KEY, yaml_file_path))
+            connection.execute("COMMIT")
+            logging.info(f"Imported [{len(history)}] history entries of [{yaml_file_path}] into model registry [{self.db_file_path}]")
+        except Exception as e:
+            connection.execute("ROLLBACK")
+            raise HousingException(e, sys) from e
+        finally:
+            connection.close()
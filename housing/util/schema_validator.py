@@ -0,0 +1,116 @@
+import sys
+import numpy as np
+import pandas as pd
+from housing.exception import HousingException
+from housing.logger import logging
+from housing.constants import *
+from housing.util.util import get_dataset_file_format, get_dataset_column_names, iter_dataset_chunks
+
+TYPE_CHECK = "type"
+DOMAIN_CHECK = "domain"
+RANGE_CHECK = "range"
+NULL_CHECK = "null"
+
+
+class SchemaValidator:
+    """
+    Validates a dataset file against schema.yaml in a single streaming pass.
+    Every chunk is checked column by column with vectorized masks:
+        type: value present but not parsable as number for numerical columns
+        domain: value of a categorical column outside its domain_value list
+        range: numerical value outside its value_range min/max
+        null: missing value in a column not listed in nullable_columns
+    Only violation counts and up to max_samples offending rows per column and check are kept,
+    so memory is bounded by chunk_size whatever the dataset size.
+    """
+
+    def __init__(self, schema: dict, chunk_size: int, max_samples: int):
+        self.schema_columns = schema[DATASET_SCHEMA_COLUMNS_KEY]
+        self.numerical_columns = [column for column, dtype in self.schema_columns.items() if dtype != "category"]
+        self.domain_values = schema.get(DATASET_SCHEMA_DOMAIN_VALUE_KEY) or dict()
+        self.value_ranges = schema.get(DATASET_SCHEMA_VALUE_RANGE_KEY) or dict()
+        self.nullable_columns = set(schema.get(DATASET_SCHEMA_NULLABLE_COLUMNS_KEY) or [])
+        self.chunk_size = chunk_size
+        self.max_samples = max_samples
+
+    @staticmethod
+    def to_json_value(value):
+        if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NA:
+            return None
+        if isinstance(value, np.generic):
+            return value.item()
+        return value
+
+    def get_check_masks(self, chunk: pd.DataFrame):
+        """yields (column, check, violation mask) for every check of one chunk"""
+        for column in self.schema_columns:
+            values = chunk[column]
+            is_null = values.isna()
+
+            if column not in self.nullable_columns:
+                yield column, NULL_CHECK, is_null
+
+            if column in self.numerical_columns:
+                if not pd.api.types.is_numeric_dtype(values):
+                    numeric_values = pd.to_numeric(values, errors="coerce")
+                    yield column, TYPE_CHECK, numeric_values.isna() & ~is_null
+                    values = numeric_values
+                value_range = self.value_ranges.get(column)
+                if value_range is not None:
+                    out_of_range = pd.Series(False, index=chunk.index)
+                    if value_range.get("min") is not None:
+                        out_of_range |= values < value_range["min"]
+                    if value_range.get("max") is not None:
+                        out_of_range |= values > value_range["max"]
+                    yield column, RANGE_CHECK, out_of_range
+
+            if column in self.domain_values:
+                yield column, DOMAIN_CHECK, ~values.astype(object).isin(self.domain_values[column]) & ~is_null
+
+    def validate_file(self, file_path: str) -> dict:
+        """
+        return: report with row_count, missing and unknown columns and per column, per check
+        violation counts with sample rows, line_number is given for csv files (header is line 1)
+        """
+        try:
+            column_names = get_dataset_column_names(file_path)
+            missing_columns = [column for column in self.schema_columns if column not in column_names]
+            unknown_columns = [column for column in column_names if column not in self.schema_columns]
+            report = {"file_path": file_path,
+                      "row_count": 0,
+                      "missing_columns": missing_columns,
+                      "unknown_columns": unknown_columns,
+                      "violation_count": 0,
+                      "violations": dict()}
+            if len(missing_columns) > 0 or len(unknown_columns) > 0:
+                report["is_valid"] = False
+                return report
+
+            is_csv = get_dataset_file_format(file_path) == CSV_FILE_FORMAT
+            start_row = 0
+            for chunk in iter_dataset_chunks(file_path=file_path, chunk_size=self.chunk_size):
+                chunk = chunk.reset_index(drop=True)
+                for column, check, mask in self.get_check_masks(chunk):
+                    mask = mask.to_numpy(dtype=bool)
+                    violation_count = int(mask.sum())
+                    if violation_count == 0:
+                        continue
+                    check_report = report["violations"].setdefault(column, dict()).setdefault(check, {"count": 0, "samples": []})
+                    check_report["count"] += violation_count
+                    report["violation_count"] += violation_count
+
+                    for row_index in np.flatnonzero(mask)[:self.max_samples - len(check_report["samples"])]:
+                        sample = {"row_number": start_row + int(row_index) + 1,
+                                  "value": SchemaValidator.to_json_value(chunk.at[row_index, column]),
+                                  "row": {name: SchemaValidator.to_json_value(value) for name, value in chunk.iloc[row_index].items()}}
+                        if is_csv:
+                            sample["line_number"] = start_row + int(row_index) + 2
+                        check_report["samples"].append(sample)
+                start_row += len(chunk)
+
+            report["row_count"] = start_row
+            report["is_valid"] = report["violation_count"] == 0
+            logging.info(f"Schema validation of [{file_path}]: [{start_row}] rows, [{report['violation_count']}] violations")
+            return report
+        except Exception as e:
+            raise HousingException(e, sys) from e
@@ -0,0 +1,242 @@
+"""
+Mergeable per column distribution sketches.
+
+Numerical columns are kept in a log bucketed quantile sketch: a value x is counted in
+bucket ceil(log(|x|) / log(gamma)) with gamma = (1 + relative_accuracy) / (1 - relative_accuracy),
+so every quantile is answered within relative_accuracy of the true value and two sketches
+with equal relative_accuracy are merged by adding their bucket counts.
+Categorical columns are kept as frequency tables. A sketch never holds raw rows, its size
+only depends on the value range of a column.
+"""
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+from housing.exception import HousingException
+from housing.constants import DATASET_SKETCH_FILE_SUFFIX
+
+NUMERICAL_SKETCH_TYPE = "num"
+CATEGORICAL_SKETCH_TYPE = "cat"
+#absolute values below this are counted as zero
+MIN_INDEXABLE_VALUE = 1e-9
+
+
+class NumericalSketch:
+
+    def __init__(self, relative_accuracy: float):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        self.positive_counts = dict()
+        self.negative_counts = dict()
+        self.zero_count = 0
+        self.null_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def get_keys(self, values: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+
+    @staticmethod
+    def add_counts(bucket_counts: dict, keys: np.ndarray):
+        for key, key_count in zip(*np.unique(keys, return_counts=True)):
+            bucket_counts[int(key)] = bucket_counts.get(int(key), 0) + int(key_count)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        is_null = np.isnan(values)
+        values = values[~is_null]
+        self.null_count += int(is_null.sum())
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = float(values.min()) if self.min is None else min(self.min, float(values.min()))
+        self.max = float(values.max()) if self.max is None else max(self.max, float(values.max()))
+
+        NumericalSketch.add_counts(self.positive_counts, self.get_keys(values[values >= MIN_INDEXABLE_VALUE]))
+        NumericalSketch.add_counts(self.negative_counts, self.get_keys(-values[values <= -MIN_INDEXABLE_VALUE]))
+        self.zero_count += int((np.abs(values) < MIN_INDEXABLE_VALUE).sum())
+
+    def merge(self, other: "NumericalSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise Exception(f"Cannot merge sketches with relative accuracy [{self.relative_accuracy}] and [{other.relative_accuracy}]")
+        for bucket_counts, other_bucket_counts in [(self.positive_counts, other.positive_counts),
+                                                   (self.negative_counts, other.negative_counts)]:
+            for key, key_count in other_bucket_counts.items():
+                bucket_counts[key] = bucket_counts.get(key, 0) + key_count
+        self.zero_count += other.zero_count
+        self.null_count += other.null_count
+        self.count += other.count
+        self.sum += other.sum
+        for bound, pick in [("min", min), ("max", max)]:
+            values = [value for value in [getattr(self, bound), getattr(other, bound)] if value is not None]
+            setattr(self, bound, pick(values) if len(values) > 0 else None)
+        return self
+
+    def get_histogram(self):
+        """
+        return: (bucket values, bucket counts) in ascending value order,
+        bucket value is the value every member of the bucket is approximated by
+        """
+        negative_keys = np.array(sorted(self.negative_counts, reverse=True), dtype=np.int64)
+        positive_keys = np.array(sorted(self.positive_counts), dtype=np.int64)
+        bucket_values = np.concatenate([-2 * self.gamma ** negative_keys / (self.gamma + 1),
+                                        [0.0] if self.zero_count > 0 else [],
+                                        2 * self.gamma ** positive_keys / (self.gamma + 1)])
+        bucket_counts = np.concatenate([[self.negative_counts[key] for key in negative_keys],
+                                        [self.zero_count] if self.zero_count > 0 else [],
+                                        [self.positive_counts[key] for key in positive_keys]]).astype(np.int64)
+        return bucket_values, bucket_counts
+
+    def get_quantile(self, quantile: float):
+        if self.count == 0:
+            return None
+        bucket_values, bucket_counts = self.get_histogram()
+        rank = quantile * (self.count - 1)
+        bucket_index = int(np.searchsorted(np.cumsum(bucket_counts), rank, side="right"))
+        return float(np.clip(bucket_values[min(bucket_index, len(bucket_values) - 1)], self.min, self.max))
+
+    def to_dict(self) -> dict:
+        return {"sketch_type": NUMERICAL_SKETCH_TYPE,
+                "relative_accuracy": self.relative_accuracy,
+                "count": self.count,
+                "null_count": self.null_count,
+                "sum": self.sum,
+                "min": self.min,
+                "max": self.max,
+                "zero_count": self.zero_count,
+                "positive_keys": sorted(self.positive_counts),
+                "positive_counts": [self.positive_counts[key] for key in sorted(self.positive_counts)],
+                "negative_keys": sorted(self.negative_counts),
+                "negative_counts": [self.negative_counts[key] for key in sorted(self.negative_counts)]}
+
+    @classmethod
+    def from_dict(cls, sketch_info: dict) -> "NumericalSketch":
+        sketch = cls(relative_accuracy=sketch_info["relative_accuracy"])
+        for attribute in ["count", "null_count", "sum", "min", "max", "zero_count"]:
+            setattr(sketch, attribute, sketch_info[attribute])
+        sketch.positive_counts = dict(zip(sketch_info["positive_keys"], sketch_info["positive_counts"]))
+        sketch.negative_counts = dict(zip(sketch_info["negative_keys"], sketch_info["negative_counts"]))
+        return sketch
+
+
+class CategoricalSketch:
+
+    def __init__(self):
+        self.frequencies = dict()
+        self.null_count = 0
+        self.count = 0
+
+    def update(self, values):
+        values = pd.Series(values).astype(object)
+        is_null = values.isna()
+        self.null_count += int(is_null.sum())
+        self.count += int((~is_null).sum())
+        for category, category_count in values[~is_null].value_counts().items():
+            self.frequencies[str(category)] = self.frequencies.get(str(category), 0) + int(category_count)
+
+    def merge(self, other: "CategoricalSketch"):
+        for category, category_count in other.frequencies.items():
+            self.frequencies[category] = self.frequencies.get(category, 0) + category_count
+        self.null_count += other.null_count
+        self.count += other.count
+        return self
+
+    def to_dict(self) -> dict:
+        return {"sketch_type": CATEGORICAL_SKETCH_TYPE,
+                "count": self.count,
+                "null_count": self.null_count,
+                "frequencies": dict(sorted(self.frequencies.items()))}
+
+    @classmethod
+    def from_dict(cls, sketch_info: dict) -> "CategoricalSketch":
+        sketch = cls()
+        sketch.count = sketch_info["count"]
+        sketch.null_count = sketch_info["null_count"]
+        sketch.frequencies = dict(sketch_info["frequencies"])
+        return sketch
+
+
+class DatasetSketch:
+    """column name -> NumericalSketch or CategoricalSketch of one dataset, updated chunk by chunk"""
+
+    def __init__(self, numerical_columns: list, categorical_columns: list, relative_accuracy: float):
+        self.relative_accuracy = relative_accuracy
+        self.row_count = 0
+        self.columns = dict()
+        for column in numerical_columns:
+            self.columns[column] = NumericalSketch(relative_accuracy=relative_accuracy)
+        for column in categorical_columns:
+            self.columns[column] = CategoricalSketch()
+
+    def update(self, dataframe: pd.DataFrame):
+        try:
+            self.row_count += len(dataframe)
+            for column, sketch in self.columns.items():
+                sketch.update(dataframe[column])
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def merge(self, other: "DatasetSketch"):
+        try:
+            if set(other.columns) != set(self.columns):
+                raise Exception(f"Cannot merge sketches of columns {list(self.columns)} and {list(other.columns)}")
+            self.row_count += other.row_count
+            for column, sketch in self.columns.items():
+                sketch.merge(other.columns[column])
+            return self
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def to_dict(self) -> dict:
+        return {"row_count": self.row_count,
+                "relative_accuracy": self.relative_accuracy,
+                "columns": {column: sketch.to_dict() for column, sketch in self.columns.items()}}
+
+    @classmethod
+    def from_dict(cls, sketch_info: dict) -> "DatasetSketch":
+        dataset_sketch = cls(numerical_columns=[], categorical_columns=[], relative_accuracy=sketch_info["relative_accuracy"])
+        dataset_sketch.row_count = sketch_info["row_count"]
+        for column, column_info in sketch_info["columns"].items():
+            sketch_class = NumericalSketch if column_info["sketch_type"] == NUMERICAL_SKETCH_TYPE else CategoricalSketch
+            dataset_sketch.columns[column] = sketch_class.from_dict(column_info)
+        return dataset_sketch
+
+    def save(self, file_path: str):
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            tmp_file_path = f"{file_path}.tmp"
+            with open(tmp_file_path, "w") as sketch_file:
+                json.dump(self.to_dict(), sketch_file)
+            os.replace(tmp_file_path, file_path)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    @classmethod
+    def load(cls, file_path: str) -> "DatasetSketch":
+        try:
+            with open(file_path) as sketch_file:
+                return cls.from_dict(json.load(sketch_file))
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+
+def get_sketch_file_path(dataset_file_path: str) -> str:
+    """sketch of a dataset file is saved next to it"""
+    return f"{os.path.splitext(dataset_file_path)[0]}{DATASET_SKETCH_FILE_SUFFIX}"
+
+
+def merge_dataset_sketches(sketch_file_paths: list) -> DatasetSketch:
+    """rolling baseline: merges saved sketches into one, reading nothing but the sketch files"""
+    try:
+        merged_sketch = None
+        for sketch_file_path in sketch_file_paths:
+            dataset_sketch = DatasetSketch.load(sketch_file_path)
+            merged_sketch = dataset_sketch if merged_sketch is None else merged_sketch.merge(dataset_sketch)
+        return merged_sketch
+    except Exception as e:
+        raise HousingException(e, sys) from e
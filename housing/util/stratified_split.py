@@ -0,0 +1,139 @@
+"""
+Two pass, out of core stratified train/test split.
+
+Pass 1 counts rows per (median_income stratum, hash bucket) where the hash bucket is
+derived from a seeded hash of the row key. Pass 2 puts every row whose bucket is below
+the threshold bucket of its stratum into test set, together with the first
+boundary_quota rows of the threshold bucket, which gives every stratum exactly
+round(test_size * stratum size) test rows. Memory is bounded by the chunk size plus a
+fixed STRATA_COUNT x HASH_BUCKET_COUNT histogram.
+"""
+import sys
+import numpy as np
+from collections import namedtuple
+from housing.exception import HousingException
+
+INCOME_CATEGORY_BINS = np.array([0.0, 1.5, 3.0, 4.5, 6.0, np.inf])
+#stratum 0 holds rows with missing or non positive median_income
+STRATA_COUNT = len(INCOME_CATEGORY_BINS)
+HASH_BUCKET_BITS = 16
+HASH_BUCKET_COUNT = 1 << HASH_BUCKET_BITS
+ROW_KEY_SOURCE_SHIFT = 40
+SPLIT_TRAIN, SPLIT_TEST, SPLIT_BOUNDARY = 0, 1, 2
+
+StratifiedSplitPlan = namedtuple("StratifiedSplitPlan", ["threshold_bucket", "boundary_quota", "test_row_count", "train_row_count"])
+
+
+def get_income_strata(median_income) -> np.ndarray:
+    """same categories as pd.cut(median_income, bins=[0.0,1.5,3.0,4.5,6.0,np.inf], labels=[1,2,3,4,5])"""
+    values = np.asarray(median_income, dtype=float)
+    strata = np.searchsorted(INCOME_CATEGORY_BINS, values, side="left")
+    strata[np.isnan(values) | (strata >= STRATA_COUNT)] = 0
+    return strata
+
+
+def get_row_keys(start_row: int, row_count: int, source_id: int = 0) -> np.ndarray:
+    """row key is unique across sources: source_id in high bits, row number in low bits"""
+    return (np.uint64(source_id) << np.uint64(ROW_KEY_SOURCE_SHIFT)) + np.arange(start_row, start_row + row_count, dtype=np.uint64)
+
+
+def get_hash_buckets(row_keys: np.ndarray, random_state: int) -> np.ndarray:
+    """splitmix64 hash of seeded row keys reduced to HASH_BUCKET_BITS bits"""
+    #uint64 arithmetic wraps around by design
+    with np.errstate(over="ignore"):
+        seed = np.uint64(random_state) * np.uint64(0x9E3779B97F4A7C15)
+        z = (row_keys ^ seed) + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(64 - HASH_BUCKET_BITS)).astype(np.int64)
+
+
+def get_empty_histogram() -> np.ndarray:
+    return np.zeros((STRATA_COUNT, HASH_BUCKET_COUNT), dtype=np.int64)
+
+
+def update_strata_histogram(histogram: np.ndarray, median_income, row_keys: np.ndarray, random_state: int) -> np.ndarray:
+    """pass 1: adds rows of one chunk into histogram in place"""
+    try:
+        strata = get_income_strata(median_income)
+        buckets = get_hash_buckets(row_keys, random_state)
+        histogram += np.bincount(strata * HASH_BUCKET_COUNT + buckets,
+                                 minlength=STRATA_COUNT * HASH_BUCKET_COUNT).reshape(histogram.shape)
+        return histogram
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def get_split_plan(histogram: np.ndarray, test_size: float) -> StratifiedSplitPlan:
+    try:
+        cumulative_count = np.cumsum(histogram, axis=1)
+        stratum_count = cumulative_count[:, -1]
+        test_count = np.rint(stratum_count * test_size).astype(np.int64)
+
+        threshold_bucket = np.array([np.searchsorted(cumulative_count[stratum], test_count[stratum], side="left")
+                                     for stratum in range(histogram.shape[0])], dtype=np.int64)
+        threshold_bucket = np.minimum(threshold_bucket, HASH_BUCKET_COUNT - 1)
+        below_threshold_count = np.where(threshold_bucket > 0,
+                                         cumulative_count[np.arange(histogram.shape[0]), threshold_bucket - 1], 0)
+        boundary_quota = test_count - below_threshold_count
+
+        return StratifiedSplitPlan(threshold_bucket=threshold_bucket,
+                                   boundary_quota=boundary_quota,
+                                   test_row_count=int(test_count.sum()),
+                                   train_row_count=int(stratum_count.sum() - test_count.sum()))
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def get_split_assignment(split_plan: StratifiedSplitPlan, median_income, row_keys: np.ndarray, random_state: int) -> np.ndarray:
+    """
+    pass 2: returns SPLIT_TRAIN, SPLIT_TEST or SPLIT_BOUNDARY for every row of one chunk,
+    boundary rows fall in threshold bucket of their stratum and are resolved by get_boundary_test_mask
+    """
+    try:
+        strata = get_income_strata(median_income)
+        buckets = get_hash_buckets(row_keys, random_state)
+        row_threshold = split_plan.threshold_bucket[strata]
+        return np.where(buckets < row_threshold, SPLIT_TEST, np.where(buckets == row_threshold, SPLIT_BOUNDARY, SPLIT_TRAIN))
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def get_boundary_test_mask(split_plan: StratifiedSplitPlan, median_income, boundary_taken: np.ndarray) -> np.ndarray:
+    """
+    assigns boundary rows, given in source order, to test set until boundary_quota of their stratum is used
+    boundary_taken: per stratum count of boundary rows already assigned to test, updated in place
+    """
+    try:
+        strata = get_income_strata(median_income)
+        test_mask = np.zeros(len(strata), dtype=bool)
+        for stratum in np.unique(strata):
+            remaining_quota = split_plan.boundary_quota[stratum] - boundary_taken[stratum]
+            if remaining_quota <= 0:
+                continue
+            boundary_index = np.flatnonzero(strata == stratum)[:remaining_quota]
+            test_mask[boundary_index] = True
+            boundary_taken[stratum] += len(boundary_index)
+        return test_mask
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+
+def get_test_mask(split_plan: StratifiedSplitPlan, median_income, row_keys: np.ndarray, random_state: int,
+                  boundary_taken: np.ndarray) -> np.ndarray:
+    """
+    pass 2 for a single sequential source: returns boolean mask of test rows for one chunk
+    boundary_taken: per stratum count of threshold bucket rows already assigned to test, updated in place
+    """
+    try:
+        median_income = np.asarray(median_income, dtype=float)
+        split_assignment = get_split_assignment(split_plan=split_plan, median_income=median_income,
+                                                row_keys=row_keys, random_state=random_state)
+        test_mask = split_assignment == SPLIT_TEST
+        boundary_mask = split_assignment == SPLIT_BOUNDARY
+        test_mask[boundary_mask] = get_boundary_test_mask(split_plan=split_plan, median_income=median_income[boundary_mask],
+                                                          boundary_taken=boundary_taken)
+        return test_mask
+    except Exception as e:
+        raise HousingException(e, sys) from e
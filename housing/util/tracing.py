@@ -0,0 +1,165 @@
+"""
+Timeline of a pipeline run in Chrome trace event format, open the saved json in
+chrome://tracing or https://ui.perfetto.dev to see stage overlap, idle gaps and nested time.
+
+Spans are recorded only between start_tracing and stop_tracing, so traced functions used
+outside a pipeline run, e.g. by the web app, only pay for one global lookup.
+"""
+import os
+import sys
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+from housing.exception import HousingException
+from housing.logger import logging
+
+TRACE_STAGE_CATEGORY = "stage"
+TRACE_IO_CATEGORY = "io"
+TRACE_FIT_CATEGORY = "fit"
+TRACE_EVALUATION_CATEGORY = "evaluation"
+#synthetic tracks, e.g. grid search candidates, get thread ids above every real one
+SYNTHETIC_TRACK_ID_OFFSET = 1 << 40
+
+
+class Tracer:
+
+    def __init__(self, trace_file_path: str, process_name: str):
+        self.trace_file_path = trace_file_path
+        self.process_name = process_name
+        self.pid = os.getpid()
+        self.start_ns = time.perf_counter_ns()
+        self.start_time = datetime.now()
+        self.lock = threading.Lock()
+        self.events = []
+        self.track_names = dict()
+        self.synthetic_track_count = 0
+
+    def now_us(self) -> float:
+        return (time.perf_counter_ns() - self.start_ns) / 1000
+
+    def add_span(self, name: str, category: str, start_us: float, duration_us: float, track_id: int = None, args: dict = None):
+        """complete event, on the calling thread's track unless track_id is given"""
+        if track_id is None:
+            track_id = threading.get_native_id()
+            if track_id not in self.track_names:
+                self.track_names[track_id] = threading.current_thread().name
+        event = {"name": name, "cat": category, "ph": "X", "ts": start_us, "dur": duration_us,
+                 "pid": self.pid, "tid": track_id}
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+
+    def add_track(self, track_name: str) -> int:
+        """new synthetic track, return: its track id"""
+        with self.lock:
+            self.synthetic_track_count += 1
+            track_id = SYNTHETIC_TRACK_ID_OFFSET + self.synthetic_track_count
+            self.track_names[track_id] = track_name
+        return track_id
+
+    def get_trace(self) -> dict:
+        with self.lock:
+            metadata = [{"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": self.process_name}}]
+            metadata += [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": track_id, "args": {"name": track_name}}
+                         for track_id, track_name in self.track_names.items()]
+            return {"traceEvents": metadata + sorted(self.events, key=lambda event: event["ts"]),
+                    "displayTimeUnit": "ms",
+                    "otherData": {"process_name": self.process_name, "start_time": self.start_time.isoformat()}}
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.trace_file_path), exist_ok=True)
+            tmp_file_path = f"{self.trace_file_path}.tmp"
+            with open(tmp_file_path, "w") as trace_file:
+                json.dump(self.get_trace(), trace_file, default=str)
+            os.replace(tmp_file_path, self.trace_file_path)
+            logging.info(f"Trace of [{len(self.events)}] spans saved to [{self.trace_file_path}]")
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+
+active_tracer: Tracer = None
+
+
+def start_tracing(trace_file_path: str, process_name: str) -> Tracer:
+    global active_tracer
+    active_tracer = Tracer(trace_file_path=trace_file_path, process_name=process_name)
+    return active_tracer
+
+
+def stop_tracing():
+    """saves and deactivates the active tracer"""
+    global active_tracer
+    tracer, active_tracer = active_tracer, None
+    if tracer is not None:
+        tracer.save()
+
+
+def get_active_tracer() -> Tracer:
+    return active_tracer
+
+
+@contextmanager
+def span(name: str, category: str, **args):
+    """
+    records the enclosed block, yields its args dict so the block can add results to the span
+    with span("fit", TRACE_FIT_CATEGORY, model=name) as span_args:
+        span_args["best_score"] = ...
+    """
+    tracer = active_tracer
+    if tracer is None:
+        yield args
+        return
+    start_us = tracer.now_us()
+    try:
+        yield args
+    except BaseException as e:
+        args["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        tracer.add_span(name=name, category=category, start_us=start_us, duration_us=tracer.now_us() - start_us, args=args)
+
+
+def traced(category: str, file_path_arg: str = "file_path"):
+    """decorator recording every call as a span named after the function, with its file path argument"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if active_tracer is None:
+                return function(*args, **kwargs)
+            span_args = dict()
+            file_path = kwargs.get(file_path_arg, args[0] if len(args) > 0 and isinstance(args[0], str) else None)
+            if file_path is not None:
+                span_args[file_path_arg] = file_path
+            with span(function.__name__, category, **span_args):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_grid_search_spans(model_name: str, cv_results: dict, n_splits: int, start_us: float):
+    """
+    one span per candidate of a fitted grid search on its own track, starting at start_us.
+    cv_results_ only holds mean fit and score times, so candidates are laid out one after another
+    with n_splits times their mean fit plus score time: the spans show the relative cost of
+    candidates, not when parallel folds actually ran
+    """
+    tracer = active_tracer
+    if tracer is None:
+        return
+    track_id = tracer.add_track(f"{model_name} grid search candidates (estimated from cv_results_)")
+    candidate_start_us = start_us
+    for index, params in enumerate(cv_results["params"]):
+        duration_us = n_splits * (cv_results["mean_fit_time"][index] + cv_results["mean_score_time"][index]) * 1e6
+        tracer.add_span(name=f"{model_name} candidate {index}", category=TRACE_FIT_CATEGORY, start_us=candidate_start_us,
+                        duration_us=float(duration_us), track_id=track_id,
+                        args={"params": {key: str(value) for key, value in params.items()},
+                              "mean_fit_time": float(cv_results["mean_fit_time"][index]),
+                              "mean_score_time": float(cv_results["mean_score_time"][index]),
+                              "mean_test_score": float(cv_results["mean_test_score"][index]),
+                              "rank_test_score": int(cv_results["rank_test_score"][index])})
+        candidate_start_us += duration_us
@@ -3,8 +3,10 @@ from housing.exception import HousingException
 import os,sys
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from housing.constants import *
 import dill
+from housing.util.tracing import traced, TRACE_IO_CATEGORY
 
 
 
@@ -34,6 +36,7 @@ def read_yaml_file(file_path: str)->dict:
     except Exception as e :
         raise HousingException(e,sys) from e 
     
+@traced(TRACE_IO_CATEGORY)
 def save_numpy_array_data(file_path: str, array: np.array):
     """save numpy array data to file
     file_path: str location of file to save 
@@ -48,6 +51,7 @@ def save_numpy_array_data(file_path: str, array: np.array):
     except Exception as e :
         raise HousingException(e,sys) from e
     
+@traced(TRACE_IO_CATEGORY)
 def load_numpy_array_data(file_path: str) -> np.array:
     """load numpy array data from file 
     file_path: str location of file to load 
@@ -58,6 +62,45 @@ def load_numpy_array_data(file_path: str) -> np.array:
     except Exception as e:
         raise HousingException(e, sys) from e 
     
+def get_feature_matrix_file_extension(matrix) -> str:
+    """.npz for sparse matrices, .npy for dense arrays"""
+    return SPARSE_FEATURE_MATRIX_FILE_EXTENSION if sparse.issparse(matrix) else DENSE_FEATURE_MATRIX_FILE_EXTENSION
+
+@traced(TRACE_IO_CATEGORY)
+def save_feature_matrix(file_path: str, matrix):
+    """save transformed feature matrix to file, sparse matrices are kept in CSR form
+    file_path: str location of file to save, its extension must be get_feature_matrix_file_extension(matrix)
+    matrix: np.array or scipy.sparse matrix to save
+    """
+    try:
+        file_extension = get_feature_matrix_file_extension(matrix)
+        if os.path.splitext(file_path)[1] != file_extension:
+            raise Exception(f"Feature matrix file [{file_path}] of a {'sparse' if sparse.issparse(matrix) else 'dense'} "
+                            f"matrix must have extension [{file_extension}]")
+        if not sparse.issparse(matrix):
+            return save_numpy_array_data(file_path=file_path, array=matrix)
+
+        dir_path = os.path.dirname(file_path)
+        os.makedirs(dir_path, exist_ok=True)
+        with open(file_path, "wb") as file_obj:
+            sparse.save_npz(file_obj, sparse.csr_matrix(matrix), compressed=False)
+
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+@traced(TRACE_IO_CATEGORY)
+def load_feature_matrix(file_path: str):
+    """load feature matrix saved by save_feature_matrix
+    file_path: str location of file to load
+    return : np.array or scipy.sparse.csr_matrix"""
+    try:
+        if os.path.splitext(file_path)[1] == SPARSE_FEATURE_MATRIX_FILE_EXTENSION:
+            return sparse.load_npz(file_path).tocsr()
+        return load_numpy_array_data(file_path=file_path)
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+@traced(TRACE_IO_CATEGORY)
 def save_object(file_path:str, obj):
     """file_path: str
     obj: any sort of object """
@@ -70,6 +113,7 @@ def save_object(file_path:str, obj):
     except Exception as e:
         raise HousingException(sys,e ) from e 
     
+@traced(TRACE_IO_CATEGORY)
 def load_object(file_path: str):
     """file_path : str"""
     try:
@@ -79,26 +123,176 @@ def load_object(file_path: str):
     except Exception as e:
         raise HousingException(sys, e) from e 
     
-def load_data(file_path: str, schema_file_path: str) ->pd.DataFrame:
+def get_dataset_file_format(file_path: str) -> str:
+    """returns csv, parquet or feather based on file extension"""
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension not in DATASET_FILE_FORMAT_EXTENSIONS.values():
+        raise Exception(f"Unsupported dataset file extension: [{extension}]")
+    return {value: key for key, value in DATASET_FILE_FORMAT_EXTENSIONS.items()}[extension]
+
+def get_dataset_column_names(file_path: str) -> list:
+    """reads column names from file header or columnar metadata without parsing data"""
     try:
-        dataset_schema = read_yaml_file(schema_file_path)
+        file_format = get_dataset_file_format(file_path)
+        if file_format == PARQUET_FILE_FORMAT:
+            import pyarrow.parquet as pq
+            return pq.read_schema(file_path).names
+        if file_format == FEATHER_FILE_FORMAT:
+            import pyarrow.ipc as ipc
+            with ipc.open_file(file_path) as reader:
+                return reader.schema.names
+        return list(pd.read_csv(file_path, nrows=0).columns)
+    except Exception as e:
+        raise HousingException(e, sys) from e
 
-        schema = dataset_schema[DATASET_SCHEMA_COLUMNS_KEY]
+def read_dataset(file_path: str, columns: list = None, dtype: dict = None, engine: str = None) -> pd.DataFrame:
+    """reads csv, parquet or feather dataset
+    columns: only given columns are read if columns is not None
+    dtype: column dtypes applied while parsing csv, columnar formats carry their own dtypes
+    engine: csv parser engine, "c" (default), "python" or "pyarrow" """
+    try:
+        file_format = get_dataset_file_format(file_path)
+        if file_format == PARQUET_FILE_FORMAT:
+            return pd.read_parquet(file_path, columns=columns)
+        if file_format == FEATHER_FILE_FORMAT:
+            return pd.read_feather(file_path, columns=columns)
+        if dtype is not None and columns is not None:
+            dtype = {column: column_dtype for column, column_dtype in dtype.items() if column in columns}
+        return pd.read_csv(file_path, usecols=columns, dtype=dtype, engine=engine)
+    except Exception as e:
+        raise HousingException(e, sys) from e
 
-        dataframe = pd.read_csv(file_path)
-        error_message= ""
+def iter_dataset_chunks(file_path: str, chunk_size: int, columns: list = None, dtype: dict = None):
+    """yields dataframe chunks of at most chunk_size rows from csv, parquet or feather dataset"""
+    try:
+        file_format = get_dataset_file_format(file_path)
+        if file_format == PARQUET_FILE_FORMAT:
+            import pyarrow.parquet as pq
+            parquet_file = pq.ParquetFile(file_path)
+            for record_batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+                yield record_batch.to_pandas()
+        elif file_format == FEATHER_FILE_FORMAT:
+            import pyarrow.ipc as ipc
+            with ipc.open_file(file_path) as reader:
+                for batch_index in range(reader.num_record_batches):
+                    record_batch = reader.get_batch(batch_index)
+                    if columns is not None:
+                        record_batch = record_batch.select(columns)
+                    for offset in range(0, record_batch.num_rows, chunk_size):
+                        yield record_batch.slice(offset, chunk_size).to_pandas()
+        else:
+            if dtype is not None and columns is not None:
+                dtype = {column: column_dtype for column, column_dtype in dtype.items() if column in columns}
+            yield from pd.read_csv(file_path, usecols=columns, dtype=dtype, chunksize=chunk_size)
+    except Exception as e:
+        raise HousingException(e, sys) from e
+
+def apply_schema_dtypes(dataframe: pd.DataFrame, schema_columns: dict) -> pd.DataFrame:
+    """casts dataframe columns to dtypes declared in columns section of schema.yaml"""
+    return dataframe.astype({column: dtype for column, dtype in schema_columns.items() if column in dataframe.columns})
 
+
+class DatasetWriter:
+    """
+    Appends dataframe chunks to a csv, parquet or feather file.
+    Columnar formats keep pandas dtypes (including category) so readers don't need to infer them.
+    Category columns are written with one fixed set of categories, categories given for the column,
+    e.g. domain_value of schema.yaml, else those of the first chunk. A feather file holds a single
+    dictionary per column, so a later chunk can not add categories there, parquet and csv extend them.
+    """
+
+    def __init__(self, file_path: str, categories: dict = None):
+        try:
+            self.file_path = file_path
+            self.file_format = get_dataset_file_format(file_path)
+            self.writer = None
+            self.arrow_schema = None
+            self.row_count = 0
+            #column -> list of categories of every chunk written
+            self.categories = {column: list(column_categories) for column, column_categories in (categories or dict()).items()}
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def get_fixed_categories(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        """dataframe with its category columns recoded to the categories of the file"""
+        recoded_columns = dict()
         for column in dataframe.columns:
-            if column in list (schema.keys()):
-                dataframe[column].astype(schema[column])
+            if column not in self.categories and not isinstance(dataframe[column].dtype, pd.CategoricalDtype):
+                continue
+            values = dataframe[column]
+            if column not in self.categories:
+                self.categories[column] = list(values.cat.categories)
+            new_categories = [value for value in pd.unique(values.dropna()) if value not in self.categories[column]]
+            if len(new_categories) > 0:
+                if self.writer is not None and self.file_format == FEATHER_FILE_FORMAT:
+                    raise Exception(f"Values {new_categories} of column [{column}] are not in its categories "
+                                    f"{self.categories[column]}, feather file [{self.file_path}] can not add categories")
+                self.categories[column].extend(new_categories)
+            if isinstance(values.dtype, pd.CategoricalDtype) and list(values.cat.categories) == self.categories[column]:
+                continue
+            recoded_columns[column] = values.astype(object).astype(pd.CategoricalDtype(categories=self.categories[column]))
+        return dataframe.assign(**recoded_columns) if len(recoded_columns) > 0 else dataframe
 
+    def write(self, dataframe: pd.DataFrame):
+        try:
+            dataframe = self.get_fixed_categories(dataframe)
+            if self.file_format == CSV_FILE_FORMAT:
+                dataframe.to_csv(self.file_path, index=False, mode="a", header=self.writer is None)
+                self.writer = self.file_path
             else:
-                error_message= f"{error_message} \ncolumn: [{column}] is not in the schema. "
+                import pyarrow as pa
+                table = pa.Table.from_pandas(dataframe, preserve_index=False)
+                if self.writer is None:
+                    self.arrow_schema = table.schema
+                    if self.file_format == PARQUET_FILE_FORMAT:
+                        import pyarrow.parquet as pq
+                        self.writer = pq.ParquetWriter(self.file_path, table.schema)
+                    else:
+                        import pyarrow.ipc as ipc
+                        self.writer = ipc.new_file(self.file_path, table.schema)
+                else:
+                    table = table.cast(self.arrow_schema)
+                self.writer.write_table(table)
+            self.row_count += len(dataframe)
+        except Exception as e:
+            raise HousingException(e, sys) from e
+
+    def close(self):
+        try:
+            if self.file_format != CSV_FILE_FORMAT and self.writer is not None:
+                self.writer.close()
+        except Exception as e:
+            raise HousingException(e, sys) from e
 
+    def __enter__(self):
+        return self
 
-        if len(error_message)> 0:
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+@traced(TRACE_IO_CATEGORY)
+def load_data(file_path: str, schema_file_path: str, columns: list = None, engine: str = None) ->pd.DataFrame:
+    """reads ingested dataset typed with columns section of schema.yaml
+    columns: list of columns to read, all columns are read if None
+    engine: optional csv parser engine e.g. "pyarrow" for faster multithreaded parsing
+    Columns which are not in schema are rejected from the header before data is parsed"""
+    try:
+        dataset_schema = read_yaml_file(schema_file_path)
+
+        schema = dataset_schema[DATASET_SCHEMA_COLUMNS_KEY]
+
+        unknown_columns = [column for column in get_dataset_column_names(file_path) if column not in schema]
+        if columns is not None:
+            unknown_columns.extend(column for column in columns if column not in schema and column not in unknown_columns)
+
+        if len(unknown_columns) > 0:
+            error_message = "".join(f" \ncolumn: [{column}] is not in the schema. " for column in unknown_columns)
             raise Exception(error_message)
-        return dataframe
+
+        return read_dataset(file_path=file_path, columns=columns, dtype=schema, engine=engine)
     except Exception as e:
-        raise HousingException(sys, e) from e
-    
\ No newline at end of file
+        raise HousingException(e, sys) from e
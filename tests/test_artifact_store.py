@@ -0,0 +1,103 @@
+import os
+from housing.util.artifact_store import ArtifactStore
+
+ARTIFACT_SIZE = 2 ** 20
+
+
+def write_artifact(artifact_dir: str, time_stamp: str, content: bytes) -> str:
+    file_path = os.path.join(artifact_dir, "model_trainer", time_stamp, "trained_model", "model.pkl")
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as file_obj:
+        file_obj.write(content)
+    return file_path
+
+
+def get_store_size(store_dir: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, file_name))
+               for root, _, file_names in os.walk(store_dir) for file_name in file_names)
+
+
+def test_collect_garbage_frees_expired_experiments(tmp_path):
+    artifact_dir = str(tmp_path / "artifact")
+    store_dir = os.path.join(artifact_dir, "artifact_store")
+    time_stamps = ["2024-01-01-00-00-00", "2024-01-02-00-00-00", "2024-01-03-00-00-00"]
+    file_paths = []
+    for index, time_stamp in enumerate(time_stamps):
+        artifact_store = ArtifactStore(store_dir=store_dir, experiment_id=time_stamp)
+        file_paths.append(write_artifact(artifact_dir, time_stamp, bytes([index]) * ARTIFACT_SIZE))
+        artifact_store.put_file(file_paths[-1])
+    size_before = get_store_size(store_dir)
+
+    gc_report = artifact_store.collect_garbage(retained_experiments=1)
+
+    assert gc_report["removed_refs"] == 2
+    assert gc_report["removed_artifacts"] == 2
+    assert gc_report["freed_bytes"] == 2 * ARTIFACT_SIZE
+    assert get_store_size(store_dir) <= size_before - 2 * ARTIFACT_SIZE
+    assert not os.path.exists(os.path.join(artifact_dir, "model_trainer", time_stamps[0]))
+    assert not os.path.exists(os.path.join(artifact_dir, "model_trainer", time_stamps[1]))
+    with open(file_paths[2], "rb") as file_obj:
+        assert file_obj.read() == bytes([2]) * ARTIFACT_SIZE
+
+
+def test_collect_garbage_keeps_content_of_retained_experiments(tmp_path):
+    artifact_dir = str(tmp_path / "artifact")
+    store_dir = os.path.join(artifact_dir, "artifact_store")
+    old_store = ArtifactStore(store_dir=store_dir, experiment_id="2024-01-01-00-00-00")
+    shared_file_path = write_artifact(artifact_dir, "2024-01-01-00-00-00", b"shared" * 1000)
+    old_store.put_file(shared_file_path)
+    new_store = ArtifactStore(store_dir=store_dir, experiment_id="2024-01-02-00-00-00")
+    #reused by the new experiment, e.g. unchanged ingested data, and a copy with the same content
+    new_store.put_file(shared_file_path)
+    copied_file_path = write_artifact(artifact_dir, "2024-01-02-00-00-00", b"shared" * 1000)
+    new_store.put_file(copied_file_path)
+
+    gc_report = new_store.collect_garbage(retained_experiments=1)
+
+    assert gc_report["removed_artifacts"] == 0
+    assert gc_report["removed_blobs"] == 0
+    assert os.path.exists(shared_file_path) and os.path.exists(copied_file_path)
+
+
+def test_collect_garbage_keeps_retained_file_paths(tmp_path):
+    artifact_dir = str(tmp_path / "artifact")
+    store_dir = os.path.join(artifact_dir, "artifact_store")
+    champion_store = ArtifactStore(store_dir=store_dir, experiment_id="2024-01-01-00-00-00")
+    champion_file_path = write_artifact(artifact_dir, "2024-01-01-00-00-00", b"champion" * 1000)
+    champion_store.put_file(champion_file_path)
+    for time_stamp in ["2024-01-02-00-00-00", "2024-01-03-00-00-00"]:
+        artifact_store = ArtifactStore(store_dir=store_dir, experiment_id=time_stamp)
+        artifact_store.put_file(write_artifact(artifact_dir, time_stamp, time_stamp.encode()))
+
+    #e.g. champion model of the model registry
+    artifact_store.collect_garbage(retained_experiments=1, retained_file_paths=[champion_file_path])
+    with open(champion_file_path, "rb") as file_obj:
+        assert file_obj.read() == b"champion" * 1000
+
+    #carried over to the current experiment, removed once it expires without being retained
+    next_store = ArtifactStore(store_dir=store_dir, experiment_id="2024-01-04-00-00-00")
+    next_store.put_file(write_artifact(artifact_dir, "2024-01-04-00-00-00", b"next"))
+    assert next_store.collect_garbage(retained_experiments=1)["removed_artifacts"] == 2
+    assert not os.path.exists(champion_file_path)
+
+
+def test_collect_garbage_is_skipped_while_another_run_holds_the_store(tmp_path):
+    artifact_dir = str(tmp_path / "artifact")
+    store_dir = os.path.join(artifact_dir, "artifact_store")
+    old_store = ArtifactStore(store_dir=store_dir, experiment_id="2024-01-01-00-00-00")
+    old_file_path = write_artifact(artifact_dir, "2024-01-01-00-00-00", b"old")
+    old_store.put_file(old_file_path)
+    running_store = ArtifactStore(store_dir=store_dir, experiment_id="2024-01-02-00-00-00")
+    finished_store = ArtifactStore(store_dir=store_dir, experiment_id="2024-01-03-00-00-00")
+    finished_store.put_file(write_artifact(artifact_dir, "2024-01-03-00-00-00", b"new"))
+    running_store.acquire_run_lock()
+    finished_store.acquire_run_lock()
+    try:
+        assert finished_store.collect_garbage(retained_experiments=1)["skipped"]
+        assert os.path.exists(old_file_path)
+    finally:
+        running_store.release_run_lock()
+
+    gc_report = finished_store.collect_garbage(retained_experiments=1)
+    finished_store.release_run_lock()
+    assert not gc_report["skipped"] and not os.path.exists(old_file_path)
@@ -0,0 +1,42 @@
+import os
+from housing.constants import PIPELINE_STAGE_NAMES, DATA_DRIFT_STAGE
+from housing.pipeline.checkpoint import PipelineCheckpoint, get_incomplete_time_stamps
+from housing.pipeline.stage_executor import StageRun, STAGE_EXECUTED
+
+
+def start_run(checkpoint_root_dir: str, time_stamp: str) -> PipelineCheckpoint:
+    """checkpoint of a run whose stages all completed except a failed drift report"""
+    checkpoint = PipelineCheckpoint(os.path.join(checkpoint_root_dir, time_stamp))
+    checkpoint.start(experiment_id=time_stamp, time_stamp=time_stamp)
+    for stage_name in PIPELINE_STAGE_NAMES:
+        if stage_name == DATA_DRIFT_STAGE:
+            checkpoint.save_failure(stage_name, Exception("drift report failed"))
+            continue
+        checkpoint.save_stage(StageRun(name=stage_name, status=STAGE_EXECUTED, fingerprint=stage_name, duration=0.0,
+                                       artifact_file_path=None), artifact=None)
+    return checkpoint
+
+
+def test_run_with_failed_non_fatal_stage_is_not_resumable_once_completed(tmp_path):
+    checkpoint_root_dir = str(tmp_path)
+    crashed_checkpoint = start_run(checkpoint_root_dir, "2024-01-01-00-00-00")
+    completed_checkpoint = start_run(checkpoint_root_dir, "2024-01-02-00-00-00")
+    completed_checkpoint.complete()
+
+    assert get_incomplete_time_stamps(checkpoint_root_dir, PIPELINE_STAGE_NAMES) == ["2024-01-01-00-00-00"]
+
+    #resuming starts the run again
+    completed_checkpoint.start(experiment_id="2024-01-02-00-00-00", time_stamp="2024-01-02-00-00-00")
+    assert get_incomplete_time_stamps(checkpoint_root_dir, PIPELINE_STAGE_NAMES) == ["2024-01-01-00-00-00",
+                                                                                       "2024-01-02-00-00-00"]
+    crashed_checkpoint.complete()
+    assert get_incomplete_time_stamps(checkpoint_root_dir, PIPELINE_STAGE_NAMES) == ["2024-01-02-00-00-00"]
+
+
+def test_manifest_without_completion_mark_is_judged_by_its_stages(tmp_path):
+    checkpoint = start_run(str(tmp_path), "2024-01-01-00-00-00")
+    manifest = checkpoint.read_manifest()
+    del manifest["is_completed"]
+    checkpoint.write_manifest(manifest)
+    assert get_incomplete_time_stamps(str(tmp_path), PIPELINE_STAGE_NAMES) == ["2024-01-01-00-00-00"]
+    assert get_incomplete_time_stamps(str(tmp_path), [name for name in PIPELINE_STAGE_NAMES if name != DATA_DRIFT_STAGE]) == []
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+from housing.exception import HousingException
+from housing.util.util import DatasetWriter, read_dataset, iter_dataset_chunks
+
+
+def get_chunk(values: list) -> pd.DataFrame:
+    return pd.DataFrame({"median_income": [float(index) for index in range(len(values))],
+                         "ocean_proximity": pd.Series(values, dtype="category")})
+
+
+@pytest.mark.parametrize("file_extension", [".feather", ".parquet", ".csv"])
+def test_chunks_with_different_categories(tmp_path, file_extension):
+    file_path = str(tmp_path / f"train{file_extension}")
+    with DatasetWriter(file_path, categories={"ocean_proximity": ["A", "B", "C"]}) as writer:
+        writer.write(get_chunk(["A", "B"]))
+        writer.write(get_chunk(["C"]))
+    dataframe = read_dataset(file_path)
+    assert list(dataframe["ocean_proximity"].astype(str)) == ["A", "B", "C"]
+    if file_extension != ".csv":
+        assert list(dataframe["ocean_proximity"].cat.categories) == ["A", "B", "C"]
+
+
+def test_feather_chunks_share_categories_of_first_chunk(tmp_path):
+    file_path = str(tmp_path / "train.feather")
+    with DatasetWriter(file_path) as writer:
+        writer.write(get_chunk(["A", "B"]))
+        writer.write(get_chunk(["B"]))
+    chunks = list(iter_dataset_chunks(file_path, chunk_size=10))
+    assert [list(chunk["ocean_proximity"].astype(str)) for chunk in chunks] == [["A", "B"], ["B"]]
+
+
+def test_feather_rejects_category_outside_domain(tmp_path):
+    with DatasetWriter(str(tmp_path / "train.feather"), categories={"ocean_proximity": ["A", "B"]}) as writer:
+        writer.write(get_chunk(["A"]))
+        with pytest.raises(HousingException, match="can not add categories"):
+            writer.write(get_chunk(["C"]))
+
+
+def test_parquet_extends_categories(tmp_path):
+    file_path = str(tmp_path / "train.parquet")
+    with DatasetWriter(file_path) as writer:
+        writer.write(get_chunk(["A", "B"]))
+        writer.write(get_chunk(["C"]))
+    assert list(read_dataset(file_path)["ocean_proximity"].astype(str)) == ["A", "B", "C"]
@@ -0,0 +1,46 @@
+import threading
+from housing.util.drift_monitor import DriftMonitor
+
+
+def test_every_request_is_recorded_or_dropped():
+    monitor = DriftMonitor(numerical_columns=["median_income"], categorical_columns=["ocean_proximity"], window_size=64)
+    thread_count, request_count = 8, 2000
+    stop = threading.Event()
+
+    def record():
+        for index in range(request_count):
+            monitor.record({"median_income": float(index), "ocean_proximity": "INLAND"})
+
+    def build_sketches():
+        while not stop.is_set():
+            monitor.get_window_sketch(relative_accuracy=0.01)
+
+    sketch_thread = threading.Thread(target=build_sketches)
+    sketch_thread.start()
+    threads = [threading.Thread(target=record) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stop.set()
+    sketch_thread.join()
+    assert monitor.recorded_count + monitor.dropped_count == thread_count * request_count
+
+
+def test_invalid_request_is_dropped():
+    monitor = DriftMonitor(numerical_columns=["median_income"], categorical_columns=["ocean_proximity"], window_size=4)
+    assert not monitor.record({"median_income": 1.0})
+    assert monitor.record({"median_income": 1.0, "ocean_proximity": "INLAND"})
+    assert (monitor.recorded_count, monitor.dropped_count) == (1, 1)
+
+
+def test_record_does_not_wait_while_window_is_copied():
+    monitor = DriftMonitor(numerical_columns=["median_income"], categorical_columns=["ocean_proximity"], window_size=4)
+    recorded = []
+    with monitor.lock:
+        thread = threading.Thread(target=lambda: recorded.append(monitor.record({"median_income": 1.0,
+                                                                                 "ocean_proximity": "INLAND"})))
+        thread.start()
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+    assert recorded == [False] and monitor.dropped_count == 1
@@ -0,0 +1,40 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+from housing.constants import COLUMN_TOTAL_ROOMS, COLUMN_POPULATION, COLUMN_HOUSEHOLDS, COLUMN_TOTAL_BEDROOM
+from housing.component.data_transformation import FeatureGenerator
+from housing.exception import HousingException
+from housing.util.util import save_feature_matrix, load_feature_matrix, get_feature_matrix_file_extension
+
+
+@pytest.mark.parametrize("matrix", [np.arange(12, dtype=float).reshape(3, 4),
+                                    sparse.csr_matrix(np.eye(3, 4))])
+def test_feature_matrix_round_trip(tmp_path, matrix):
+    file_path = str(tmp_path / f"train{get_feature_matrix_file_extension(matrix)}")
+    save_feature_matrix(file_path=file_path, matrix=matrix)
+    loaded = load_feature_matrix(file_path=file_path)
+    assert sparse.issparse(loaded) == sparse.issparse(matrix)
+    assert loaded.shape == matrix.shape
+    if sparse.issparse(matrix):
+        assert loaded.format == "csr"
+        assert (loaded != matrix).nnz == 0
+    else:
+        assert np.array_equal(loaded, matrix)
+
+
+def test_feature_matrix_extension_must_match_format(tmp_path):
+    with pytest.raises(HousingException):
+        save_feature_matrix(file_path=str(tmp_path / "train.npz"), matrix=np.zeros((2, 2)))
+    with pytest.raises(HousingException):
+        save_feature_matrix(file_path=str(tmp_path / "train.npy"), matrix=sparse.csr_matrix((2, 2)))
+    assert os.listdir(tmp_path) == []
+
+
+def test_feature_generator_columns():
+    columns = ["longitude", COLUMN_HOUSEHOLDS, COLUMN_TOTAL_BEDROOM, COLUMN_POPULATION, COLUMN_TOTAL_ROOMS]
+    feature_generator = FeatureGenerator(columns=columns)
+    X = pd.DataFrame([[1.0, 2.0, 3.0, 8.0, 12.0]], columns=columns).to_numpy()
+    generated_feature = feature_generator.fit_transform(X)
+    assert generated_feature[0, 5:].tolist() == [6.0, 4.0, 0.25]
@@ -0,0 +1,23 @@
+from housing.pipeline.job_queue import JobQueue, TRAIN_JOB, RESUME_JOB, JOB_FAILED, JOB_RUNNING
+
+
+def test_resume_of_running_run_is_not_claimed(tmp_path):
+    job_queue = JobQueue(db_file_path=str(tmp_path / "job.db"))
+    job_queue.enqueue(kind=TRAIN_JOB)
+    running_job = job_queue.claim_next(time_stamp="2024-01-01-00-00-00")
+    resume_job_id = job_queue.enqueue(kind=RESUME_JOB, time_stamp=running_job["time_stamp"])
+    train_job_id = job_queue.enqueue(kind=TRAIN_JOB)
+
+    assert job_queue.get_active_time_stamps() == {running_job["time_stamp"]}
+    claimed_job = job_queue.claim_next(time_stamp="2024-01-01-00-00-01")
+    assert claimed_job["job_id"] == train_job_id
+    assert job_queue.get_job(resume_job_id)["status"] == JOB_FAILED
+
+
+def test_resume_of_finished_run_is_claimed(tmp_path):
+    job_queue = JobQueue(db_file_path=str(tmp_path / "job.db"))
+    resume_job_id = job_queue.enqueue(kind=RESUME_JOB, time_stamp="2024-01-01-00-00-00")
+    claimed_job = job_queue.claim_next(time_stamp="2024-01-01-00-00-01")
+    assert claimed_job["job_id"] == resume_job_id
+    assert claimed_job["status"] == JOB_RUNNING
+    assert claimed_job["time_stamp"] == "2024-01-01-00-00-00"
@@ -0,0 +1,56 @@
+import os
+import dill
+from housing.component.model_evaluation import ModelEvaluation
+from housing.entity.config_entity import ModelEvaluationConfig
+from housing.util.model_registry import ModelRegistry, CHAMPION_STATUS, RETIRED_STATUS
+
+
+def write_model(tmp_path, time_stamp: str, model) -> str:
+    model_path = tmp_path / "artifact" / "model_trainer" / time_stamp / "trained_model" / "model.pkl"
+    os.makedirs(model_path.parent, exist_ok=True)
+    with open(model_path, "wb") as model_file:
+        dill.dump(model, model_file)
+    return str(model_path)
+
+
+def test_promoted_model_outlives_its_trainer_artifact(tmp_path):
+    db_file_path = str(tmp_path / "artifact" / "model_evaluation" / "model_registry.db")
+    model_registry = ModelRegistry(db_file_path=db_file_path)
+    trained_model_path = write_model(tmp_path, "2024-01-01-00-00-00", {"coef": 1})
+    version = model_registry.register(model_path=trained_model_path, time_stamp="2024-01-01-00-00-00")
+
+    assert model_registry.promote(version=version, expected_champion_version=None)
+    os.remove(trained_model_path)
+
+    champion = model_registry.get_champion()
+    assert champion["version"] == version
+    assert os.path.dirname(champion["model_path"]) == os.path.join(os.path.dirname(db_file_path), "models")
+    with open(champion["model_path"], "rb") as model_file:
+        assert dill.load(model_file) == {"coef": 1}
+    assert champion["model_path"] in model_registry.get_retained_file_paths()
+
+
+def test_promotion_fails_when_champion_changed(tmp_path):
+    model_registry = ModelRegistry(db_file_path=str(tmp_path / "model_registry.db"))
+    versions = [model_registry.register(model_path=write_model(tmp_path, time_stamp, {"coef": index}), time_stamp=time_stamp)
+                for index, time_stamp in enumerate(["2024-01-01-00-00-00", "2024-01-02-00-00-00"])]
+    assert model_registry.promote(version=versions[0], expected_champion_version=None)
+    assert not model_registry.promote(version=versions[1], expected_champion_version=None)
+    assert model_registry.get_champion()["version"] == versions[0]
+
+
+def test_champion_with_missing_model_file_is_demoted(tmp_path):
+    db_file_path = str(tmp_path / "model_registry.db")
+    model_registry = ModelRegistry(db_file_path=db_file_path)
+    version = model_registry.register(model_path=write_model(tmp_path, "2024-01-01-00-00-00", {"coef": 1}),
+                                      time_stamp="2024-01-01-00-00-00")
+    model_registry.promote(version=version, expected_champion_version=None)
+    os.remove(model_registry.get_champion()["model_path"])
+    model_evaluation = ModelEvaluation(model_evaluation_config=ModelEvaluationConfig(
+                                           model_evaluation_file_path=str(tmp_path / "model_evluation.yaml"),
+                                           model_registry_file_path=db_file_path, time_stamp="2024-01-02-00-00-00"),
+                                       data_ingestion_artifact=None, data_validation_artifact=None, model_trainer_artifact=None)
+
+    assert model_evaluation.get_champion() is None
+    assert model_registry.get_version(version)["status"] == RETIRED_STATUS
+    assert model_registry.get_versions(status=CHAMPION_STATUS) == []
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from housing.util.sketch import NumericalSketch, CategoricalSketch
+
+QUANTILES = np.linspace(0, 1, 101)
+
+
+def get_values(row_count: int, seed: int = 11) -> np.ndarray:
+    """house values spread over several orders of magnitude, with negatives, zeros and missing values"""
+    rng = np.random.default_rng(seed)
+    values = np.concatenate([rng.lognormal(mean=11.0, sigma=1.5, size=row_count),
+                             -rng.lognormal(mean=0.0, sigma=2.0, size=row_count // 10),
+                             np.zeros(row_count // 100),
+                             [np.nan] * (row_count // 100)])
+    return rng.permutation(values)
+
+
+def assert_quantiles_within_bound(sketch: NumericalSketch, values: np.ndarray):
+    sorted_values = np.sort(values[~np.isnan(values)])
+    for quantile in QUANTILES:
+        true_value = sorted_values[int(quantile * (len(sorted_values) - 1))]
+        assert abs(sketch.get_quantile(quantile) - true_value) <= sketch.relative_accuracy * abs(true_value) * (1 + 1e-9)
+
+
+@pytest.mark.parametrize("relative_accuracy", [0.01, 0.05])
+def test_quantile_error_within_relative_accuracy(relative_accuracy):
+    values = get_values(50000)
+    sketch = NumericalSketch(relative_accuracy=relative_accuracy)
+    sketch.update(values)
+    assert sketch.count == np.count_nonzero(~np.isnan(values))
+    assert sketch.null_count == np.count_nonzero(np.isnan(values))
+    assert_quantiles_within_bound(sketch, values)
+
+
+def test_merged_chunk_sketches_equal_single_sketch():
+    values = get_values(20000)
+    sketch = NumericalSketch(relative_accuracy=0.01)
+    sketch.update(values)
+    merged_sketch = NumericalSketch(relative_accuracy=0.01)
+    for chunk in np.array_split(values, 7):
+        chunk_sketch = NumericalSketch(relative_accuracy=0.01)
+        chunk_sketch.update(chunk)
+        merged_sketch.merge(chunk_sketch)
+    assert merged_sketch.to_dict() == {**sketch.to_dict(), "sum": pytest.approx(sketch.sum)}
+    assert_quantiles_within_bound(NumericalSketch.from_dict(merged_sketch.to_dict()), values)
+
+
+def test_merge_rejects_other_relative_accuracy():
+    with pytest.raises(Exception):
+        NumericalSketch(relative_accuracy=0.01).merge(NumericalSketch(relative_accuracy=0.02))
+
+
+def test_categorical_frequencies():
+    sketch = CategoricalSketch()
+    sketch.update(["INLAND", "NEAR BAY", None, "INLAND"])
+    sketch.merge(CategoricalSketch.from_dict(sketch.to_dict()))
+    assert (sketch.frequencies, sketch.count, sketch.null_count) == ({"INLAND": 4, "NEAR BAY": 2}, 6, 2)
@@ -0,0 +1,127 @@
+from collections import namedtuple
+import pytest
+from housing.exception import HousingException
+from housing.pipeline.stage_executor import Stage, StageExecutor, STAGE_CACHED, STAGE_EXECUTED
+
+Artifact = namedtuple("Artifact", ["value"])
+
+
+def get_stage(name: str, function, upstream: list = None, cacheable: bool = False, **kwargs) -> Stage:
+    stage_info = dict(config_sections=[], config_files=[], code_modules=[], output_fingerprint=None)
+    stage_info.update(kwargs)
+    return Stage(name=name, function=function, upstream=upstream or [], cacheable=cacheable, **stage_info)
+
+
+def fail(**upstream_artifacts):
+    raise Exception("drift report failed")
+
+
+def test_failing_non_fatal_stage_does_not_stop_other_stages(tmp_path):
+    failed_stage_names = []
+    stages = [get_stage("ingestion", lambda: Artifact(1)),
+              get_stage("drift", fail, upstream=["ingestion"], fatal=False),
+              get_stage("drift_alert", lambda drift: Artifact(drift.value), upstream=["drift"]),
+              get_stage("training", lambda ingestion: Artifact(ingestion.value + 1), upstream=["ingestion"]),
+              get_stage("evaluation", lambda training: Artifact(training.value + 1), upstream=["training"])]
+    executor = StageExecutor(stages=stages, config_info={}, stage_cache_dir=str(tmp_path), max_workers=2)
+
+    artifacts, stage_runs = executor.run(on_stage_failed=lambda stage_name, error: failed_stage_names.append(stage_name))
+
+    assert failed_stage_names == ["drift"]
+    assert artifacts["evaluation"] == Artifact(3)
+    assert "drift" not in artifacts and "drift_alert" not in stage_runs
+
+
+def test_failing_fatal_stage_stops_the_run(tmp_path):
+    stages = [get_stage("ingestion", lambda: Artifact(1)),
+              get_stage("validation", fail, upstream=["ingestion"]),
+              get_stage("training", lambda validation: Artifact(2), upstream=["validation"])]
+    executor = StageExecutor(stages=stages, config_info={}, stage_cache_dir=str(tmp_path), max_workers=2)
+    with pytest.raises(HousingException, match="Stage \\[validation\\] failed"):
+        executor.run()
+
+
+def test_input_fingerprint_invalidates_cached_artifact(tmp_path):
+    baseline = {"sketches": "run-1"}
+    executions = []
+
+    def report(ingestion):
+        executions.append(baseline["sketches"])
+        return Artifact(baseline["sketches"])
+
+    def run_stages():
+        stages = [get_stage("ingestion", lambda: Artifact(1)),
+                  get_stage("drift", report, upstream=["ingestion"], cacheable=True,
+                            input_fingerprint=lambda ingestion: baseline["sketches"])]
+        return StageExecutor(stages=stages, config_info={}, stage_cache_dir=str(tmp_path), max_workers=1).run()
+
+    assert run_stages()[1]["drift"].status == STAGE_EXECUTED
+    assert run_stages()[1]["drift"].status == STAGE_CACHED
+    baseline["sketches"] = "run-2"
+    artifacts, stage_runs = run_stages()
+    assert stage_runs["drift"].status == STAGE_EXECUTED
+    assert artifacts["drift"] == Artifact("run-2")
+    assert executions == ["run-1", "run-2"]
+
+
+@pytest.mark.parametrize("cycle", [{"b": ["c"], "c": ["b"]}, {"b": ["b"]}, {"b": ["a", "d"], "c": ["b"], "d": ["c"]}])
+def test_cycle_is_detected(tmp_path, cycle):
+    executions = []
+    stages = [get_stage("a", lambda: executions.append("a") or Artifact(1))]
+    stages += [get_stage(name, lambda **upstream_artifacts: Artifact(2), upstream=upstream) for name, upstream in cycle.items()]
+    executor = StageExecutor(stages=stages, config_info={}, stage_cache_dir=str(tmp_path), max_workers=2)
+    with pytest.raises(HousingException, match="form a cycle"):
+        executor.run()
+    assert executions == ["a"]
+
+
+def test_unknown_upstream_is_rejected(tmp_path):
+    with pytest.raises(HousingException, match="unknown stages \\['missing'\\]"):
+        StageExecutor(stages=[get_stage("a", lambda missing: Artifact(1), upstream=["missing"])], config_info={},
+                      stage_cache_dir=str(tmp_path), max_workers=1)
+
+
+def test_unchanged_stages_reuse_cached_artifacts(tmp_path):
+    executions = []
+    ingested = {"sha256": "v1"}
+
+    def execute(name, value):
+        executions.append(name)
+        return Artifact(value)
+
+    def run_stages(config_info: dict):
+        stages = [get_stage("ingestion", lambda: execute("ingestion", ingested["sha256"]),
+                            output_fingerprint=lambda artifact: artifact.value),
+                  get_stage("transformation", lambda ingestion: execute("transformation", ingestion.value),
+                            upstream=["ingestion"], cacheable=True, config_sections=["transformation"]),
+                  get_stage("training", lambda transformation: execute("training", transformation.value),
+                            upstream=["transformation"], cacheable=True)]
+        _, stage_runs = StageExecutor(stages=stages, config_info=config_info, stage_cache_dir=str(tmp_path),
+                                      max_workers=2).run()
+        return {name: stage_run.status for name, stage_run in stage_runs.items()}
+
+    assert run_stages({"transformation": 1}) == {"ingestion": STAGE_EXECUTED, "transformation": STAGE_EXECUTED,
+                                                  "training": STAGE_EXECUTED}
+    #ingestion always executes, its unchanged output keeps the downstream stages cached
+    assert run_stages({"transformation": 1}) == {"ingestion": STAGE_EXECUTED, "transformation": STAGE_CACHED,
+                                                  "training": STAGE_CACHED}
+    assert run_stages({"transformation": 2}) == {"ingestion": STAGE_EXECUTED, "transformation": STAGE_EXECUTED,
+                                                  "training": STAGE_EXECUTED}
+    ingested["sha256"] = "v2"
+    assert run_stages({"transformation": 2})["training"] == STAGE_EXECUTED
+    assert executions.count("transformation") == 3 and executions.count("ingestion") == 4
+
+
+def test_cached_artifact_with_missing_file_is_not_reused(tmp_path):
+    data_file_path = tmp_path / "transformed.npy"
+    data_file_path.write_bytes(b"features")
+    FileArtifact = namedtuple("FileArtifact", ["transformed_file_path"])
+
+    def run_stages():
+        stages = [get_stage("transformation", lambda: FileArtifact(str(data_file_path)), cacheable=True)]
+        return StageExecutor(stages=stages, config_info={}, stage_cache_dir=str(tmp_path / "cache"), max_workers=1).run()[1]
+
+    assert run_stages()["transformation"].status == STAGE_EXECUTED
+    assert run_stages()["transformation"].status == STAGE_CACHED
+    data_file_path.unlink()
+    assert run_stages()["transformation"].status == STAGE_EXECUTED
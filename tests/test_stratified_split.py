@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from housing.util.stratified_split import (get_income_strata, get_row_keys, get_empty_histogram, update_strata_histogram,
+                                           get_split_plan, get_test_mask, STRATA_COUNT)
+
+TEST_SIZE = 0.2
+
+
+def get_median_income(row_count: int, seed: int = 7) -> np.ndarray:
+    median_income = np.random.default_rng(seed).lognormal(mean=1.3, sigma=0.5, size=row_count)
+    median_income[::97] = np.nan
+    return median_income
+
+
+def split(median_income: np.ndarray, random_state: int, chunk_size: int) -> np.ndarray:
+    """two pass split of median_income read in chunks of chunk_size rows"""
+    histogram = get_empty_histogram()
+    for start_row in range(0, len(median_income), chunk_size):
+        chunk = median_income[start_row:start_row + chunk_size]
+        update_strata_histogram(histogram, chunk, get_row_keys(start_row, len(chunk)), random_state)
+    split_plan = get_split_plan(histogram, test_size=TEST_SIZE)
+    boundary_taken = np.zeros(STRATA_COUNT, dtype=np.int64)
+    test_masks = []
+    for start_row in range(0, len(median_income), chunk_size):
+        chunk = median_income[start_row:start_row + chunk_size]
+        test_masks.append(get_test_mask(split_plan, chunk, get_row_keys(start_row, len(chunk)), random_state, boundary_taken))
+    test_mask = np.concatenate(test_masks)
+    assert test_mask.sum() == split_plan.test_row_count
+    return test_mask
+
+
+def test_income_strata_match_pd_cut():
+    median_income = np.array([np.nan, -1.0, 0.0, 0.5, 1.5, 1.6, 3.0, 4.5, 5.9, 6.0, 15.0])
+    income_category = pd.cut(median_income, bins=[0.0, 1.5, 3.0, 4.5, 6.0, np.inf], labels=[1, 2, 3, 4, 5])
+    expected = np.nan_to_num(np.asarray(income_category, dtype=float), nan=0).astype(int)
+    assert get_income_strata(median_income).tolist() == expected.tolist()
+
+
+def test_split_is_deterministic_and_independent_of_chunk_size():
+    median_income = get_median_income(20000)
+    test_mask = split(median_income, random_state=42, chunk_size=20000)
+    assert np.array_equal(test_mask, split(median_income, random_state=42, chunk_size=20000))
+    assert np.array_equal(test_mask, split(median_income, random_state=42, chunk_size=1234))
+    assert not np.array_equal(test_mask, split(median_income, random_state=43, chunk_size=20000))
+
+
+@pytest.mark.parametrize("row_count", [50, 20640])
+def test_every_stratum_keeps_its_proportion(row_count):
+    median_income = get_median_income(row_count)
+    test_mask = split(median_income, random_state=42, chunk_size=1000)
+    strata = get_income_strata(median_income)
+    for stratum in range(STRATA_COUNT):
+        stratum_mask = strata == stratum
+        assert test_mask[stratum_mask].sum() == np.rint(stratum_mask.sum() * TEST_SIZE)
+
+
+def test_row_keys_are_unique_across_sources():
+    row_keys = np.concatenate([get_row_keys(0, 1000, source_id=source_id) for source_id in range(3)])
+    assert len(np.unique(row_keys)) == len(row_keys)
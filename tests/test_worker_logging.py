@@ -0,0 +1,31 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from housing.logger import start_worker_log_listener, forward_worker_logging
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record: logging.LogRecord):
+        self.records.append(record)
+
+
+def log_in_worker(index: int) -> int:
+    logging.info("worker record [%s]", index)
+    return index
+
+
+def test_worker_records_reach_parent_handlers(monkeypatch):
+    list_handler = ListHandler()
+    monkeypatch.setattr(logging.getLogger(), "handlers", [list_handler])
+    log_listener = start_worker_log_listener()
+    try:
+        with ProcessPoolExecutor(max_workers=2, initializer=forward_worker_logging,
+                                 initargs=(log_listener.queue,)) as executor:
+            assert list(executor.map(log_in_worker, range(4))) == list(range(4))
+    finally:
+        log_listener.stop()
+    assert sorted(record.getMessage() for record in list_handler.records) == [f"worker record [{index}]" for index in range(4)]